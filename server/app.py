@@ -1,8 +1,53 @@
 # main entrypoint (starts server, listens for clients)
 
+import argparse
+from server.config import SERVER_MODE, METRICS_PORT, CHANNEL_WORKERS
+from server.core.metrics import registry, MetricsServer
 from server.network.server import GameServer
+from server.network.async_server import AsyncGameServer
+from server.channels.channel_game import ChannelGameServer
+from server.channels.workers import MasterServer
 from server.db.database import init_db
+from server.db.passwords import password_pool
+from server.db.name_index import name_index
+from server.db.write_behind import write_behind
+from server.db.character_cache import character_cache
+from server.core.ids import entity_ids
+
+SERVER_MODES = {
+    "threaded": GameServer,
+    "asyncio": AsyncGameServer,
+    "channels": ChannelGameServer,  # one process, a GameEngine per channel, change_channel moves players
+    "multiproc": MasterServer,  # login here, channels in worker processes (Unix only)
+}
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Otherworldly game server")
+    parser.add_argument("--mode", choices=sorted(SERVER_MODES), default=SERVER_MODE)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=CHANNEL_WORKERS, help="channel processes (multiproc mode)")
+    args = parser.parse_args()
+    options = {"workers": args.workers} if args.mode == "multiproc" else {}
+    server = SERVER_MODES[args.mode](host=args.host, port=args.port, **options)
+
+    registry.register("password_pool", password_pool.stats)
+    registry.register("character_cache", character_cache.stats)
+    registry.register("write_behind", write_behind.stats)
+    registry.register("entity_ids", entity_ids.stats)
+    if args.mode == "multiproc":
+        registry.register("channel_workers", server.worker_stats)
+    if args.mode == "channels":
+        registry.register("channels", server.channels.stats)
+    if METRICS_PORT:
+        MetricsServer(port=METRICS_PORT).start()
+
     init_db()
-    GameServer().start()
+    name_index.load()
+    password_pool.start()
+    write_behind.start()
+    try:
+        server.start()
+    finally:
+        write_behind.stop()  # final flush of buffered character state
+        password_pool.shutdown()
@@ -0,0 +1,67 @@
+# server/benchmarks/bench_broadcast.py
+# Per-recipient cost of ChannelServer.broadcast as the channel fills up,
+# against the old pattern of encoding the message once per client.
+#
+#   python -m server.benchmarks.bench_broadcast
+import argparse
+import time
+from server.channels.channel_server import ChannelServer
+from server.network.protocol import JSON_CODEC
+
+
+class StubClient:
+    """Stands in for a connection: records bytes instead of sending them."""
+    def __init__(self):
+        self.codec = JSON_CODEC
+        self.channel = None
+        self.queued = 0
+
+    def send_json(self, message: dict):
+        self.send_bytes(self.codec.encode(message))
+
+    def send_bytes(self, data: bytes):
+        self.queued += len(data)
+
+
+def sample_message():
+    return {
+        "action": "chat",
+        "channel": 1,
+        "from": "player1",
+        "text": "Hello everyone, meet at the north gate in five minutes!",
+        "entities": [{"id": i, "x": 100 + i, "y": 200, "hp": 50} for i in range(10)],
+    }
+
+
+def per_client_encode(clients, message):
+    for client in clients:
+        client.send_json(message)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10,25,50,100")
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    message = sample_message()
+    for size in (int(x) for x in args.sizes.split(",")):
+        channel = ChannelServer(1, max_clients=size)
+        for _ in range(size):
+            channel.add_client(StubClient())
+
+        start = time.perf_counter()
+        for _ in range(args.iterations):
+            channel.broadcast(message)
+        once_ns = (time.perf_counter() - start) / (args.iterations * size) * 1e9
+
+        start = time.perf_counter()
+        for _ in range(args.iterations):
+            per_client_encode(channel.clients, message)
+        each_ns = (time.perf_counter() - start) / (args.iterations * size) * 1e9
+
+        print(f"recipients={size:>4} encode-once={once_ns:8.0f} ns/recipient per-client-encode={each_ns:8.0f} ns/recipient")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+# server/benchmarks/bench_bus.py
+# Message bus throughput and publish-to-delivery latency per topic: one
+# broker process, --publishers processes each publishing --messages to its
+# own channel topic, and --subscribers processes subscribed to all of them.
+# Latency is only meaningful below saturation: pace publishers with --rate
+# (--rate 0 publishes flat out, to find the throughput ceiling).
+#
+#   python -m server.benchmarks.bench_bus --publishers 4 --subscribers 4 --messages 50000 --rate 5000
+import argparse
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from server.channels.bus import BusClient, run_broker, connect
+from server.core.metrics import Histogram
+
+LATENCY_BUCKETS = (0.0001, 0.0002, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.25, 0.5, 1.0, float("inf"))
+
+
+def publisher(path, index, messages, size, rate, flush_interval, start, results):
+    bus = BusClient(path, lambda topic, message: None, flush_interval=flush_interval)
+    payload = "x" * size
+    topic = f"channel:{index}"
+    start.wait()
+    began = time.perf_counter()
+    for n in range(messages):
+        if rate and n % 100 == 0:
+            ahead = began + n / rate - time.perf_counter()
+            if ahead > 0:
+                time.sleep(ahead)
+        bus.publish(topic, {"n": n, "t": time.monotonic(), "pad": payload})
+    bus.close(timeout=60)
+    results.put(time.perf_counter() - began)
+
+
+def subscriber(path, index, topics, expected, flush_interval, ready, start, results):
+    received = Counter()
+    first = {}
+    last = {}
+    latency = defaultdict(lambda: Histogram(LATENCY_BUCKETS))  # topic -> seconds
+    done = threading.Event()
+    own = f"user:bench{index}"
+
+    def on_message(topic, message):
+        if topic == own:
+            done.set()  # our subscriptions are in place
+            return
+        now = time.monotonic()
+        received[topic] += 1
+        first.setdefault(topic, now)
+        last[topic] = now
+        latency[topic].observe(now - message["t"])
+        if sum(received.values()) == expected:
+            done.set()
+
+    bus = BusClient(path, on_message, flush_interval=flush_interval)
+    for topic in topics + [own]:
+        bus.subscribe(topic)
+    bus.publish(own, {})
+    done.wait(10)
+    done.clear()
+    ready.release()
+    start.wait()
+    done.wait(120)
+    results.put({
+        topic: (received[topic], last[topic] - first[topic],
+                latency[topic].percentile(50), latency[topic].percentile(99))
+        for topic in received
+    })
+    bus.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--publishers", type=int, default=4)
+    parser.add_argument("--subscribers", type=int, default=4)
+    parser.add_argument("--messages", type=int, default=50_000, help="per publisher")
+    parser.add_argument("--size", type=int, default=64, help="payload bytes per message")
+    parser.add_argument("--rate", type=float, default=5000, help="messages/s per publisher, 0 = unpaced")
+    parser.add_argument("--flush-ms", type=float, default=2.0, help="client batching window")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    flush = args.flush_ms / 1000
+    topics = [f"channel:{i}" for i in range(args.publishers)]
+    expected = args.publishers * args.messages
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bus.sock")
+        broker = context.Process(target=run_broker, args=(path,), daemon=True)
+        broker.start()
+        connect(path).close()  # wait for the broker to bind
+
+        ready = context.Semaphore(0)
+        start = context.Event()
+        results = context.Queue()
+        publish_results = context.Queue()
+        subscribers = [context.Process(target=subscriber, args=(path, i, topics, expected, flush, ready, start, results))
+                       for i in range(args.subscribers)]
+        publishers = [context.Process(target=publisher,
+                                      args=(path, i, args.messages, args.size, args.rate, flush, start, publish_results))
+                      for i in range(args.publishers)]
+        for process in subscribers:
+            process.start()
+        for _ in subscribers:
+            ready.acquire()
+        for process in publishers:
+            process.start()
+        time.sleep(1.0)  # publishers connected and waiting
+        began = time.perf_counter()
+        start.set()
+        publish_times = [publish_results.get() for _ in publishers]
+        reports = [results.get() for _ in subscribers]
+        elapsed = time.perf_counter() - began
+        for process in publishers + subscribers:
+            process.join()
+        broker.terminate()
+
+    delivered = sum(count for report in reports for count, _, _, _ in report.values())
+    print(f"{args.publishers} publishers x {args.messages} messages ({args.size} B), "
+          f"{args.subscribers} subscribers, {args.flush_ms} ms batching, rate {args.rate or 'unpaced'}")
+    print(f"  publish:  {expected / max(publish_times):12,.0f} msg/s")
+    print(f"  delivery: {delivered / elapsed:12,.0f} msg/s  ({delivered} of {expected * args.subscribers})")
+    for topic in topics:
+        rows = [report[topic] for report in reports if topic in report]
+        count = sum(row[0] for row in rows)
+        spread = max((row[1] for row in rows), default=0) or float("nan")
+        p50 = max((row[2] for row in rows), default=0)
+        p99 = max((row[3] for row in rows), default=0)
+        print(f"  {topic:<12} {count:9} delivered {count / spread:12,.0f} msg/s  "
+              f"latency p50={p50 * 1000:7.2f} ms p99={p99 * 1000:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
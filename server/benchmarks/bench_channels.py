@@ -0,0 +1,85 @@
+# server/benchmarks/bench_channels.py
+# Placement cost at --channels channels: the old linear scan for the first
+# channel with room versus the ChannelManager heap under each policy. The
+# channels start full, then clients churn (one leaves at random, one joins).
+#
+#   python -m server.benchmarks.bench_channels --channels 10000
+import argparse
+import random
+import time
+from server.channels.channel_manager import ChannelManager, POLICIES
+
+
+class StubClient:
+    def __init__(self):
+        self.channel = None
+
+
+class LinearManager(ChannelManager):
+    """The pre-index placement: scan every channel under the lock."""
+    def assign_client_to_channel(self, client):
+        with self.lock:
+            for channel in self.channels.values():
+                if len(channel.clients) < channel.max_clients:
+                    channel.add_client(client)
+                    return channel
+            channel = self._create_channel()
+            channel.add_client(client)
+            return channel
+
+    def remove_client_from_channel(self, client):
+        with self.lock:
+            channel = client.channel
+            if channel:
+                channel.remove_client(client)
+
+
+def prefill(manager, channels, per_channel):
+    """Full channels plus the warm spares, without going through placement (quadratic for the scan)."""
+    clients = []
+    with manager.lock:
+        for _ in range(channels):
+            channel = manager._create_channel()
+            for _ in range(per_channel):
+                client = StubClient()
+                channel.add_client(client)
+                clients.append(client)
+        manager.spares.clear()
+        while len(manager.spares) < manager.min_spares:
+            manager._create_channel()
+        manager._rebuild()
+    return clients
+
+
+def run(label, manager, channels, per_channel, churn, rng):
+    clients = prefill(manager, channels, per_channel)
+    start = time.perf_counter()
+    for _ in range(churn):
+        index = rng.randrange(len(clients))
+        manager.remove_client_from_channel(clients[index])
+        clients[index] = StubClient()
+        manager.assign_client_to_channel(clients[index])
+    per_op = (time.perf_counter() - start) / churn
+
+    sizes = [len(c.clients) for c in manager.channels.values() if c.clients]
+    print(f"  {label:<13} {per_op * 1e6:9.2f} us per leave+join  "
+          f"channels={len(manager.channels)} occupancy min/max={min(sizes)}/{max(sizes)}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--channels", type=int, default=10000)
+    parser.add_argument("--per-channel", type=int, default=20, help="max clients per channel")
+    parser.add_argument("--churn", type=int, default=20000)
+    args = parser.parse_args()
+
+    print(f"channels={args.channels} max_clients={args.per_channel}")
+    run("linear scan", LinearManager(args.per_channel), args.channels, args.per_channel,
+        args.churn, random.Random(1))
+    for policy in POLICIES:
+        run(policy, ChannelManager(args.per_channel, policy=policy), args.channels, args.per_channel,
+            args.churn, random.Random(1))
+
+
+if __name__ == "__main__":
+    main()
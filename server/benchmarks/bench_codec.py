@@ -0,0 +1,56 @@
+# server/benchmarks/bench_codec.py
+# Size and encode/decode cost of protocol v1 (JSON) versus v2 (binary)
+# for a character_list message.
+#
+#   python -m server.benchmarks.bench_codec --characters 6
+import argparse
+import time
+from server.db.models import Character
+from server.network.protocol import JSON_CODEC, BINARY_CODEC
+
+
+def character_list_message(count):
+    characters = []
+    for i in range(count):
+        char = Character(
+            id=i + 1, user_id=1, name=f"Hero{i}", x=100 + i, y=100, map_id=100001,
+            level=i, exp=i * 1000, gold=i * 50, hp=50, mp=0,
+            str=i, dex=i, agi=i, vit=i, int=i, end=i,
+            appearance={"gender": "Male", "hair": "short"},
+            gear={"helm": None, "armor": {"def": 5, "hp": 10}, "pants": None, "accessory": None, "weapon": {"att": 7}},
+        )
+        characters.append(char.as_dict())
+    return {"action": "character_list", "user": {"id": 1, "username": "player1"}, "characters": characters}
+
+
+def measure(codec, message, iterations):
+    reader = codec.new_reader()
+    encoded = codec.encode(message)
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        codec.encode(message)
+    encode_us = (time.perf_counter() - start) / iterations * 1e6
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        reader.feed(encoded)
+        codec.decode(reader.next_frame())
+    decode_us = (time.perf_counter() - start) / iterations * 1e6
+    return len(encoded), encode_us, decode_us
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--characters", type=int, default=6)
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    message = character_list_message(args.characters)
+    for name, codec in (("json (v1)", JSON_CODEC), ("binary (v2)", BINARY_CODEC)):
+        size, encode_us, decode_us = measure(codec, message, args.iterations)
+        print(f"{name:<12} bytes={size:>6} encode={encode_us:7.2f} us decode={decode_us:7.2f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# server/benchmarks/bench_db.py
+# DB throughput of the signup, login and character creation paths from
+# concurrent threads, per engine profile. bcrypt is excluded (a precomputed
+# hash is stored) so the numbers reflect the database alone.
+#
+#   python -m server.benchmarks.bench_db --threads 16 --ops 50
+import argparse
+import os
+import tempfile
+import threading
+import time
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+from server.db import database
+from server.db.database import Base, SessionLocal, create_engine_from_config
+from server.db.models import User
+from server.db.characters import create_character
+
+PASSWORD_HASH = "$2b$12$" + "x" * 53
+
+
+def signup(index):
+    session = SessionLocal()
+    try:
+        username = f"user{index}"
+        email = f"user{index}@example.com"
+        existing = session.query(User).filter((User.username == username) | (User.email == email)).first()
+        if existing:
+            return None
+        user = User(username=username, email=email, first_name="Bench", last_name="User", password_hash=PASSWORD_HASH)
+        session.add(user)
+        session.commit()
+        return user.id
+    finally:
+        session.close()
+
+
+def login(index):
+    session = SessionLocal()
+    try:
+        stmt = select(User).options(selectinload(User.characters)).where(User.username == f"user{index}")
+        return session.execute(stmt).scalar_one_or_none()
+    finally:
+        session.close()
+
+
+def run_phase(label, threads, ops, fn):
+    errors = []
+
+    def worker(t):
+        for n in range(ops):
+            try:
+                fn(t * ops + n)
+            except Exception as e:
+                errors.append(e)
+
+    workers = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+    total = threads * ops
+    print(f"  {label:<18} {total / elapsed:9.1f} ops/s  errors={len(errors)}")
+
+
+def run_profile(profile, threads, ops):
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        engine = create_engine_from_config(url, profile)
+        engine.echo = False  # logging every statement would swamp the measurement
+        database.engine = engine
+        SessionLocal.configure(bind=engine)
+        Base.metadata.create_all(bind=engine)
+
+        user_ids = {}
+
+        def create(index):
+            user_id = user_ids.get(index)
+            if user_id is None:
+                user = login(index)
+                user_id = user_ids[index] = user.id
+            create_character(user_id, f"c{index}")
+
+        print(f"[{profile}]")
+        run_phase("signup", threads, ops, signup)
+        run_phase("login", threads, ops, login)
+        run_phase("create_character", threads, ops, create)
+        engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--profiles", default="development,production")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--ops", type=int, default=50, help="operations per thread per phase")
+    args = parser.parse_args()
+
+    for profile in args.profiles.split(","):
+        run_profile(profile, args.threads, args.ops)
+
+
+if __name__ == "__main__":
+    main()
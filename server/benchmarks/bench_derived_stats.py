@@ -0,0 +1,57 @@
+# server/benchmarks/bench_derived_stats.py
+# Derived stats for N characters: per-object (uncached and memoized)
+# versus the columnar batch API.
+#
+#   python -m server.benchmarks.bench_derived_stats --characters 10000
+import argparse
+import random
+import time
+from server.db.models import Character
+
+GEAR_SLOTS = ("helm", "armor", "pants", "accessory", "weapon")
+GEAR_STATS = ("spd", "jmp", "hp", "att_spd", "def", "mp", "att", "gravity")
+
+
+def random_character(rng):
+    gear = {
+        slot: ({stat: rng.randint(0, 20) for stat in rng.sample(GEAR_STATS, 3)} if rng.random() < 0.6 else None)
+        for slot in GEAR_SLOTS
+    }
+    gear["accessory"] = gear["accessory"] and {**gear["accessory"], "gravity": rng.choice((-0.2, 0.0, 0.1))}
+    return Character(
+        str=rng.randint(0, 200), int=rng.randint(0, 200), dex=rng.randint(0, 200),
+        vit=rng.randint(0, 200), agi=rng.randint(0, 200), end=rng.randint(0, 200), gear=gear,
+    )
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--characters", type=int, default=10000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    characters = [random_character(rng) for _ in range(args.characters)]
+    columns = {name: [getattr(c, name) for c in characters] for name in Character.DERIVED_STAT_INPUTS}
+
+    per_object, cold = timed(lambda: [c.calculate_derived_stats() for c in characters])
+    _, warm = timed(lambda: [c.calculate_derived_stats() for c in characters])
+    batch, batch_time = timed(lambda: Character.calculate_derived_stats_batch(columns))
+
+    for i, derived in enumerate(per_object):
+        assert all(batch[stat][i] == value for stat, value in derived.items()), f"mismatch at {i}"
+
+    n = args.characters
+    print(f"characters={n}")
+    print(f"per-object uncached {cold * 1000:8.2f} ms ({cold / n * 1e6:.2f} us/char)")
+    print(f"per-object memoized {warm * 1000:8.2f} ms ({warm / n * 1e6:.2f} us/char)")
+    print(f"batch (columns)     {batch_time * 1000:8.2f} ms ({batch_time / n * 1e6:.2f} us/char)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# server/benchmarks/bench_entities.py
+# Memory per entity and per-tick movement integration for a zone of N
+# entities: plain per-object attributes (the old Entity layout) versus the
+# struct-of-arrays EntityStore behind Zone.
+#
+#   python -m server.benchmarks.bench_entities --entities 50000
+import argparse
+import random
+import time
+import tracemalloc
+from server.core.utils import generate_id
+from server.core.world import Entity, Zone
+
+
+class DictEntity:
+    """The pre-store layout: every field an attribute in the instance __dict__."""
+    def __init__(self, name, x, y):
+        self.id = generate_id()
+        self.name = name
+        self.x = x
+        self.y = y
+        self.vx = 0.0
+        self.vy = 0.0
+        self.hp = 50
+        self.mp = 0
+        self.version = 0
+
+
+def build_objects(count, rng):
+    return [DictEntity(f"e{i}", rng.uniform(0, 4000), rng.uniform(0, 4000)) for i in range(count)]
+
+
+def build_views(count, rng):
+    return [Entity(f"e{i}", rng.uniform(0, 4000), rng.uniform(0, 4000), 50, 0) for i in range(count)]
+
+
+def build_zone(count, rng):
+    zone = Zone("bench", 4000, 4000)
+    for i in range(count):
+        zone.add_entity(Entity(f"e{i}", rng.uniform(0, 4000), rng.uniform(0, 4000), 50, 0))
+    return zone
+
+
+def measure(build, *args):
+    tracemalloc.start()
+    result = build(*args)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def integrate_objects(objects, dt):
+    for e in objects:
+        if e.vx or e.vy:
+            e.x += e.vx * dt
+            e.y += e.vy * dt
+            e.version += 1
+
+
+def best_of(ticks, fn, *args):
+    times = []
+    for _ in range(ticks):
+        start = time.perf_counter()
+        fn(*args)
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entities", type=int, default=50000)
+    parser.add_argument("--moving", type=float, default=1.0, help="share of entities with a velocity")
+    parser.add_argument("--ticks", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    count = args.entities
+    objects, object_bytes = measure(build_objects, count, rng)
+    views, view_bytes = measure(build_views, count, rng)
+    del views
+    zone, zone_bytes = measure(build_zone, count, rng)
+    print(f"entities={count} moving={args.moving:.0%}")
+    print(f"  objects:     {object_bytes / count:7.1f} bytes/entity")
+    print(f"  EntityStore: {view_bytes / count:7.1f} bytes/entity (view + columns)")
+    print(f"  Zone:        {zone_bytes / count:7.1f} bytes/entity (plus entity dict and spatial grid)")
+
+    moving = int(count * args.moving)
+    for e in objects[:moving]:
+        e.vx, e.vy = rng.uniform(-5, 5), rng.uniform(-5, 5)
+    for e in list(zone.entities.values())[:moving]:
+        e.set_velocity(rng.uniform(-5, 5), rng.uniform(-5, 5))
+
+    dt = 1 / 30
+    store = zone.store
+    print(f"  objects     integrate: {best_of(args.ticks, integrate_objects, objects, dt):8.2f} ms/tick")
+    print(f"  EntityStore integrate: {best_of(args.ticks, store.integrate, dt):8.2f} ms/tick (arrays only)")
+    print(f"  Zone        integrate: {best_of(args.ticks, zone.integrate, dt):8.2f} ms/tick (with grid upkeep)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# server/benchmarks/bench_login.py
+# Logins per second through ClientSession.handle_login with bcrypt run
+# inline on the connection threads (old behavior) versus on the password pool.
+#
+#   python -m server.benchmarks.bench_login --users 32 --threads 32
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+if __name__ == "__main__":
+    # Point the app at a scratch database before anything imports the engine
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_login.db')}"
+
+from server.db.database import init_db, SessionLocal, pwd_context
+from server.db.models import User
+from server.db.passwords import password_pool
+from server.network import client_handler
+from server.network.client_handler import ClientSession
+
+PASSWORD = "benchmark-password"
+
+
+class InlinePasswords:
+    """The pre-pool behavior: bcrypt on the calling thread."""
+    def hash(self, password):
+        return pwd_context.hash(password)
+
+    def verify(self, password, password_hash):
+        return pwd_context.verify(password, password_hash)
+
+
+class StubSession(ClientSession):
+    def __init__(self):
+        super().__init__(address="bench")
+
+    def send_bytes(self, data: bytes):
+        pass
+
+    def queue_stats(self):
+        return {}
+
+    def disconnect(self):
+        pass
+
+
+def create_users(count):
+    password_hash = pwd_context.hash(PASSWORD)
+    session = SessionLocal()
+    try:
+        for i in range(count):
+            session.add(User(username=f"benchuser{i}", email=f"bench{i}@example.com", password_hash=password_hash))
+        session.commit()
+    finally:
+        session.close()
+
+
+def run(label, passwords, users, threads, logins_per_thread):
+    client_handler.password_pool = passwords
+    counts = {"ok": 0, "rejected": 0}
+    lock = threading.Lock()
+
+    def worker(index):
+        for n in range(logins_per_thread):
+            session = StubSession()
+            session.handle_login({"username": f"benchuser{(index + n) % users}", "password": PASSWORD})
+            with lock:
+                counts["ok" if session.user_id else "rejected"] += 1
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<8} logins/s={counts['ok'] / elapsed:8.1f} ok={counts['ok']} rejected={counts['rejected']} elapsed={elapsed:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=32)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--logins", type=int, default=4, help="logins per thread")
+    args = parser.parse_args()
+
+    init_db()
+    create_users(args.users)
+    password_pool.start()
+    password_pool.verify(PASSWORD, pwd_context.hash(PASSWORD))  # warm up a worker
+    print(f"cpus={os.cpu_count()} pool_workers={password_pool.workers} max_pending={password_pool.max_pending}", file=sys.stderr)
+    try:
+        run("inline", InlinePasswords(), args.users, args.threads, args.logins)
+        run("pool", password_pool, args.users, args.threads, args.logins)
+    finally:
+        password_pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
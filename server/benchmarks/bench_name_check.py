@@ -0,0 +1,79 @@
+# server/benchmarks/bench_name_check.py
+# check_name latency against a characters table of --rows rows, before and
+# after migration 2 adds the characters.name / characters.user_id indexes.
+#
+#   python -m server.benchmarks.bench_name_check --rows 1000000
+import argparse
+import os
+import tempfile
+import time
+from sqlalchemy import insert, text
+from server.db.database import Base, SessionLocal, create_engine_from_config
+from server.db.models import User, Character
+from server.db.characters import check_name
+from server.db.migrations import MIGRATIONS, migrate
+
+
+def populate(engine, rows, batch=50000):
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"id": 1, "username": "benchowner", "email": "owner@example.com"}])
+        for start in range(0, rows, batch):
+            conn.execute(insert(Character.__table__), [
+                {"user_id": 1 + (i % 1000), "name": f"n{i}", "appearance": {}, "gear": {}}
+                for i in range(start, min(start + batch, rows))
+            ])
+
+
+def drop_lookup_indexes(engine):
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX IF EXISTS ix_characters_name"))
+        conn.execute(text("DROP INDEX IF EXISTS ix_characters_user_id"))
+        # Pretend the database predates migration 2
+        conn.execute(text("CREATE TABLE IF NOT EXISTS schema_migrations (version INTEGER PRIMARY KEY, description VARCHAR)"))
+        conn.execute(text("INSERT INTO schema_migrations (version, description) VALUES (:v, :d)"),
+                     {"v": MIGRATIONS[0][0], "d": MIGRATIONS[0][1]})
+
+
+def time_checks(names):
+    latencies = []
+    for name in names:
+        start = time.perf_counter()
+        check_name(name)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return latencies[len(latencies) // 2] * 1000, latencies[int(len(latencies) * 0.99)] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--checks", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine_from_config(f"sqlite:///{os.path.join(tmp, 'names.db')}", "production")
+        SessionLocal.configure(bind=engine)
+        Base.metadata.create_all(bind=engine)
+        drop_lookup_indexes(engine)
+
+        start = time.perf_counter()
+        populate(engine, args.rows)
+        print(f"populated {args.rows} characters in {time.perf_counter() - start:.1f}s")
+
+        # Half taken names, half free ones
+        names = [f"n{(i * 7919) % args.rows}" if i % 2 else f"free{i}" for i in range(args.checks)]
+
+        p50, p99 = time_checks(names)
+        print(f"no index:   check_name p50={p50:8.3f} ms p99={p99:8.3f} ms")
+
+        start = time.perf_counter()
+        migrate(engine)
+        print(f"migration 2 took {time.perf_counter() - start:.1f}s")
+
+        p50, p99 = time_checks(names)
+        print(f"with index: check_name p50={p50:8.3f} ms p99={p99:8.3f} ms")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
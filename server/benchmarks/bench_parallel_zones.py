@@ -0,0 +1,66 @@
+# server/benchmarks/bench_parallel_zones.py
+# Zone tick time, serial (Zone.integrate in one thread, as the engine does
+# without GAME_ZONE_WORKERS) against a ZonePool, for a growing number of
+# zones with --entities each (--moving of them moving). Also checks that
+# both end in the same state: positions, versions and grid cells.
+# Scaling needs as many free cores as workers.
+#
+#   python -m server.benchmarks.bench_parallel_zones --entities 20000 --ticks 100
+import argparse
+import os
+import time
+from server.core.metrics import Histogram
+from server.core.zone_pool import ZonePool
+from server.tests.zones import build_zones, same_state
+
+DT = 1 / 30
+
+
+def main():
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entities", type=int, default=20_000, help="per zone")
+    parser.add_argument("--moving", type=float, default=0.5, help="fraction of entities moving")
+    parser.add_argument("--ticks", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=cpus)
+    parser.add_argument("--max-zones", type=int, default=max(2, cpus * 2))
+    args = parser.parse_args()
+
+    print(f"{args.entities} entities per zone ({args.moving:.0%} moving), {args.ticks} ticks, {cpus} cpus")
+    counts = []
+    count = 1
+    while count <= args.max_zones:
+        counts.append(count)
+        count *= 2
+
+    for count in counts:
+        serial = build_zones(count, args.entities, args.moving)
+        start = time.perf_counter()
+        for _ in range(args.ticks):
+            for zone in serial.values():
+                zone.integrate(DT)
+        serial_ms = (time.perf_counter() - start) * 1000 / args.ticks
+
+        pool = ZonePool(min(count, args.workers))
+        pool.start()
+        try:
+            parallel = build_zones(count, args.entities, args.moving, allocator=pool.allocator)
+            pool.tick(parallel, 0.0)  # attach every zone before timing
+            pool.barrier = Histogram()
+            start = time.perf_counter()
+            for _ in range(args.ticks):
+                pool.tick(parallel, DT)
+            parallel_ms = (time.perf_counter() - start) * 1000 / args.ticks
+            for zone in serial.values():
+                zone.integrate(0.0)  # match the untimed attach tick's version bump
+            intact = all(same_state(parallel[name], serial[name]) for name in serial)
+            barrier_p99 = pool.barrier.percentile(99) * 1000
+        finally:
+            pool.stop()
+
+        print(f"  {count:3} zones  serial {serial_ms:8.2f} ms/tick  pool({pool.worker_count}) {parallel_ms:8.2f} ms/tick  "
+              f"x{serial_ms / parallel_ms:5.2f}  barrier p99 {barrier_p99:7.2f} ms  match: {intact}")
+
+
+if __name__ == "__main__":
+    main()
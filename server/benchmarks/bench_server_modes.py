@@ -0,0 +1,127 @@
+# server/benchmarks/bench_server_modes.py
+# Compare the threaded and asyncio servers: RSS / thread count versus open
+# connections, and ping round-trip latency (p50/p99) at each level.
+#
+#   python -m server.benchmarks.bench_server_modes --levels 100,500,1000,2000
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def proc_status(pid):
+    """Return (rss_kb, threads) from /proc; (None, None) where unavailable."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+        return int(fields["VmRSS"].split()[0]), int(fields["Threads"])
+    except OSError:
+        return None, None
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def start_server(mode, port, db_path):
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{db_path}")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "server.app", "--mode", mode, "--host", "127.0.0.1", "--port", str(port)],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 15
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError(f"{mode} server did not start")
+
+
+async def open_connections(port, count, batch=100):
+    conns = []
+    while len(conns) < count:
+        n = min(batch, count - len(conns))
+        conns += await asyncio.gather(*[asyncio.open_connection("127.0.0.1", port) for _ in range(n)])
+    return conns
+
+
+async def ping_all(conns, pings):
+    latencies = []
+
+    async def ping(reader, writer):
+        for i in range(pings):
+            start = time.perf_counter()
+            writer.write(json.dumps({"action": "ping", "data": {"seq": i}}).encode() + b"\n")
+            await reader.readline()
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*[ping(r, w) for r, w in conns])
+    return latencies
+
+
+async def run_mode(mode, levels, pings):
+    port = free_port()
+    with tempfile.TemporaryDirectory() as tmp:
+        proc = start_server(mode, port, os.path.join(tmp, "bench.db"))
+        conns = []
+        try:
+            time.sleep(0.5)
+            base_rss, base_threads = proc_status(proc.pid)
+            print(f"[{mode}] idle: rss={base_rss} kB threads={base_threads}")
+            for level in levels:
+                conns += await open_connections(port, level - len(conns))
+                latencies = await ping_all(conns, pings)
+                rss, threads = proc_status(proc.pid)
+                print(
+                    f"[{mode}] conns={level:>6} rss={rss} kB threads={threads} "
+                    f"p50={percentile(latencies, 50) * 1000:.2f} ms "
+                    f"p99={percentile(latencies, 99) * 1000:.2f} ms"
+                )
+        finally:
+            for _, writer in conns:
+                writer.close()
+            proc.terminate()
+            proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modes", default="threaded,asyncio")
+    parser.add_argument("--levels", default="100,500,1000")
+    parser.add_argument("--pings", type=int, default=5)
+    args = parser.parse_args()
+
+    levels = sorted(int(x) for x in args.levels.split(","))
+    if resource is not None:
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    for mode in args.modes.split(","):
+        asyncio.run(run_mode(mode, levels, args.pings))
+
+
+if __name__ == "__main__":
+    main()
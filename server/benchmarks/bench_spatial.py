@@ -0,0 +1,74 @@
+# server/benchmarks/bench_spatial.py
+# Per-tick cost of "who is near each entity" for a zone of N entities:
+# every entity moves, then looks up its neighbours within --radius, using
+# the zone's spatial grid versus a scan of all entities. The full scan is
+# O(N^2), so above --scan-limit it is timed on a sample and extrapolated.
+#
+#   python -m server.benchmarks.bench_spatial --entities 1000,10000,50000
+import argparse
+import random
+import time
+from server.core.world import Entity, Zone
+
+
+def make_zone(count, size, cell_size):
+    zone = Zone("bench", size, size, cell_size)
+    rng = random.Random(count)
+    for i in range(count):
+        zone.add_entity(Entity(f"e{i}", rng.uniform(0, size), rng.uniform(0, size)))
+    return zone
+
+
+def scan(entities, x, y, radius):
+    r2 = radius * radius
+    return [e for e in entities if (e.x - x) ** 2 + (e.y - y) ** 2 <= r2]
+
+
+def grid_tick(zone, entities, radius, rng):
+    start = time.perf_counter()
+    for e in entities:
+        e.move(rng.uniform(-2, 2), rng.uniform(-2, 2))
+    neighbours = 0
+    for e in entities:
+        neighbours += len(zone.query_radius(e.x, e.y, radius))
+    return time.perf_counter() - start, neighbours / len(entities)
+
+
+def scan_tick(entities, radius, sample):
+    sampled = entities[:sample]
+    start = time.perf_counter()
+    for e in sampled:
+        scan(entities, e.x, e.y, radius)
+    return (time.perf_counter() - start) * len(entities) / len(sampled)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entities", default="1000,10000,50000")
+    parser.add_argument("--density", type=float, default=1 / 400, help="entities per square unit")
+    parser.add_argument("--radius", type=float, default=100)
+    parser.add_argument("--cell-size", type=int, default=64)
+    parser.add_argument("--ticks", type=int, default=5)
+    parser.add_argument("--scan-limit", type=int, default=2000, help="entities scanned per tick before sampling")
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    for count in map(int, args.entities.split(",")):
+        # Same density at every size, so neighbours per entity stay constant
+        size = int((count / args.density) ** 0.5)
+        zone = make_zone(count, size, args.cell_size)
+        entities = zone.get_entities()
+
+        grid_times = []
+        for _ in range(args.ticks):
+            elapsed, avg = grid_tick(zone, entities, args.radius, rng)
+            grid_times.append(elapsed)
+        grid_ms = min(grid_times) * 1000
+        scan_ms = scan_tick(entities, args.radius, min(count, args.scan_limit)) * 1000
+        estimated = "~" if count > args.scan_limit else " "
+        print(f"entities={count:6d} zone={size}x{size} neighbours/entity={avg:5.1f}  "
+              f"grid tick={grid_ms:9.1f} ms  scan tick={estimated}{scan_ms:10.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
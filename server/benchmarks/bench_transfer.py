@@ -0,0 +1,115 @@
+# server/benchmarks/bench_transfer.py
+# Live channel transfer: --players spawned and moving on one channel, which
+# is then drained onto the others with ChannelManager.drain_channel. Reports
+# per-player transfer latency (request to state live on the target engine)
+# and checks that every player arrives with its position and velocity intact.
+# A transfer takes a tick boundary on each side, so latency tracks the tick
+# time of the source and target engines (printed alongside).
+#
+#   python -m server.benchmarks.bench_transfer --players 500
+import argparse
+import threading
+import time
+from server.channels.channel_manager import ChannelManager, LEAST_LOADED
+from server.core.game_engine import GameEngine
+from server.core.game_state import GameState
+from server.network.client_handler import ClientSession
+
+
+class BenchClient(ClientSession):
+    """A logged-in session with no socket; counts what it would have sent."""
+    def __init__(self, user_id):
+        super().__init__()
+        self.user_id = user_id
+        self.username = f"p{user_id}"
+        self.sent = 0
+
+    def send_bytes(self, data: bytes):
+        self.sent += 1
+
+    def queue_stats(self) -> dict:
+        return {"messages": 0, "bytes": 0, "dropped": 0, "lagging": False}
+
+    def disconnect(self):
+        self.leave_game()
+
+
+def wait_for(predicate, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise TimeoutError("timed out")
+        time.sleep(0.005)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--players", type=int, default=500)
+    parser.add_argument("--per-channel", type=int, default=200, help="channel capacity")
+    args = parser.parse_args()
+
+    manager = ChannelManager(max_clients_per_channel=args.per_channel, policy=LEAST_LOADED, min_spares=1,
+                             max_spares=8, engine_factory=lambda cid: GameEngine(GameState(), name=f"channel-{cid}"))
+    hot = manager.create_channel()
+    hot.max_clients = args.players  # overfull on purpose
+    players = hot.engine.game_state.players
+    hot.engine.register_command("set_velocity", lambda user_id, vx, vy: players[user_id]["entity"].set_velocity(vx, vy))
+    hot.engine.register_command("call", lambda fn: fn())
+    clients = [BenchClient(user_id) for user_id in range(1, args.players + 1)]
+    for client in clients:
+        hot.add_client(client)
+        client.enter_game()
+        hot.engine.submit("spawn_player", client.user_id,
+                          {"id": client.user_id, "name": client.username, "x": client.user_id * 37 % 4000,
+                           "y": client.user_id * 91 % 4000, "map_id": 1, "stats": {"HP": 50, "MP": 10}})
+        hot.engine.submit("set_velocity", client.user_id, 1.0, 0.0)
+    with manager.lock:
+        manager._placed(hot)
+    wait_for(lambda: sum("entity" in p for p in list(players.values())) == args.players)
+
+    # Let a few ticks pass, then snapshot where everyone is
+    time.sleep(0.2)
+    before = {}
+    snapshot = threading.Event()
+
+    def take_snapshot():
+        for user_id, player in players.items():
+            entity = player["entity"]
+            before[user_id] = (entity.x, entity.vx, entity.hp)
+        snapshot.set()
+
+    hot.engine.submit("call", take_snapshot)
+    snapshot.wait(5)
+
+    arrived = []
+    start = time.perf_counter()
+    moved = manager.drain_channel(hot.channel_id, on_done=arrived.append)
+    wait_for(lambda: len(arrived) == moved)
+    elapsed = time.perf_counter() - start
+
+    intact = 0
+    for client in clients:
+        player = client.engine.game_state.players.get(client.user_id)
+        entity = player and player.get("entity")
+        x, vx, hp = before[client.user_id]
+        if entity is not None and entity.x >= x and entity.vx == vx and entity.hp == hp:
+            intact += 1
+
+    latencies = sorted(arrived)
+    source_tick = hot.engine.tick_duration.percentile(50)
+    stats = manager.stats()
+    print(f"drained {moved} players off channel {hot.channel_id} in {elapsed * 1000:.1f} ms "
+          f"onto {stats['channels'] - 1} channels")
+    print(f"  latency p50={latencies[len(latencies) // 2] * 1000:.2f} ms "
+          f"p99={latencies[int(len(latencies) * 0.99)] * 1000:.2f} ms max={latencies[-1] * 1000:.2f} ms "
+          f"(source tick p50={source_tick * 1000:.2f} ms, interval {hot.engine.tick_interval * 1000:.1f} ms)")
+    print(f"  state intact: {intact}/{args.players}, still on source: {len(hot.clients)}, "
+          f"aoi updates per client: {sum(c.sent for c in clients) / len(clients):.1f}")
+
+    with manager.lock:
+        for channel_id in list(manager.channels):
+            manager._destroy(channel_id)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,382 @@
+# server/channels/bus.py
+# Local pub/sub between channel processes: a broker process routes messages
+# over Unix sockets to the clients subscribed to their topic.
+#
+# Topics: "global", "channel:<id>", "user:<username>", "party:<name>".
+# Frames are a 4-byte length followed by a JSON list; clients send lists of
+# ops (["sub", topic], ["unsub", topic], ["pub", topic, message, sent_at])
+# and receive lists of deliveries ([topic, message, sent_at]). Both sides
+# batch: everything queued within BUS_FLUSH_INTERVAL goes out as one frame.
+import json
+import selectors
+import socket
+import struct
+import threading
+import time
+from collections import Counter, defaultdict
+from server.config import BUS_FLUSH_INTERVAL, BUS_BATCH_BYTES, BUS_MAX_BUFFER
+from server.core.metrics import Histogram
+from server.network.broadcast import broadcast
+
+HEADER = struct.Struct("!I")  # payload length
+READ_SIZE = 256 * 1024
+
+
+def topic_kind(topic: str) -> str:
+    return topic.partition(":")[0]
+
+
+def deliver(clients, topic: str, message: dict) -> int:
+    """Hand a bus message to the local clients its topic addresses."""
+    kind, _, key = topic.partition(":")
+    if kind == "user":
+        where = lambda client: client.username == key
+    elif kind == "party":
+        where = lambda client: client.party == key
+    else:
+        where = None  # global, or this process's channel
+    return broadcast(clients, message, where=where)
+
+
+def frame(items) -> bytes:
+    """Length-prefixed JSON list from already-encoded items."""
+    payload = b"[" + b",".join(items) + b"]"
+    return HEADER.pack(len(payload)) + payload
+
+
+def read_frames(buffer: bytearray):
+    """Pop every complete frame's payload off the front of buffer."""
+    while len(buffer) >= HEADER.size:
+        (size,) = HEADER.unpack_from(buffer)
+        end = HEADER.size + size
+        if len(buffer) < end:
+            return
+        payload = bytes(buffer[HEADER.size:end])
+        del buffer[:end]
+        yield payload
+
+
+class _Connection:
+    __slots__ = ("sock", "inbuf", "outbox", "outbuf", "topics", "writing", "closed")
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.inbuf = bytearray()
+        self.outbox = []  # encoded deliveries waiting for this pass's frame
+        self.outbuf = bytearray()  # framed bytes the socket hasn't taken yet
+        self.topics = set()
+        self.writing = False
+        self.closed = False
+
+
+class BusBroker:
+    """
+    Routes each published message to the connections subscribed to its topic.
+    Single-threaded on a selector: a message is encoded once whatever its
+    fan-out, and each connection's deliveries from one pass leave as one frame.
+    Subscribers more than max_buffer bytes behind are dropped.
+    """
+    def __init__(self, path: str, max_buffer=BUS_MAX_BUFFER):
+        self.path = path
+        self.max_buffer = max_buffer
+        self.selector = selectors.DefaultSelector()
+        self.subscribers = defaultdict(set)  # topic -> connections
+        self.dirty = set()  # connections with deliveries queued this pass
+        self.published = Counter()  # topic -> messages
+        self.delivered = Counter()  # topic -> messages x subscribers
+        self.running = False
+
+    def serve(self):
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(self.path)
+        listener.listen()
+        listener.setblocking(False)
+        self.selector.register(listener, selectors.EVENT_READ)
+        self.running = True
+        try:
+            while self.running:
+                for key, events in self.selector.select():
+                    if key.data is None:
+                        self.accept(listener)
+                        continue
+                    connection = key.data
+                    if events & selectors.EVENT_READ:
+                        self.read(connection)
+                    if events & selectors.EVENT_WRITE and not connection.closed:
+                        self.write(connection)
+                for connection in self.dirty:
+                    if not connection.closed:
+                        self.flush(connection)
+                self.dirty.clear()
+        finally:
+            for key in list(self.selector.get_map().values()):
+                key.fileobj.close()
+            self.selector.close()
+
+    def stop(self):
+        self.running = False
+
+    def accept(self, listener):
+        try:
+            sock, _ = listener.accept()
+        except BlockingIOError:
+            return
+        sock.setblocking(False)
+        connection = _Connection(sock)
+        self.selector.register(sock, selectors.EVENT_READ, connection)
+
+    def read(self, connection):
+        try:
+            data = connection.sock.recv(READ_SIZE)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+        if not data:
+            self.drop(connection)
+            return
+        connection.inbuf += data
+        try:
+            for payload in read_frames(connection.inbuf):
+                self.handle(connection, json.loads(payload))
+        except (ValueError, TypeError, IndexError) as e:
+            print(f"[!] Bus: dropping connection after a bad frame: {e}")
+            self.drop(connection)
+
+    def handle(self, connection, ops):
+        for op in ops:
+            kind, topic = op[0], op[1]
+            if kind == "pub":
+                self.publish(topic, op[2], op[3])
+            elif kind == "sub":
+                self.subscribers[topic].add(connection)
+                connection.topics.add(topic)
+            elif kind == "unsub":
+                self.unsubscribe(connection, topic)
+
+    def publish(self, topic, message, sent_at):
+        self.published[topic] += 1
+        targets = self.subscribers.get(topic)
+        if not targets:
+            return
+        entry = json.dumps([topic, message, sent_at]).encode()
+        for target in targets:
+            target.outbox.append(entry)
+        self.dirty.update(targets)
+        self.delivered[topic] += len(targets)
+
+    def unsubscribe(self, connection, topic):
+        connection.topics.discard(topic)
+        subscribers = self.subscribers.get(topic)
+        if subscribers is not None:
+            subscribers.discard(connection)
+            if not subscribers:
+                del self.subscribers[topic]
+
+    def flush(self, connection):
+        connection.outbuf += frame(connection.outbox)
+        connection.outbox.clear()
+        if len(connection.outbuf) > self.max_buffer:
+            print(f"[!] Bus: dropping a subscriber {len(connection.outbuf)} bytes behind")
+            self.drop(connection)
+            return
+        self.write(connection)
+
+    def write(self, connection):
+        try:
+            sent = connection.sock.send(connection.outbuf)
+        except BlockingIOError:
+            sent = 0
+        except OSError:
+            self.drop(connection)
+            return
+        del connection.outbuf[:sent]
+        writing = bool(connection.outbuf)
+        if writing != connection.writing:
+            connection.writing = writing
+            events = selectors.EVENT_READ | (selectors.EVENT_WRITE if writing else 0)
+            self.selector.modify(connection.sock, events, connection)
+
+    def drop(self, connection):
+        if connection.closed:
+            return
+        connection.closed = True
+        for topic in list(connection.topics):
+            self.unsubscribe(connection, topic)
+        self.selector.unregister(connection.sock)
+        connection.sock.close()
+
+    def stats(self) -> dict:
+        return {"topics": len(self.subscribers),
+                "published": sum(self.published.values()),
+                "delivered": sum(self.delivered.values())}
+
+
+def run_broker(path: str):
+    """Broker process entry point."""
+    try:
+        BusBroker(path).serve()
+    except KeyboardInterrupt:
+        pass
+
+
+def connect(path: str, timeout=10.0) -> socket.socket:
+    """Connect to a Unix socket, waiting up to timeout for it to be bound."""
+    deadline = time.monotonic() + timeout
+    while True:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(path)
+            return sock
+        except (FileNotFoundError, ConnectionRefusedError):
+            sock.close()
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+class BusClient:
+    """
+    A process's connection to the broker. publish() never blocks on the
+    socket: ops are queued and a writer thread sends them as one frame per
+    BUS_FLUSH_INTERVAL (sooner once batch_bytes are waiting). Deliveries
+    are passed to on_message(topic, message) on the reader thread.
+    Subscriptions are counted, so several local sessions can share a topic.
+    Latency is publish-to-delivery, per topic kind (monotonic clocks agree
+    across processes on one host).
+    """
+    def __init__(self, path: str, on_message, flush_interval=BUS_FLUSH_INTERVAL, batch_bytes=BUS_BATCH_BYTES):
+        self.sock = connect(path)
+        self.on_message = on_message
+        self.flush_interval = flush_interval
+        self.batch_bytes = batch_bytes
+        self.cond = threading.Condition()
+        self.pending = []
+        self.pending_bytes = 0
+        self.closed = False
+        self.subscriptions = Counter()
+        self.published = 0
+        self.received = 0
+        self.latency = defaultdict(Histogram)  # topic kind -> seconds
+        self.writer = threading.Thread(target=self.write_loop, name="bus-writer", daemon=True)
+        self.reader = threading.Thread(target=self.read_loop, name="bus-reader", daemon=True)
+        self.writer.start()
+        self.reader.start()
+
+    def publish(self, topic: str, message: dict):
+        self.queue(json.dumps(["pub", topic, message, time.monotonic()]).encode())
+        with self.cond:
+            self.published += 1
+
+    def subscribe(self, topic: str):
+        with self.cond:
+            self.subscriptions[topic] += 1
+            if self.subscriptions[topic] == 1:
+                self.queue(json.dumps(["sub", topic]).encode())
+
+    def unsubscribe(self, topic: str):
+        with self.cond:
+            if not self.subscriptions[topic]:
+                return
+            self.subscriptions[topic] -= 1
+            if not self.subscriptions[topic]:
+                del self.subscriptions[topic]
+                self.queue(json.dumps(["unsub", topic]).encode())
+
+    def queue(self, op: bytes):
+        with self.cond:
+            if self.closed:
+                return
+            self.pending.append(op)
+            self.pending_bytes += len(op)
+            if len(self.pending) == 1 or self.pending_bytes >= self.batch_bytes:
+                self.cond.notify()
+
+    def write_loop(self):
+        while True:
+            with self.cond:
+                while not self.pending and not self.closed:
+                    self.cond.wait()
+                if not self.pending:
+                    return
+                if self.pending_bytes < self.batch_bytes and not self.closed:
+                    self.cond.wait(self.flush_interval)  # let the batch fill
+                batch, self.pending, self.pending_bytes = self.pending, [], 0
+            try:
+                self.sock.sendall(frame(batch))
+            except OSError:
+                with self.cond:
+                    self.closed = True
+                    self.pending.clear()
+                return
+
+    def read_loop(self):
+        buffer = bytearray()
+        try:
+            while data := self.sock.recv(READ_SIZE):
+                buffer += data
+                for payload in read_frames(buffer):
+                    now = time.monotonic()
+                    for topic, message, sent_at in json.loads(payload):
+                        self.received += 1
+                        self.latency[topic_kind(topic)].observe(now - sent_at)
+                        try:
+                            self.on_message(topic, message)
+                        except Exception as e:
+                            print(f"[!] Bus: handler failed for {topic}: {e}")
+        except OSError:
+            pass
+        if not self.closed:
+            print("[!] Bus: connection to the broker lost")
+
+    def close(self, timeout=1.0):
+        """Send what is queued, then disconnect."""
+        with self.cond:
+            self.closed = True
+            self.cond.notify()
+        self.writer.join(timeout)
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+    def stats(self) -> dict:
+        return {
+            "published": self.published,
+            "received": self.received,
+            "pending": len(self.pending),
+            "latency_p99_ms": {kind: round(h.percentile(99) * 1000, 3) for kind, h in list(self.latency.items())},
+        }
+
+
+class LocalBus:
+    """BusClient's interface within one process, for single-process servers."""
+    def __init__(self, on_message):
+        self.on_message = on_message
+        self.subscriptions = Counter()
+        self.lock = threading.Lock()
+        self.published = 0
+
+    def publish(self, topic: str, message: dict):
+        with self.lock:
+            self.published += 1
+        if self.subscriptions[topic]:
+            self.on_message(topic, message)
+
+    def subscribe(self, topic: str):
+        with self.lock:
+            self.subscriptions[topic] += 1
+
+    def unsubscribe(self, topic: str):
+        with self.lock:
+            if self.subscriptions[topic] > 1:
+                self.subscriptions[topic] -= 1
+            else:
+                self.subscriptions.pop(topic, None)
+
+    def close(self, timeout=1.0):
+        pass
+
+    def stats(self) -> dict:
+        return {"published": self.published, "topics": len(self.subscriptions)}
@@ -0,0 +1,69 @@
+# server/channels/channel_game.py
+# Channels in one process: players are placed into channels by a
+# ChannelManager, each channel ticks its own GameEngine, and a player can
+# move to another channel (change_channel) without reconnecting.
+from server.channels.channel_manager import ChannelManager
+from server.config import CHANNEL_SIZE
+from server.core.game_engine import GameEngine
+from server.core.game_state import GameState
+from server.network.client_handler import ClientHandler
+from server.network.server import GameServer
+
+
+class ChannelClientHandler(ClientHandler):
+    """A session whose player lives in the channel the manager places it in."""
+    def handle_message(self, message: dict):
+        if isinstance(message, dict) and message.get("action") == "change_channel":
+            self.handle_change_channel(message.get("data", {}))
+            return
+        super().handle_message(message)
+
+    def handle_change_channel(self, data):
+        """Move to channel data["channel"], or wherever the policy places us; channel_changed follows."""
+        if not self.in_game:
+            self.send_error("Not logged in")
+            return
+        target = data.get("channel")
+        if target is not None and (not isinstance(target, int) or isinstance(target, bool)):
+            self.send_error("Invalid channel")
+            return
+        try:
+            channel = self.server.channels.transfer(self, target)
+        except ValueError as e:
+            self.send_error(str(e))
+            return
+        if channel is None:
+            self.send_error("Channel unavailable")
+
+    def enter_game(self):
+        if self.channel is None:
+            self.server.channels.assign_client_to_channel(self)
+        super().enter_game()
+
+    def leave_game(self):
+        super().leave_game()
+        self.server.channels.remove_client_from_channel(self)
+
+
+class ChannelGameServer(GameServer):
+    """Runs the world as channels of up to per_channel players, each with its own engine."""
+    handler_class = ChannelClientHandler
+    zone_workers = 0  # the channels' engines tick serially; the server's own engine is unused
+
+    def __init__(self, host="0.0.0.0", port=5000, max_clients=50, per_channel=CHANNEL_SIZE):
+        super().__init__(host, port, max_clients)
+        self.engine = None  # the world runs in the channels' engines
+        self.game_state = None
+        self.channels = ChannelManager(per_channel, engine_factory=self.create_engine)
+
+    @staticmethod
+    def create_engine(channel_id: int) -> GameEngine:
+        return GameEngine(GameState(), name=f"channel-{channel_id}")
+
+    def drain_channel(self, channel_id: int) -> int:
+        """Move everyone off a channel, e.g. one overrunning its tick."""
+        return self.channels.drain_channel(channel_id)
+
+    def stop(self):
+        super().stop()
+        self.channels.stop()
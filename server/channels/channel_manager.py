@@ -1,47 +1,318 @@
 # server/channels/channel_manager.py
+import heapq
+import threading
+import time
+from collections import Counter
 from server.channels.channel_server import ChannelServer
+from server.core.metrics import Histogram
 from server.network.client_handler import ClientHandler
-import threading
+from server.config import (CHANNEL_POLICY, CHANNEL_MIN_SPARES, CHANNEL_MAX_SPARES,
+                           CHANNEL_LOAD_REFRESH, CHANNEL_TICK_WEIGHT)
+
+FILL_FIRST = "fill_first"      # lowest channel id with room: packs players together
+LEAST_LOADED = "least_loaded"  # fewest players
+TICK_AWARE = "tick_aware"      # lowest occupancy share + tick budget share
+POLICIES = (FILL_FIRST, LEAST_LOADED, TICK_AWARE)
 
 class ChannelManager:
-    def __init__(self, max_clients_per_channel=100):
+    """
+    Places clients into channels through a min-heap keyed by the policy.
+    Entries are invalidated lazily: every change to a channel bumps its stamp
+    and pushes a fresh entry, and stale ones are skipped when popped, so
+    placement is O(log n). Only occupied channels with room (and, under
+    tick_aware, not overrunning their tick) are in the heap; when none can
+    take a player, one of the warm spare channels opens. Between min_spares
+    and max_spares empty channels are kept instead of being destroyed and
+    recreated as players churn.
+
+    transfer() moves a player to another channel without reconnecting: the
+    source engine exports its state at a tick boundary and the target engine
+    imports it at its next one, while the connection (and its outbound queue)
+    stays as it is. drain_channel() moves everyone off a channel that way.
+    """
+    def __init__(self, max_clients_per_channel=100, policy=CHANNEL_POLICY, min_spares=CHANNEL_MIN_SPARES,
+                 max_spares=CHANNEL_MAX_SPARES, engine_factory=None):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown placement policy: {policy}")
+        if max_spares < min_spares:
+            raise ValueError("max_spares must be at least min_spares")
         self.channels = {}  # channel_id -> ChannelServer
         self.lock = threading.Lock()
         self.max_clients_per_channel = max_clients_per_channel
         self.next_channel_id = 1
+        self.policy = policy
+        self.min_spares = min_spares
+        self.max_spares = max_spares
+        self.engine_factory = engine_factory  # channel_id -> GameEngine, or None for engine-less channels
+
+        self.heap = []  # (key, channel_id, stamp)
+        self.stamps = {}  # channel_id -> stamp of its live heap entry
+        self.spares = set()  # ids of empty channels
+        self.tick_loads = {}  # channel_id -> last sampled tick load (tick_aware)
+        self.loads_sampled = 0.0
+        self.next_stamp = 0
+
+        self.draining = set()  # ids of channels not taking players while they empty
+        self.transit_lock = threading.Lock()  # engine threads finish transfers; never held while joining one
+        self.in_transit = Counter()  # source channel_id -> transfers not yet imported
+        self.arriving = {}  # client -> target channel, until its routing switches over
+        self.transfers = 0
+        self.transfer_latency = Histogram()  # transfer() call to state imported
 
     def create_channel(self):
         """Create a new channel and return it."""
         with self.lock:
-            channel_id = self.next_channel_id
-            self.next_channel_id += 1
-            channel = ChannelServer(channel_id, self.max_clients_per_channel)
-            self.channels[channel_id] = channel
-            return channel
+            return self._create_channel()
+
+    def _create_channel(self):
+        channel_id = self.next_channel_id
+        self.next_channel_id += 1
+        engine = self.engine_factory(channel_id) if self.engine_factory else None
+        channel = ChannelServer(channel_id, self.max_clients_per_channel, engine)
+        if engine is not None:
+            engine.start()
+        self.channels[channel_id] = channel
+        self.spares.add(channel_id)
+        self._index(channel)
+        return channel
 
     def get_channel(self, channel_id):
         """Retrieve a channel by its ID."""
         return self.channels.get(channel_id)
 
+    def _key(self, channel):
+        if self.policy == FILL_FIRST:
+            return channel.channel_id
+        if self.policy == LEAST_LOADED:
+            return len(channel.clients)
+        occupancy = len(channel.clients) / channel.max_clients
+        return occupancy + CHANNEL_TICK_WEIGHT * self.tick_loads.get(channel.channel_id, 0.0)
+
+    def _placeable(self, channel) -> bool:
+        if channel.channel_id in self.draining:
+            return False
+        if not 0 < len(channel.clients) < channel.max_clients:
+            return False  # spares are handed out separately, full channels can't take anyone
+        return self.policy != TICK_AWARE or self.tick_loads.get(channel.channel_id, 0.0) < 1.0
+
+    def _index(self, channel):
+        """(Re)insert a channel's heap entry, superseding any older one."""
+        self.next_stamp += 1
+        stamp = self.stamps[channel.channel_id] = self.next_stamp
+        if self._placeable(channel):
+            heapq.heappush(self.heap, (self._key(channel), channel.channel_id, stamp))
+        if len(self.heap) > 2 * len(self.channels) + 64:
+            self._rebuild()
+
+    def _rebuild(self):
+        """Drop stale entries; also how refreshed tick loads take effect."""
+        self.heap = []
+        for channel in self.channels.values():
+            self.next_stamp += 1
+            stamp = self.stamps[channel.channel_id] = self.next_stamp
+            if self._placeable(channel):
+                self.heap.append((self._key(channel), channel.channel_id, stamp))
+        heapq.heapify(self.heap)
+
+    def _sample_tick_loads(self):
+        now = time.monotonic()
+        if now - self.loads_sampled < CHANNEL_LOAD_REFRESH:
+            return
+        self.loads_sampled = now
+        self.tick_loads = {cid: channel.tick_load() for cid, channel in self.channels.items()}
+        self._rebuild()
+
     def assign_client_to_channel(self, client: ClientHandler):
-        """Assign a client to an existing channel with space, or create a new one."""
+        """Assign a client to the channel the policy prefers, creating one if all are full."""
         with self.lock:
-            for channel in self.channels.values():
-                if len(channel.clients) < channel.max_clients:
-                    channel.add_client(client)
-                    return channel
+            return self._place(client)
+
+    def _place(self, client, exclude=None, route=True):
+        if self.policy == TICK_AWARE:
+            self._sample_tick_loads()
+        heap = self.heap
+        skipped = None
+        while heap:
+            _, channel_id, stamp = heapq.heappop(heap)
+            if self.stamps.get(channel_id) != stamp:
+                continue  # superseded or channel removed
+            channel = self.channels[channel_id]
+            if channel is exclude:
+                skipped = channel
+                continue
+            if channel.add_client(client, route):
+                self._placed(channel)
+                break
+            self._index(channel)  # filled up outside the manager; re-key it
+        else:
+            # No occupied channel can take the player: open a spare, or create one
+            spares = self.spares.difference(self.draining)
+            channel = self.channels[min(spares)] if spares else self._create_channel()
+            channel.add_client(client, route)
+            self._placed(channel)
+        if skipped is not None:
+            self._index(skipped)
+        return channel
 
-            # No available channel, create a new one
-            new_channel = self.create_channel()
-            new_channel.add_client(client)
-            return new_channel
+    def _placed(self, channel):
+        self._index(channel)
+        if channel.channel_id in self.spares:
+            self.spares.discard(channel.channel_id)
+            while len(self.spares) < self.min_spares:
+                self._create_channel()
 
     def remove_client_from_channel(self, client: ClientHandler):
         """Remove a client from whichever channel they belong to."""
         with self.lock:
-            channel = client.channel
-            if channel:
-                channel.remove_client(client)
-                # Optionally remove empty channels
-                if len(channel.clients) == 0:
-                    del self.channels[channel.channel_id]
+            with self.transit_lock:
+                channel = self.arriving.get(client) or client.channel
+            if not channel:
+                return
+            channel.remove_client(client)
+            closed = self._vacated(channel)
+        for old in closed:
+            old.stop()
+
+    def _vacated(self, channel) -> list:
+        """
+        Re-key a channel someone left; it becomes a spare once empty. Returns
+        the spares shut down, for the caller to stop() once the lock is
+        released: stopping joins their engine threads.
+        """
+        closed = []
+        if channel.channel_id not in self.channels:
+            return closed
+        if not channel.clients:
+            self.spares.add(channel.channel_id)
+            # Hysteresis: only shut channels down once spares exceed the high mark,
+            # and never one whose engine still owes a transfer its export
+            while len(self.spares) > self.max_spares:
+                with self.transit_lock:
+                    idle = [cid for cid in self.spares if not self.in_transit[cid]]
+                if not idle:
+                    break
+                closed.append(self._destroy(max(idle)))
+            if channel.channel_id not in self.channels:
+                return closed
+        self._index(channel)
+        return closed
+
+    def transfer(self, client, target_id=None, on_done=None):
+        """
+        Move a client's player to channel target_id, or wherever the policy
+        places it. Returns the target channel, or None if it can't take the
+        client. on_done(latency) is called from the target engine's thread
+        once the player is live there.
+        """
+        started = time.monotonic()
+        with self.lock:
+            source = client.channel
+            if source is None or self.channels.get(source.channel_id) is not source:
+                raise ValueError("Client is not in a channel")
+            with self.transit_lock:
+                if client in self.arriving:
+                    raise ValueError("Client is already changing channel")
+            if target_id is None:
+                target = self._place(client, exclude=source, route=False)
+            else:
+                target = self.channels.get(target_id)
+                if target is None or target is source or not target.add_client(client, route=False):
+                    return None
+                self._placed(target)
+            with self.transit_lock:
+                self.in_transit[source.channel_id] += 1
+                self.arriving[client] = target
+            source.remove_client(client, route=False)
+            closed = self._vacated(source)
+        for old in closed:
+            old.stop()
+
+        def done():
+            latency = time.monotonic() - started
+            self.transfer_latency.observe(latency)
+            with self.transit_lock:
+                self.in_transit[source.channel_id] -= 1
+                if not self.in_transit[source.channel_id]:
+                    del self.in_transit[source.channel_id]
+                self.transfers += 1
+            client.send_json({"action": "channel_changed", "channel": target.channel_id})
+            if on_done is not None:
+                on_done(latency)
+
+        def exported(state):
+            if state is not None:
+                target.engine.submit("import_player", client.user_id, state, client, done)
+            # Commands sent from here on reach the target engine, after the import
+            with self.transit_lock:
+                client.channel = target
+                self.arriving.pop(client, None)
+            if state is None:
+                done()
+            elif not client.in_game:
+                # Left while the state was in flight, before its remove_player could follow it
+                target.engine.submit("remove_player", client.user_id, client)
+
+        if source.engine is None or target.engine is None or not client.user_id:
+            exported(None)  # nothing lives in a game state to move
+        else:
+            source.engine.submit("export_player", client.user_id, client, exported)
+        return target
+
+    def drain_channel(self, channel_id, on_done=None) -> int:
+        """
+        Move every client off a channel, e.g. one overrunning its tick, and
+        keep new players out until it is empty. Returns how many were moved;
+        on_done is passed to each transfer().
+        """
+        with self.lock:
+            channel = self.channels.get(channel_id)
+            if channel is None:
+                return 0
+            self.draining.add(channel_id)
+            self._index(channel)  # drops its heap entry
+            with channel.lock:
+                clients = list(channel.clients)
+        moved = 0
+        try:
+            for client in clients:
+                if client.channel is channel and self.transfer(client, on_done=on_done) is not None:
+                    moved += 1
+        finally:
+            with self.lock:
+                self.draining.discard(channel_id)
+                if channel_id in self.channels:
+                    self._index(channel)
+        return moved
+
+    def _destroy(self, channel_id):
+        """Forget a channel; the caller stops it after releasing the lock."""
+        channel = self.channels.pop(channel_id)
+        self.spares.discard(channel_id)
+        self.draining.discard(channel_id)
+        self.stamps.pop(channel_id, None)
+        self.tick_loads.pop(channel_id, None)
+        return channel
+
+    def stop(self):
+        """Stop every channel and its engine."""
+        with self.lock:
+            channels = list(self.channels.values())
+            self.channels.clear()
+            self.spares.clear()
+            self.stamps.clear()
+            self.heap = []
+        for channel in channels:
+            channel.stop()
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "channels": len(self.channels),
+                "spares": len(self.spares),
+                "clients": sum(len(c.clients) for c in self.channels.values()),
+                "heap_entries": len(self.heap),
+                "transfers": self.transfers,
+                "transfers_in_flight": sum(self.in_transit.values()),
+                "transfer_p50_seconds": self.transfer_latency.percentile(50),
+                "transfer_p99_seconds": self.transfer_latency.percentile(99),
+            }
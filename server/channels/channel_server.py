@@ -1,40 +1,57 @@
 # server/channels/channel_server.py
 import threading
 from server.network.client_handler import ClientHandler
+from server.network.broadcast import broadcast
 
 class ChannelServer:
-    def __init__(self, channel_id, max_clients=100):
+    def __init__(self, channel_id, max_clients=100, engine=None):
         self.channel_id = channel_id
         self.max_clients = max_clients
         self.clients = []  # list of ClientHandler instances
         self.lock = threading.Lock()
         self.running = True
+        self.engine = engine  # optional GameEngine ticking this channel
 
-    def add_client(self, client_handler: ClientHandler):
+    def tick_load(self) -> float:
+        """Share of the tick budget the channel's engine uses (p50), 0 without one."""
+        if self.engine is None:
+            return 0.0
+        return self.engine.tick_duration.percentile(50) / self.engine.tick_interval
+
+    def add_client(self, client_handler: ClientHandler, route=True):
+        """route=False takes the client in without pointing it at this channel yet (transfers)."""
         with self.lock:
             if len(self.clients) >= self.max_clients:
                 return False
             self.clients.append(client_handler)
-            client_handler.channel = self
+            if route:
+                client_handler.channel = self
             return True
 
-    def remove_client(self, client_handler: ClientHandler):
+    def remove_client(self, client_handler: ClientHandler, route=True):
         with self.lock:
             if client_handler in self.clients:
                 self.clients.remove(client_handler)
-                client_handler.channel = None
+                if route:
+                    client_handler.channel = None
 
-    def broadcast(self, message: str, exclude_client=None):
-        """Send a message to all clients in the channel except exclude_client."""
+    def broadcast(self, message: dict, exclude=None, where=None):
+        """
+        Send a message to every client in the channel, encoding it once.
+        exclude is a client or list of clients to skip; where filters recipients.
+        """
         with self.lock:
-            for client in self.clients:
-                if client != exclude_client:
-                    client.send(message)
+            clients = list(self.clients)
+        return broadcast(clients, message, exclude, where)
 
     def stop(self):
         """Stop the channel server and disconnect all clients."""
         with self.lock:
             self.running = False
-            for client in self.clients:
-                client.disconnect()
+            clients = list(self.clients)
             self.clients.clear()
+        # Outside the lock: a disconnecting client leaves its channel, which takes it
+        for client in clients:
+            client.disconnect()
+        if self.engine is not None:
+            self.engine.stop()
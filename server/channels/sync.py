@@ -0,0 +1,48 @@
+# server/channels/sync.py
+# Keeps the per-process stores of a multi-process server in step: token
+# revocations, character list invalidations and name index changes made in
+# one process are published on the bus and applied by every other one.
+# Eventually consistent: a change reaches the others within a bus flush
+# interval. The unique index on characters.name stays the final authority.
+import os
+from server.db.character_cache import character_cache
+from server.db.name_index import name_index
+from server.network.session_tokens import session_tokens
+
+SYNC_TOPIC = "sync"
+
+
+class StateSync:
+    """Publishes this process's store changes and applies everyone else's."""
+    def __init__(self, bus):
+        self.bus = bus
+        self.origin = os.getpid()  # the broker echoes our own messages back
+        self.applied = 0
+
+    def attach(self):
+        session_tokens.on_revoke = lambda jti, exp: self.publish("revoke", jti, exp)
+        character_cache.on_invalidate = lambda user_id: self.publish("invalidate", user_id)
+        name_index.on_change = lambda op, args: self.publish("name", op, list(args))
+        self.bus.subscribe(SYNC_TOPIC)
+
+    def detach(self):
+        session_tokens.on_revoke = None
+        character_cache.on_invalidate = None
+        name_index.on_change = None
+
+    def publish(self, op: str, *args):
+        self.bus.publish(SYNC_TOPIC, {"origin": self.origin, "op": op, "args": list(args)})
+
+    def apply(self, message: dict):
+        if message.get("origin") == self.origin:
+            return
+        op, args = message["op"], message["args"]
+        if op == "revoke":
+            session_tokens.revoke_id(*args)
+        elif op == "invalidate":
+            character_cache.invalidate(args[0], share=False)
+        elif op == "name":
+            name_index.apply(args[0], args[1])
+        else:
+            return
+        self.applied += 1
@@ -0,0 +1,308 @@
+# server/channels/workers.py
+# Multi-process channels: the master accepts connections and handles
+# signup/login, then passes each authenticated socket (the fd itself, over a
+# Unix socket) to a channel worker process running its own GameEngine.
+# Workers reach each other's players through a message bus broker process
+# (server/channels/bus.py).
+# Requires a Unix platform (socket.send_fds / recv_fds, Python 3.9+).
+import json
+import multiprocessing
+import os
+import shutil
+import socket
+import struct
+import tempfile
+import threading
+from server.config import CHANNEL_WORKERS, HANDOFF_FLUSH_TIMEOUT
+from server.channels.bus import BusClient, run_broker, connect
+from server.channels.sync import SYNC_TOPIC, StateSync
+from server.network.client_handler import ClientHandler
+from server.network.server import GameServer
+
+HEADER = struct.Struct("!I")  # payload length
+CONNECT_TIMEOUT = 10.0  # seconds to wait for a worker to bind its control socket
+
+
+def send_handoff(control: socket.socket, sock: socket.socket, state: dict):
+    """Pass sock's fd and its session state over a Unix control socket."""
+    payload = json.dumps(state).encode()
+    data = HEADER.pack(len(payload)) + payload
+    sent = socket.send_fds(control, [data], [sock.fileno()])
+    if sent < len(data):
+        control.sendall(data[sent:])
+
+
+def recv_exactly(control: socket.socket, size: int) -> bytes:
+    data = b""
+    while len(data) < size:
+        chunk = control.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("Control socket closed mid-handoff")
+        data += chunk
+    return data
+
+
+def recv_handoff(control: socket.socket):
+    """Receive (socket, state) from send_handoff, or None once the master has gone."""
+    data, fds, _, _ = socket.recv_fds(control, 4096, 1)
+    if not data:
+        return None
+    if not fds:
+        raise ConnectionError("Handoff arrived without a file descriptor")
+    if len(data) < HEADER.size:
+        data += recv_exactly(control, HEADER.size - len(data))
+    (size,) = HEADER.unpack_from(data)
+    payload = data[HEADER.size:]
+    if len(payload) < size:
+        payload += recv_exactly(control, size - len(payload))
+    return socket.socket(fileno=fds[0]), json.loads(payload)
+
+
+class ChannelWorker(GameServer):
+    """A channel process: adopts handed-off clients instead of listening on a port."""
+    zone_workers = 0  # one engine per worker already; a zone pool each would multiply processes
+    def __init__(self, index: int, path: str, bus_path: str):
+        super().__init__(host=None, port=None)
+        self.index = index
+        self.path = path
+        self.bus = BusClient(bus_path, self.deliver)
+        self.bus.subscribe("global")
+        self.bus.subscribe(f"channel:{index}")
+        self.sync = StateSync(self.bus)
+        self.sync.attach()
+        self.control = None
+        self.control_lock = threading.Lock()  # handler threads report departures concurrently
+
+    def start(self):
+        self.running = True
+        self.engine.start()
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(self.path)
+        listener.listen(1)
+        self.control, _ = listener.accept()
+        listener.close()
+        print(f"[+] Channel worker {self.index} ready (pid {os.getpid()})")
+
+        try:
+            while self.running:
+                handoff = recv_handoff(self.control)
+                if handoff is None:
+                    break  # master has gone
+                self.adopt(*handoff)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def adopt(self, client_socket: socket.socket, state: dict):
+        handler = ClientHandler(client_socket, tuple(state["address"]), self)
+        handler.restore_session(state)
+        with self.lock:
+            self.clients.append(handler)
+        handler.enter_game()
+        handler.start()
+
+    def deliver(self, topic: str, message: dict):
+        if topic == SYNC_TOPIC:
+            self.sync.apply(message)
+            return 0
+        return super().deliver(topic, message)
+
+    def remove_client(self, handler: ClientHandler):
+        super().remove_client(handler)
+        self.notify({"event": "left", "user_id": handler.user_id})
+
+    def notify(self, event: dict):
+        try:
+            with self.control_lock:
+                self.control.sendall(json.dumps(event).encode() + b"\n")
+        except OSError:
+            pass  # master has gone; stop() follows
+
+    def stop(self):
+        self.running = False
+        with self.lock:
+            clients = list(self.clients)
+        for client in clients:
+            client.disconnect()
+        self.engine.stop()
+        self.bus.close()
+        if self.control is not None:
+            self.control.close()
+        print(f"[+] Channel worker {self.index} stopped")
+
+
+def run_worker(index: int, path: str, bus_path: str):
+    """Worker process entry point."""
+    # Imported here so the master's modules aren't re-initialised on import
+    from server.core.ids import entity_ids
+    from server.db.write_behind import write_behind
+    from server.db.passwords import password_pool
+
+    entity_ids.set_shard(index + 1)  # the master's ids use shard 0
+    write_behind.start()
+    try:
+        ChannelWorker(index, path, bus_path).start()
+    finally:
+        write_behind.stop()
+        password_pool.shutdown()
+
+
+class WorkerHandle:
+    """The master's end of one worker: process, control socket and client count."""
+    def __init__(self, index: int, directory: str, bus_path: str, context):
+        self.index = index
+        self.path = os.path.join(directory, f"worker-{index}.sock")
+        self.process = context.Process(target=run_worker, args=(index, self.path, bus_path),
+                                       name=f"channel-worker-{index}", daemon=True)
+        self.control = None
+        self.lock = threading.Lock()
+        self.clients = 0
+        self.handed_off = 0
+        self.alive = False
+
+    def start(self):
+        self.process.start()
+        try:
+            self.control = connect(self.path, CONNECT_TIMEOUT)
+        except OSError:
+            raise RuntimeError(f"Channel worker {self.index} did not start")
+        self.alive = True
+        threading.Thread(target=self.read_events, daemon=True).start()
+
+    def hand_off(self, sock: socket.socket, state: dict):
+        with self.lock:
+            send_handoff(self.control, sock, state)
+            self.clients += 1
+            self.handed_off += 1
+
+    def read_events(self):
+        try:
+            for line in self.control.makefile("rb"):
+                event = json.loads(line)
+                if event["event"] == "left":
+                    with self.lock:
+                        self.clients -= 1
+        except (OSError, ValueError):
+            pass
+        self.alive = False
+        print(f"[!] Channel worker {self.index} exited")
+
+    def stop(self, timeout=5.0):
+        if self.control is not None:
+            try:
+                self.control.shutdown(socket.SHUT_RDWR)  # worker sees EOF and stops
+            except OSError:
+                pass
+            self.control.close()
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+
+    def stats(self) -> dict:
+        return {"alive": self.alive, "clients": self.clients, "handed_off": self.handed_off}
+
+
+class MasterClientHandler(ClientHandler):
+    """Login-only session: once authenticated, the socket moves to a channel worker."""
+    handoff = False
+
+    def enter_game(self):
+        # Called on login/resume once the reply is built; stop reading after this
+        # frame so nothing else is consumed, then disconnect() hands the socket over
+        self.handoff = True
+        self.running = False
+
+    def disconnect(self, flush=True):
+        if flush and self.handoff:
+            with self.disconnect_lock:
+                if self.closed:
+                    return
+                self.closed = True
+            if self.hand_off():
+                return
+            self.closed = False
+        super().disconnect(flush)
+
+    def hand_off(self) -> bool:
+        worker = self.server.pick_worker()
+        if worker is None:
+            print(f"[!] No channel worker for {self.username}")
+            return False
+        # Replies to the login must reach the client before the worker writes
+        self.outbound.close(timeout=HANDOFF_FLUSH_TIMEOUT)
+        if self.outbound.thread.is_alive() or self.outbound.pending:
+            return False
+        state = self.session_state()
+        state["address"] = list(self.address)
+        try:
+            worker.hand_off(self.client_socket, state)
+        except OSError as e:
+            print(f"[!] Handoff of {self.username} to worker {worker.index} failed: {e}")
+            return False
+        print(f"[>] {self.username} handed off to channel worker {worker.index}")
+        self.client_socket.close()  # our copy only; no shutdown, the worker owns the connection now
+        self.server.remove_client(self)
+        return True
+
+
+class MasterServer(GameServer):
+    """Accepts and authenticates connections, then spreads them over channel workers."""
+    handler_class = MasterClientHandler
+    zone_workers = 0
+
+    def __init__(self, host="0.0.0.0", port=5000, max_clients=50, workers=CHANNEL_WORKERS):
+        super().__init__(host, port, max_clients)
+        self.engine = None  # the world runs in the workers
+        self.game_state = None
+        self.worker_count = max(1, workers)
+        self.workers = []
+        self.broker = None
+        self.directory = None
+
+    def start(self):
+        self.directory = tempfile.mkdtemp(prefix="otherworldly-")  # 0700: only we can connect
+        context = multiprocessing.get_context("spawn")  # no inherited threads or sockets
+        bus_path = os.path.join(self.directory, "bus.sock")
+        self.broker = context.Process(target=run_broker, args=(bus_path,), name="bus-broker", daemon=True)
+        self.broker.start()
+        self.bus = BusClient(bus_path, self.deliver)  # announce() reaches every worker
+        self.sync = StateSync(self.bus)  # logins and resumes here see the workers' changes
+        self.sync.attach()
+        for index in range(self.worker_count):
+            worker = WorkerHandle(index, self.directory, bus_path, context)
+            worker.start()
+            self.workers.append(worker)
+        print(f"[+] {len(self.workers)} channel workers started")
+        try:
+            super().start()
+        finally:
+            self.stop_workers()
+
+    def deliver(self, topic: str, message: dict):
+        if topic == SYNC_TOPIC:
+            self.sync.apply(message)
+            return 0
+        return super().deliver(topic, message)
+
+    def pick_worker(self):
+        alive = [worker for worker in self.workers if worker.alive]
+        return min(alive, key=lambda worker: worker.clients, default=None)
+
+    def worker_stats(self) -> dict:
+        return {f"worker_{worker.index}": worker.stats() for worker in self.workers}
+
+    def stop_workers(self):
+        for worker in self.workers:
+            worker.stop()
+        self.workers = []
+        if self.broker is not None:
+            self.sync.detach()
+            self.bus.close()
+            self.broker.terminate()
+            self.broker.join()
+            self.broker = None
+        if self.directory is not None:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self.directory = None
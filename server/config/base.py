@@ -18,3 +18,67 @@ LOG_LEVEL = os.getenv("GAME_LOG_LEVEL", "INFO")
 # Gameplay Defaults
 TICK_RATE = 30
 MAX_PLAYERS = 100
+
+# Networking
+SERVER_MODE = os.getenv("GAME_SERVER_MODE", "threaded")  # "threaded", "asyncio", "channels" or "multiproc"
+ASYNC_HANDLER_WORKERS = int(os.getenv("GAME_ASYNC_HANDLER_WORKERS", 8))  # threads for blocking DB/auth work
+
+# Outbound send queues (per connection, in bytes)
+SEND_QUEUE_HIGH_WATER = int(os.getenv("GAME_SEND_QUEUE_HIGH_WATER", 256 * 1024))
+SEND_QUEUE_LOW_WATER = int(os.getenv("GAME_SEND_QUEUE_LOW_WATER", 64 * 1024))
+SEND_QUEUE_POLICY = os.getenv("GAME_SEND_QUEUE_POLICY", "drop")  # "drop" or "disconnect" laggards
+SEND_BATCH_BYTES = int(os.getenv("GAME_SEND_BATCH_BYTES", 64 * 1024))  # max bytes coalesced per send
+
+# Password hashing pool (bcrypt runs in worker processes)
+AUTH_POOL_WORKERS = int(os.getenv("GAME_AUTH_POOL_WORKERS", os.cpu_count() or 2))
+AUTH_POOL_MAX_PENDING = int(os.getenv("GAME_AUTH_POOL_MAX_PENDING", AUTH_POOL_WORKERS * 4))  # beyond this, reply "busy"
+
+# Session tokens issued at login for password-less reconnects
+SESSION_TOKEN_TTL = int(os.getenv("GAME_SESSION_TOKEN_TTL", 24 * 3600))  # seconds
+
+# Database engine profile (see config/database.py ENGINE_PROFILES)
+DB_PROFILE = os.getenv("GAME_DB_PROFILE", "development")
+
+# Character names
+NAME_RESERVATION_TTL = int(os.getenv("GAME_NAME_RESERVATION_TTL", 60))  # seconds a checked name is held for its user
+CHARACTER_CACHE_SIZE = int(os.getenv("GAME_CHARACTER_CACHE_SIZE", 10000))  # users whose character lists are cached
+
+# Write-behind persistence of live character state
+WRITE_BEHIND_INTERVAL = float(os.getenv("GAME_WRITE_BEHIND_INTERVAL", 1.0))  # seconds between flushes
+WRITE_BEHIND_MAX_BATCH = int(os.getenv("GAME_WRITE_BEHIND_MAX_BATCH", 5000))  # rows per executemany
+
+# Game loop
+TICK_POLICY = os.getenv("GAME_TICK_POLICY", "catch_up")  # "catch_up" or "skip" when ticks fall behind
+TICK_MAX_CATCHUP = int(os.getenv("GAME_TICK_MAX_CATCHUP", 5))  # late ticks run back-to-back before dropping
+ZONE_WORKERS = int(os.getenv("GAME_ZONE_WORKERS", 0))  # processes ticking zones in parallel (needs numpy); 0 = engine thread
+
+# World
+ZONE_CELL_SIZE = int(os.getenv("GAME_ZONE_CELL_SIZE", 64))  # spatial grid cell edge, in world units
+ZONE_SIZE = int(os.getenv("GAME_ZONE_SIZE", 4096))  # width and height of zones created for a map_id
+VIEW_RADIUS = float(os.getenv("GAME_VIEW_RADIUS", 400))  # entities replicated to a player, in world units
+MOVE_MAX_DISTANCE = float(os.getenv("GAME_MOVE_MAX_DISTANCE", 16))  # world units a player may move per tick
+ID_SHARD = int(os.getenv("GAME_ID_SHARD", 0))  # 0-65535, unique per process allocating entity ids
+
+# Snapshot replication
+SNAPSHOT_HISTORY = int(os.getenv("GAME_SNAPSHOT_HISTORY", 32))  # ticks kept as delta baselines
+SNAPSHOT_FLOAT_PRECISION = {"x": 2, "y": 2}  # decimal places floats are rounded to before diffing/sending
+
+# Channels
+CHANNEL_WORKERS = int(os.getenv("GAME_CHANNEL_WORKERS", os.cpu_count() or 2))  # worker processes in multiproc mode
+HANDOFF_FLUSH_TIMEOUT = float(os.getenv("GAME_HANDOFF_FLUSH_TIMEOUT", 2.0))  # seconds to flush replies before a handoff
+CHANNEL_SIZE = int(os.getenv("GAME_CHANNEL_SIZE", 100))  # players per channel in channels mode
+CHANNEL_POLICY = os.getenv("GAME_CHANNEL_POLICY", "least_loaded")  # "fill_first", "least_loaded" or "tick_aware"
+CHANNEL_MIN_SPARES = int(os.getenv("GAME_CHANNEL_MIN_SPARES", 1))  # empty channels kept warm for new players
+CHANNEL_MAX_SPARES = int(os.getenv("GAME_CHANNEL_MAX_SPARES", 3))  # empty channels beyond this are shut down
+CHANNEL_LOAD_REFRESH = float(os.getenv("GAME_CHANNEL_LOAD_REFRESH", 1.0))  # seconds between tick-load samples
+CHANNEL_TICK_WEIGHT = float(os.getenv("GAME_CHANNEL_TICK_WEIGHT", 1.0))  # tick_aware: tick budget used vs. occupancy
+
+# Inter-channel message bus (multiproc mode)
+BUS_FLUSH_INTERVAL = float(os.getenv("GAME_BUS_FLUSH_INTERVAL", 0.002))  # seconds a publish may wait to be batched
+BUS_BATCH_BYTES = int(os.getenv("GAME_BUS_BATCH_BYTES", 64 * 1024))  # flush a batch early once it reaches this size
+BUS_MAX_BUFFER = int(os.getenv("GAME_BUS_MAX_BUFFER", 16 * 1024 * 1024))  # broker drops subscribers this far behind
+CHAT_MAX_LENGTH = 256  # characters in a whisper or party message
+PARTY_NAME_MAX_LENGTH = 32
+
+# Metrics (Prometheus text format on http://<host>:METRICS_PORT/metrics; 0 = disabled)
+METRICS_PORT = int(os.getenv("GAME_METRICS_PORT", 0))
@@ -5,3 +5,28 @@ from .base import DB_URI
 # Default DB URL (can override via environment)
 DATABASE_URL = os.getenv("DATABASE_URL", DB_URI)
 POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", 30))  # seconds to wait for a free connection
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))  # seconds before a connection is replaced
+
+# Applied to every new SQLite connection
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",        # readers don't block the writer
+    "synchronous": "NORMAL",      # safe with WAL, far fewer fsyncs
+    "mmap_size": 256 * 1024 * 1024,
+    "busy_timeout": 5000,         # ms to wait on a locked database instead of failing
+}
+
+# Engine settings per environment, selected by DB_PROFILE
+ENGINE_PROFILES = {
+    "development": {
+        "echo": os.getenv("DB_ECHO", "1") == "1",
+        "pool_pre_ping": False,
+        "sqlite_pragmas": {},
+    },
+    "production": {
+        "echo": os.getenv("DB_ECHO", "0") == "1",
+        "pool_pre_ping": True,
+        "sqlite_pragmas": SQLITE_PRAGMAS,
+    },
+}
@@ -1 +1,6 @@
 # overrides for prod
+from .base import *
+
+DEBUG = False
+ENV = "production"
+DB_PROFILE = "production"
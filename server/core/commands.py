@@ -0,0 +1,25 @@
+# server/core/commands.py
+from collections import deque, namedtuple
+
+Command = namedtuple("Command", "name args")
+
+
+class CommandQueue:
+    """
+    Intents from connection threads to the game engine.
+    Many producers push, the engine thread alone drains at the start of a
+    tick. deque.append/popleft are atomic in CPython, so neither side locks.
+    """
+    def __init__(self):
+        self.queue = deque()
+
+    def push(self, name: str, *args):
+        self.queue.append(Command(name, args))
+
+    def drain(self) -> list:
+        """Pop the commands queued so far; later pushes wait for the next tick."""
+        queue = self.queue
+        return [queue.popleft() for _ in range(len(queue))]
+
+    def __len__(self):
+        return len(self.queue)
@@ -0,0 +1,136 @@
+# server/core/entity_store.py
+from array import array
+
+try:
+    import numpy as np
+except ImportError:  # integrate() falls back to a per-slot loop without it
+    np = None
+
+# Column name -> array typecode. Positions, velocities and pools are doubles;
+# version counts replicated changes, generation counts reuses of a slot.
+COLUMNS = {
+    "x": "d", "y": "d",
+    "vx": "d", "vy": "d",
+    "hp": "d", "mp": "d",
+    "version": "Q",
+    "generation": "L",
+    "moving_mask": "B",  # 1 while vx or vy is non-zero
+    "cell": "q",  # SpatialGrid cell + 1, 0 when not in a grid
+}
+
+# Above this share of slots moving, integrate() sweeps whole columns (with
+# numpy) instead of visiting the moving slots one by one.
+SWEEP_RATIO = 0.25
+
+
+def allocate_array(name: str, typecode: str, capacity: int):
+    """Default column allocator: a zero-filled array.array."""
+    return array(typecode, bytes(capacity * array(typecode).itemsize))
+
+
+class EntityStore:
+    """
+    Struct-of-arrays storage for the entities of one zone.
+    Each entity is a dense integer handle (slot index) into typed columns;
+    freed slots go on a free list and bump their generation so stale
+    (handle, generation) pairs can be detected. Columns come from
+    allocate(name, typecode, capacity), which must return a zeroed,
+    indexable buffer of that typecode (array.array, or a memoryview cast
+    over shared memory) and is called again, at double size, to grow.
+    """
+    def __init__(self, capacity=1024, allocate=allocate_array):
+        self.allocate = allocate
+        self.capacity = 0
+        self.size = 0  # slots ever used (high-water mark)
+        self.free = []
+        self.entities = []  # slot -> Entity view, or None when free
+        self.moving = set()  # slots with a non-zero velocity (moving_mask as a set)
+        for name in COLUMNS:
+            setattr(self, name, None)
+        self.grow(max(1, capacity))
+
+    def grow(self, capacity: int):
+        for name, typecode in COLUMNS.items():
+            column = self.allocate(name, typecode, capacity)
+            old = getattr(self, name)
+            if old is not None and self.size:
+                memoryview(column)[:self.size] = memoryview(old)[:self.size]
+            setattr(self, name, column)
+        self.capacity = capacity
+
+    def add(self, entity, x=0.0, y=0.0, vx=0.0, vy=0.0, hp=0.0, mp=0.0, version=0) -> int:
+        """Take a slot for entity and return its handle."""
+        if self.free:
+            index = self.free.pop()
+            self.entities[index] = entity
+        else:
+            index = self.size
+            if index == self.capacity:
+                self.grow(self.capacity * 2)
+            self.size += 1
+            self.entities.append(entity)
+        self.x[index] = x
+        self.y[index] = y
+        self.vx[index] = vx
+        self.vy[index] = vy
+        self.hp[index] = hp
+        self.mp[index] = mp
+        self.version[index] = version
+        if vx or vy:
+            self.moving.add(index)
+            self.moving_mask[index] = 1
+        return index
+
+    def remove(self, index: int) -> dict:
+        """Free a slot; returns the values it held so they can move elsewhere."""
+        values = self.export(index)
+        for name in ("x", "y", "vx", "vy", "hp", "mp", "version", "moving_mask", "cell"):
+            getattr(self, name)[index] = 0
+        self.generation[index] += 1
+        self.entities[index] = None
+        self.moving.discard(index)
+        self.free.append(index)
+        return values
+
+    def export(self, index: int) -> dict:
+        return {name: getattr(self, name)[index] for name in ("x", "y", "vx", "vy", "hp", "mp", "version")}
+
+    def is_alive(self, index: int, generation: int) -> bool:
+        return index < self.size and self.entities[index] is not None and self.generation[index] == generation
+
+    def set_velocity(self, index: int, vx: float, vy: float):
+        self.vx[index] = vx
+        self.vy[index] = vy
+        if vx or vy:
+            self.moving.add(index)
+            self.moving_mask[index] = 1
+        else:
+            self.moving.discard(index)
+            self.moving_mask[index] = 0
+
+    def integrate(self, dt: float) -> list:
+        """Advance every moving entity by velocity * dt; returns the slots that moved."""
+        moving = self.moving
+        if not moving:
+            return []
+        n = self.size
+        if np is not None and len(moving) > n * SWEEP_RATIO:
+            # Whole-column sweep over zero-copy views; resting and free slots
+            # have zero velocity and mask, so they are left unchanged
+            x, y, vx, vy, version, mask = (
+                np.frombuffer(getattr(self, name), dtype=COLUMNS[name], count=n)
+                for name in ("x", "y", "vx", "vy", "version", "moving_mask"))
+            x += vx * dt
+            y += vy * dt
+            version += mask
+            return np.flatnonzero(mask).tolist()
+
+        x, y, vx, vy, version = self.x, self.y, self.vx, self.vy, self.version
+        for index in moving:
+            x[index] += vx[index] * dt
+            y[index] += vy[index] * dt
+            version[index] += 1
+        return list(moving)
+
+    def __len__(self):
+        return self.size - len(self.free)
@@ -1,50 +1,246 @@
 # server/core/game_engine.py
 
+import math
 import threading
 import time
+from server.config import TICK_RATE, TICK_POLICY, TICK_MAX_CATCHUP, MOVE_MAX_DISTANCE
 from server.core.game_state import GameState
+from server.core.commands import CommandQueue
+from server.core.interest import InterestManager
+from server.db.write_behind import write_behind
+from server.core.metrics import Histogram, registry
+from server.core.entity_store import np
+from server.core.world import clamp_to_zone
+from server.core.zone_pool import ZonePool
+
+CATCH_UP = "catch_up"  # run late ticks back-to-back (up to max_catchup), then drop the rest
+SKIP = "skip"          # run one late tick immediately and drop any others
 
 class GameEngine:
     """
     Main game loop & logic handler.
+    Ticks on a fixed timestep against the monotonic clock: each tick is due
+    at start + n * interval, so sleep error and slow ticks don't accumulate.
+    The engine thread owns game_state; other threads only submit() commands.
     """
-    TICK_RATE = 20  # ticks per second
+    TICK_RATE = TICK_RATE  # ticks per second
 
-    def __init__(self, game_state: GameState):
+    def __init__(self, game_state: GameState, tick_rate=None, policy=TICK_POLICY,
+                 max_catchup=TICK_MAX_CATCHUP, name="main", zone_workers=0):
+        if policy not in (CATCH_UP, SKIP):
+            raise ValueError(f"Unknown tick policy: {policy}")
         self.game_state = game_state
+        self.tick_rate = tick_rate or self.TICK_RATE
+        self.tick_interval = 1.0 / self.tick_rate
+        self.policy = policy
+        self.max_catchup = max_catchup
+        self.name = name
         self.running = False
         self.thread = None
+        self.commands = CommandQueue()
+        self.command_handlers = {
+            "add_player": game_state.add_player,
+            "remove_player": game_state.remove_player,
+            "move_player_to_channel": game_state.move_player_to_channel,
+            "spawn_player": self.spawn_player,
+            "move_player": self.move_player,
+            "ack": self.interest_ack,
+            "export_player": self.export_player,
+            "import_player": self.import_player,
+        }
+        self.interest = InterestManager()
+        self.move_max_distance = MOVE_MAX_DISTANCE
+        self.moved = {}  # player_id -> distance moved this tick
+
+        # Zones ticked by a process pool, their columns in shared memory
+        self.zone_pool = None
+        self.zone_exit_handlers = []  # handler(zone, entity) for moving entities outside their zone
+        if zone_workers and np is None:
+            print("[GameEngine] Parallel zone ticks need numpy; ticking zones in the engine thread")
+        elif zone_workers:
+            if game_state.world.zones:
+                raise ValueError("Parallel zone ticks must be set up before any zone exists")
+            self.zone_pool = ZonePool(zone_workers)
+            game_state.allocator_factory = self.zone_pool.allocator
+
+        # Tick metrics
+        self.tick = 0
+        self.tick_duration = Histogram()
+        self.last_tick_duration = 0.0
+        self.overruns = 0       # ticks that took longer than the interval
+        self.skipped_ticks = 0  # ticks dropped by the catch-up policy
+        self.tick_errors = 0  # ticks whose update() raised
+        self.command_queue_depth = 0  # commands drained at the start of the last tick
+        self.commands_applied = 0
+        self.command_drain = Histogram()
+        self.aoi_messages = 0  # aoi_update messages sent by the last tick
 
     def start(self):
         if not self.running:
             self.running = True
+            if self.zone_pool is not None:
+                self.zone_pool.start()
             self.thread = threading.Thread(target=self.run_loop, daemon=True)
             self.thread.start()
+            registry.register("game_engine", self.tick_stats, engine=self.name)
             print("[GameEngine] Started.")
 
     def stop(self):
         self.running = False
         if self.thread:
             self.thread.join()
+            if self.zone_pool is not None:
+                self.zone_pool.stop()
+            registry.unregister("game_engine", engine=self.name)
             print("[GameEngine] Stopped.")
 
     def run_loop(self):
-        tick_interval = 1.0 / self.TICK_RATE
+        interval = self.tick_interval
+        next_tick = time.monotonic()
         while self.running:
-            start_time = time.time()
-            self.update()
-            elapsed = time.time() - start_time
-            time.sleep(max(0, tick_interval - elapsed))
+            start = time.monotonic()
+            try:
+                self.update()
+            except Exception as e:
+                # One bad tick must not stop the world; the next one runs as scheduled
+                self.tick_errors += 1
+                print(f"[GameEngine] Tick {self.tick} failed: {type(e).__name__}: {e}")
+            duration = time.monotonic() - start
+            self.record_tick(duration)
+
+            next_tick += interval
+            now = time.monotonic()
+            if now < next_tick:
+                time.sleep(next_tick - now)
+                continue
+
+            # Behind schedule: this many ticks are already due
+            due = int((now - next_tick) / interval) + 1
+            allowed = 1 if self.policy == SKIP else self.max_catchup
+            if due > allowed:
+                dropped = due - allowed
+                self.skipped_ticks += dropped
+                next_tick += dropped * interval
+
+    def submit(self, name: str, *args):
+        """Queue a command for the next tick. Safe from any thread."""
+        self.commands.push(name, *args)
+
+    def register_command(self, name: str, handler):
+        self.command_handlers[name] = handler
+
+    def on_zone_exit(self, handler):
+        """
+        Call handler(zone, entity) after each tick for moving entities that
+        left their zone. Without any handler they are stopped at its edge (clamp_to_zone).
+        """
+        self.zone_exit_handlers.append(handler)
+
+    def apply_commands(self):
+        start = time.monotonic()
+        commands = self.commands.drain()
+        for command in commands:
+            handler = self.command_handlers.get(command.name)
+            if handler is None:
+                print(f"[GameEngine] Unknown command: {command.name}")
+                continue
+            try:
+                handler(*command.args)
+            except Exception as e:
+                print(f"[GameEngine] Command {command.name} failed: {e}")
+        self.command_queue_depth = len(commands)
+        self.commands_applied += len(commands)
+        self.command_drain.observe(time.monotonic() - start)
+
+    def spawn_player(self, player_id, character):
+        self.game_state.spawn_player(player_id, character)
+        self.interest.forget(player_id)
+
+    def export_player(self, player_id, client, on_export):
+        """Hand a player's state (or None) to on_export, from this engine's thread."""
+        state = self.game_state.export_player(player_id, client)
+        self.interest.forget(player_id)
+        on_export(state)
+
+    def import_player(self, player_id, state, client, on_import):
+        self.game_state.import_player(player_id, state, client)
+        self.interest.forget(player_id)  # the client gets a full snapshot of its new surroundings
+        on_import()
+
+    def interest_ack(self, player_id, tick):
+        self.interest.ack(player_id, tick)
+
+    def move_player(self, player_id, dx, dy):
+        # However many moves arrive in a tick, they add up to at most move_max_distance
+        distance = math.hypot(dx, dy)
+        allowance = self.move_max_distance - self.moved.get(player_id, 0.0)
+        if distance > allowance:
+            if allowance <= 0:
+                return
+            dx *= allowance / distance
+            dy *= allowance / distance
+            distance = allowance
+        entity = self.game_state.move_player(player_id, dx, dy)
+        if entity is None:
+            return
+        self.moved[player_id] = self.moved.get(player_id, 0.0) + distance
+        player = self.game_state.players[player_id]
+        write_behind.update(player["character_id"], owner=player_id, x=round(entity.x), y=round(entity.y))
+
+    def record_tick(self, duration: float):
+        self.tick += 1
+        self.last_tick_duration = duration
+        self.tick_duration.observe(duration)
+        if duration > self.tick_interval:
+            self.overruns += 1
+
+    def tick_stats(self) -> dict:
+        stats = {
+            "ticks": self.tick,
+            "overruns": self.overruns,
+            "skipped_ticks": self.skipped_ticks,
+            "tick_errors": self.tick_errors,
+            "last_tick_seconds": self.last_tick_duration,
+            "tick_p50_seconds": self.tick_duration.percentile(50),
+            "tick_p99_seconds": self.tick_duration.percentile(99),
+            "tick_seconds": self.tick_duration,
+            "command_queue_depth": self.command_queue_depth,
+            "commands_applied": self.commands_applied,
+            "command_drain_seconds": self.command_drain,
+            "aoi_messages": self.aoi_messages,
+            "aoi_bytes_per_client": self.interest.bytes_per_client,
+        }
+        if self.zone_pool is not None:
+            stats["zone_barrier_seconds"] = self.zone_pool.barrier
+        return stats
 
     def update(self):
         """
-        Main game update logic: update players, world, handle events.
+        Main game update logic: apply queued commands, then update players, world, handle events.
         """
+        self.moved.clear()
+        self.apply_commands()
+
         # Example: iterate all players
         for player_id, player_data in self.game_state.players.items():
             self.update_player(player_id, player_data)
 
         # Here you can add world updates, NPC movements, events, etc.
+        zones = self.game_state.world.zones
+        if self.zone_pool is not None:
+            # Every zone steps in parallel; what crossed zones is applied at the barrier
+            exits = self.zone_pool.tick(zones, self.tick_interval)
+        else:
+            exits = []
+            for zone in zones.values():
+                zone.integrate(self.tick_interval, exits)
+        handlers = self.zone_exit_handlers or (clamp_to_zone,)
+        for zone, entity in exits:
+            for handler in handlers:
+                handler(zone, entity)
+
+        # Replicate what changed to the players who can see it
+        self.aoi_messages = self.interest.update(self.game_state.players, self.tick)
 
     def update_player(self, player_id, player_data):
         # Example placeholder logic
@@ -1,45 +1,121 @@
 # server/core/game_state.py
 
-import threading
 from collections import defaultdict
+from server.config import ZONE_SIZE
+from server.core.world import World, Zone, Entity
+from server.core.entity_store import allocate_array
 
 class GameState:
     """
     Holds the current game state: players, world, channels, etc.
-    Thread-safe access for concurrent client connections.
+    Owned by the GameEngine thread and never locked: other threads submit
+    changes through GameEngine.submit(), applied at the start of each tick.
     """
-    def __init__(self):
+    def __init__(self, allocator_factory=None):
         self.players = {}  # key: player_id, value: player object/dict
         self.world_objects = {}  # key: object_id, value: object data
         self.channels = defaultdict(list)  # key: channel_id, value: list of player_ids
-        self.lock = threading.RLock()
+        self.world = World()  # zones keyed by str(map_id), created on first use
+        self.allocator_factory = allocator_factory  # zone name -> column allocator for its EntityStore
 
     def add_player(self, player_id, player_data):
-        with self.lock:
-            self.players[player_id] = player_data
-
-    def remove_player(self, player_id):
-        with self.lock:
-            if player_id in self.players:
-                del self.players[player_id]
-            # Remove from channels too
-            for ch_players in self.channels.values():
-                if player_id in ch_players:
-                    ch_players.remove(player_id)
+        """Add a player; one already there (the same account on a new connection) is replaced, entity and all."""
+        self.despawn_player(player_id)
+        self.players[player_id] = player_data
+
+    def remove_player(self, player_id, client=None):
+        """Remove a player; with client given, only if that connection still owns the entry."""
+        player = self.players.get(player_id)
+        if player is None:
+            return
+        if client is not None and player.get("client") is not client:
+            return  # the same account reconnected; keep the newer session
+        self.despawn_player(player_id)
+        del self.players[player_id]
+        # Remove from channels too
+        for ch_players in self.channels.values():
+            if player_id in ch_players:
+                ch_players.remove(player_id)
+
+    def zone_for(self, map_id):
+        name = str(map_id)
+        zone = self.world.get_zone(name)
+        if zone is None:
+            allocate = self.allocator_factory(name) if self.allocator_factory else allocate_array
+            zone = Zone(name, ZONE_SIZE, ZONE_SIZE, allocate=allocate)
+            self.world.add_zone(zone)
+        return zone
+
+    def spawn_player(self, player_id, character):
+        """Place a player's selected character (a Character.as_dict()) in its zone."""
+        player = self.players.get(player_id)
+        if player is None:
+            return None
+        self.despawn_player(player_id)
+        stats = character.get("stats", {})
+        entity = Entity(character["name"], character["x"], character["y"], stats.get("HP", 0), stats.get("MP", 0))
+        self.zone_for(character["map_id"]).add_entity(entity)
+        player["entity"] = entity
+        player["character_id"] = character["id"]
+        return entity
+
+    def export_player(self, player_id, client=None) -> dict:
+        """
+        Take a player out of this state as plain data (see import_player), for
+        another GameState to take over; None if the player isn't here or, with
+        client given, belongs to another connection.
+        """
+        player = self.players.get(player_id)
+        if player is None or (client is not None and player.get("client") is not client):
+            return None
+        entity = player.get("entity")
+        state = {
+            "player": {key: value for key, value in player.items() if key not in ("client", "entity")},
+            "entity": None,
+        }
+        if entity is not None:
+            state["entity"] = {"id": entity.id, "name": entity.name, "zone": entity.zone.name if entity.zone else None,
+                               "x": entity.x, "y": entity.y, "vx": entity.vx, "vy": entity.vy,
+                               "hp": entity.hp, "mp": entity.mp}
+        self.remove_player(player_id)
+        return state
+
+    def import_player(self, player_id, state, client):
+        """Add a player exported by export_player, respawned where it was under the same entity id."""
+        self.remove_player(player_id)
+        player = self.players[player_id] = dict(state["player"], client=client)
+        values = state["entity"]
+        if values is not None:
+            entity = Entity(values["name"], values["x"], values["y"], values["hp"], values["mp"], entity_id=values["id"])
+            entity.set_velocity(values["vx"], values["vy"])
+            if values["zone"] is not None:
+                self.zone_for(values["zone"]).add_entity(entity)
+            player["entity"] = entity
+        return player
+
+    def despawn_player(self, player_id):
+        player = self.players.get(player_id)
+        entity = player.pop("entity", None) if player else None
+        if entity is not None:
+            entity.destroy()
+
+    def move_player(self, player_id, dx, dy):
+        player = self.players.get(player_id)
+        entity = player.get("entity") if player else None
+        if entity is not None:
+            entity.move(dx, dy)
+        return entity
 
     def move_player_to_channel(self, player_id, channel_id):
-        with self.lock:
-            # Remove from any previous channel
-            for ch_id, ch_players in self.channels.items():
-                if player_id in ch_players:
-                    ch_players.remove(player_id)
-            # Add to new channel
-            self.channels[channel_id].append(player_id)
+        # Remove from any previous channel
+        for ch_id, ch_players in self.channels.items():
+            if player_id in ch_players:
+                ch_players.remove(player_id)
+        # Add to new channel
+        self.channels[channel_id].append(player_id)
 
     def get_player(self, player_id):
-        with self.lock:
-            return self.players.get(player_id)
+        return self.players.get(player_id)
 
     def get_players_in_channel(self, channel_id):
-        with self.lock:
-            return list(self.channels.get(channel_id, []))
+        return list(self.channels.get(channel_id, []))
@@ -0,0 +1,99 @@
+# server/core/ids.py
+import itertools
+import threading
+from collections import deque
+from server.config import ID_SHARD
+
+# 64-bit id layout: shard (16 bits) | generation (8 bits) | sequence (40 bits)
+SHARD_BITS = 16
+GENERATION_BITS = 8
+SEQUENCE_BITS = 40
+MAX_SHARD = (1 << SHARD_BITS) - 1
+MAX_GENERATION = (1 << GENERATION_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+
+
+class IdError(Exception):
+    pass
+
+
+def make_id(shard: int, generation: int, sequence: int) -> int:
+    return shard << (GENERATION_BITS + SEQUENCE_BITS) | generation << SEQUENCE_BITS | sequence
+
+
+def split_id(entity_id: int) -> tuple:
+    """(shard, generation, sequence) of an id."""
+    return (entity_id >> (GENERATION_BITS + SEQUENCE_BITS),
+            entity_id >> SEQUENCE_BITS & MAX_GENERATION,
+            entity_id & MAX_SEQUENCE)
+
+
+class IdAllocator:
+    """
+    Compact 64-bit entity ids, unique without coordination as long as every
+    process (channel, zone worker) allocating ids has its own shard.
+    Fresh ids count up the sequence; a released id's sequence is handed out
+    again, oldest first, with the generation bumped, so a stale id never
+    matches its successor. A sequence is retired once its generation would wrap.
+    Ids above 2**53 (shard >= 32) lose precision as JavaScript numbers.
+    """
+    def __init__(self, shard=ID_SHARD):
+        if not 0 <= shard <= MAX_SHARD:
+            raise IdError(f"Shard out of range: {shard}")
+        self.shard = shard
+        self.prefix = make_id(shard, 0, 0)
+        self.counter = itertools.count(1)  # 0 is never issued
+        self.free = deque()  # (sequence, generation) ready for reuse
+        self.generations = {}  # sequence -> current generation, for reused sequences
+        self.lock = threading.Lock()
+        self.issued = 0
+        self.retired = 0
+
+    def set_shard(self, shard: int):
+        """Switch shards, e.g. in a freshly started worker process, before any id is issued."""
+        if not 0 <= shard <= MAX_SHARD:
+            raise IdError(f"Shard out of range: {shard}")
+        with self.lock:
+            if self.issued:
+                raise IdError("Cannot change shard after ids have been issued")
+            self.shard = shard
+            self.prefix = make_id(shard, 0, 0)
+
+    def allocate(self) -> int:
+        with self.lock:
+            if self.free:
+                sequence, generation = self.free.popleft()
+                self.issued += 1
+                return self.prefix | generation << SEQUENCE_BITS | sequence
+            sequence = next(self.counter)
+            if sequence > MAX_SEQUENCE:
+                raise IdError(f"Shard {self.shard} has run out of sequences")
+            self.issued += 1
+            return self.prefix | sequence
+
+    def release(self, entity_id: int):
+        """Return an id for reuse; releasing a stale or foreign id raises IdError."""
+        shard, generation, sequence = split_id(entity_id)
+        if shard != self.shard:
+            raise IdError(f"Id {entity_id} belongs to shard {shard}, not {self.shard}")
+        with self.lock:
+            if self.generations.get(sequence, 0) != generation:
+                raise IdError(f"Id {entity_id} is stale or already released")
+            if generation == MAX_GENERATION:
+                self.generations[sequence] = -1  # never matches again
+                self.retired += 1
+                return
+            self.generations[sequence] = generation + 1
+            self.free.append((sequence, generation + 1))
+
+    def is_current(self, entity_id: int) -> bool:
+        """False for ids of another shard or whose sequence has been released since."""
+        shard, generation, sequence = split_id(entity_id)
+        with self.lock:
+            return shard == self.shard and self.generations.get(sequence, 0) == generation
+
+    def stats(self) -> dict:
+        return {"issued": self.issued, "free": len(self.free), "retired": self.retired}
+
+
+entity_ids = IdAllocator()
@@ -0,0 +1,107 @@
+# server/core/interest.py
+from server.config import VIEW_RADIUS
+from server.core.metrics import Histogram, BYTE_BUCKETS
+from server.core.snapshots import SnapshotRing, diff_state
+
+
+class InterestManager:
+    """
+    Area-of-interest replication with delta snapshots.
+    Each tick, every spawned player's view is the set of entities within
+    view_radius in its zone. It is encoded against the last tick the client
+    acknowledged: entities new to the view are sent whole, the rest as changed
+    fields only, and those gone as ids, in one aoi_update per client. Without
+    a usable baseline (never acked, or aged out of the ring) the client gets
+    a full snapshot, marked by "baseline": None. Nothing is sent while the
+    view is identical to the last message the client was sent.
+    """
+    def __init__(self, view_radius=VIEW_RADIUS, snapshots=None):
+        self.view_radius = view_radius
+        self.snapshots = snapshots or SnapshotRing()
+        self.views = {}  # player_id -> {tick: entity ids sent for that tick}
+        self.acked = {}  # player_id -> last acknowledged tick
+        self.last_sent = {}  # player_id -> tick of the last aoi_update sent
+        self.bytes_per_client = Histogram(BYTE_BUCKETS)
+
+    def update(self, players: dict, tick: int) -> int:
+        """Send this tick's aoi_update messages; returns how many were sent."""
+        for player_id in [p for p in self.views if p not in players]:
+            self.forget(player_id)
+
+        snapshots = self.snapshots
+        snapshots.begin(tick)
+        oldest = snapshots.oldest
+        sent = 0
+        for player_id, player in players.items():
+            entity = player.get("entity")
+            client = player.get("client")
+            if entity is None or entity.zone is None or client is None:
+                self.forget(player_id)
+                continue
+
+            views = self.views.setdefault(player_id, {})
+            for old in [t for t in views if t < oldest]:
+                del views[old]
+            baseline = self.acked.get(player_id)
+            base_view = views.get(baseline)
+            base_states = snapshots.get(baseline)
+            full = base_view is None or base_states is None
+            if full:
+                baseline = None
+            last_view = views.get(self.last_sent.get(player_id))
+            last_states = snapshots.get(self.last_sent.get(player_id))
+            dirty = last_view is None or last_states is None
+
+            now = set()
+            entered = []
+            changed = []
+            for other in entity.zone.query_radius(entity.x, entity.y, self.view_radius):
+                state = snapshots.state(other)
+                now.add(other.id)
+                if not dirty:
+                    last = last_states.get(other.id)
+                    dirty = last is None or other.id not in last_view or last[1] is not state
+                if full or other.id not in base_view:
+                    entered.append(state)
+                else:
+                    delta = diff_state(base_states[other.id][1], state)
+                    if delta is not None:
+                        changed.append(delta)
+            left = [] if full else [entity_id for entity_id in base_view if entity_id not in now]
+
+            if not dirty and len(now) != len(last_view):
+                dirty = True  # something left the view
+            if not dirty:
+                continue  # identical to the last message the client was sent
+            # Sent even when empty: the client rolls back to the baseline, which
+            # drops anything that came and went since then
+            views[tick] = now
+            self.last_sent[player_id] = tick
+            data = client.codec.encode({
+                "action": "aoi_update",
+                "tick": tick,
+                "baseline": baseline,
+                "self": entity.id,
+                "enter": entered,
+                "update": changed,
+                "leave": left,
+            })
+            client.send_bytes(data)
+            self.bytes_per_client.observe(len(data))
+            sent += 1
+        return sent
+
+    def ack(self, player_id, tick):
+        """The client has applied tick's aoi_update; use it as the next baseline."""
+        views = self.views.get(player_id)
+        if not views or tick not in views or tick <= self.acked.get(player_id, -1):
+            return
+        self.acked[player_id] = tick
+        for old in [t for t in views if t < tick]:
+            del views[old]
+
+    def forget(self, player_id):
+        """Drop a player's baselines so the next update is a full snapshot."""
+        self.views.pop(player_id, None)
+        self.acked.pop(player_id, None)
+        self.last_sent.pop(player_id, None)
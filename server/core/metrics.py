@@ -0,0 +1,140 @@
+# server/core/metrics.py
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds in seconds, sized around a 33 ms tick
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.033, 0.05, 0.1, 0.25, 0.5, 1.0, float("inf"))
+# Upper bounds in bytes, for message and payload sizes
+BYTE_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 65536, float("inf"))
+
+
+class Histogram:
+    """Fixed-bucket histogram with interpolated percentile estimates."""
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def percentile(self, pct: float) -> float:
+        """Estimate the pct-th percentile (0-100) by interpolating inside its bucket."""
+        with self.lock:
+            if not self.count:
+                return 0.0
+            rank = pct / 100 * self.count
+            seen = 0
+            for index, bucket_count in enumerate(self.counts):
+                if seen + bucket_count >= rank and bucket_count:
+                    lower = self.buckets[index - 1] if index else 0.0
+                    upper = self.buckets[index]
+                    if upper == float("inf"):
+                        return lower
+                    return lower + (upper - lower) * (rank - seen) / bucket_count
+                seen += bucket_count
+            return self.buckets[-2]
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {"buckets": self.buckets, "counts": list(self.counts), "count": self.count, "sum": self.sum}
+
+
+class MetricsRegistry:
+    """
+    Named metric sources rendered in the Prometheus text format.
+    A source is a callable returning {metric: number or Histogram}.
+    """
+    def __init__(self):
+        self.sources = {}  # (name, labels tuple) -> callable
+        self.lock = threading.Lock()
+
+    def register(self, name: str, source, **labels):
+        with self.lock:
+            self.sources[(name, tuple(sorted(labels.items())))] = source
+
+    def unregister(self, name: str, **labels):
+        with self.lock:
+            self.sources.pop((name, tuple(sorted(labels.items()))), None)
+
+    def render(self) -> str:
+        with self.lock:
+            sources = list(self.sources.items())
+        lines = []
+        for (name, labels), source in sources:
+            try:
+                values = source()
+            except Exception as e:
+                print(f"[!] Metrics source {name} failed: {e}")
+                continue
+            for key, value in values.items():
+                metric = f"{name}_{key}"
+                if isinstance(value, Histogram):
+                    lines.extend(_render_histogram(metric, labels, value.snapshot()))
+                elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                    lines.append(f"{metric}{_labels(labels)} {value}")
+                elif isinstance(value, bool):
+                    lines.append(f"{metric}{_labels(labels)} {int(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+def _render_histogram(metric, labels, snap):
+    lines = []
+    cumulative = 0
+    for bound, count in zip(snap["buckets"], snap["counts"]):
+        cumulative += count
+        le = "+Inf" if bound == float("inf") else repr(bound)
+        lines.append(f"{metric}_bucket{_labels(labels, [('le', le)])} {cumulative}")
+    lines.append(f"{metric}_sum{_labels(labels)} {snap['sum']}")
+    lines.append(f"{metric}_count{_labels(labels)} {snap['count']}")
+    return lines
+
+
+registry = MetricsRegistry()
+
+
+class MetricsServer:
+    """Serves registry.render() at /metrics from a daemon thread."""
+    def __init__(self, host="0.0.0.0", port=9100, metrics=registry):
+        metrics_registry = metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics_registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # scrapes every few seconds would flood the console
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True, name="metrics")
+
+    def start(self):
+        self.thread.start()
+        host, port = self.httpd.server_address[:2]
+        print(f"[+] Metrics on http://{host}:{port}/metrics")
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,62 @@
+# server/core/snapshots.py
+from collections import deque
+from server.config import SNAPSHOT_HISTORY, SNAPSHOT_FLOAT_PRECISION
+
+
+class SnapshotRing:
+    """
+    Replicated entity state for the last `size` ticks.
+    Each tick maps entity id -> (version, state) for the entities someone
+    could see. An entity whose version hasn't changed reuses the previous
+    tick's state dict, so "unchanged since the baseline" is an identity check.
+    """
+    def __init__(self, size=SNAPSHOT_HISTORY, precision=SNAPSHOT_FLOAT_PRECISION):
+        self.size = size
+        self.precision = dict(precision)
+        self.ticks = {}  # tick -> {entity id: (version, state)}
+        self.order = deque()
+        self.current = {}
+        self.previous = {}
+
+    def begin(self, tick: int):
+        """Start the snapshot for tick, evicting the oldest beyond size."""
+        self.previous = self.current
+        self.current = self.ticks[tick] = {}
+        self.order.append(tick)
+        while len(self.order) > self.size:
+            del self.ticks[self.order.popleft()]
+
+    def state(self, entity) -> dict:
+        """entity's state in the current snapshot, quantized and built at most once per tick."""
+        entry = self.current.get(entity.id)
+        if entry is None:
+            entry = self.previous.get(entity.id)
+            if entry is None or entry[0] != entity.version:
+                entry = (entity.version, self.quantize(entity.state()))
+            self.current[entity.id] = entry
+        return entry[1]
+
+    def quantize(self, state: dict) -> dict:
+        for field, places in self.precision.items():
+            value = state.get(field)
+            if isinstance(value, float):
+                state[field] = round(value, places)
+        return state
+
+    def get(self, tick):
+        return self.ticks.get(tick)
+
+    @property
+    def oldest(self):
+        return self.order[0] if self.order else None
+
+
+def diff_state(base: dict, state: dict):
+    """Fields of state that differ from base, with the id; None if nothing changed."""
+    if base is state:
+        return None
+    changed = {field: value for field, value in state.items() if base.get(field) != value}
+    if not changed:
+        return None
+    changed["id"] = state["id"]
+    return changed
@@ -1,42 +1,278 @@
 # server/core/world.py
-from .utils import generate_id
+import math
+import weakref
+from server.config import ZONE_CELL_SIZE
+from .entity_store import COLUMNS, EntityStore, allocate_array, np
+from .ids import entity_ids
+
+def _column(name, doc):
+    def get(self):
+        return getattr(self.store, name)[self.index]
+
+    def set(self, value):
+        getattr(self.store, name)[self.index] = value
+
+    return property(get, set, doc=doc)
 
 class Entity:
-    """Base class for all entities in the game world."""
-    def __init__(self, name, x=0, y=0):
-        self.id = generate_id()
+    """
+    Base class for all entities in the game world.
+    A thin view: numeric state lives in an EntityStore (the zone's while the
+    entity is in one, the shared detached store otherwise) at slot index.
+    """
+    __slots__ = ("id", "name", "zone", "store", "index", "__weakref__")
+
+    def __init__(self, name, x=0, y=0, hp=0, mp=0, entity_id=None):
+        self.id = entity_id if entity_id is not None else entity_ids.allocate()
         self.name = name
-        self.x = x
-        self.y = y
+        self.zone = None  # set by Zone.add_entity so moves keep its grid current
+        self.store = detached
+        self.index = detached.add(self, x=x, y=y, hp=hp, mp=mp)
+
+    x = _column("x", "Position")
+    y = _column("y", "Position")
+    vx = _column("vx", "Velocity, in units per second")
+    vy = _column("vy", "Velocity, in units per second")
+    hp = _column("hp", "Hit points")
+    mp = _column("mp", "Mana points")
+    version = _column("version", "Bumped on every replicated change")
+
+    def attach(self, store: EntityStore):
+        """Move this entity's state into store."""
+        if store is not self.store:
+            values = self.store.remove(self.index)
+            self.store = store
+            self.index = store.add(self, **values)
+
+    def destroy(self):
+        """Remove from the world for good: frees the store slot and the id."""
+        if self.zone is not None:
+            self.zone.remove_entity(self.id)
+        if self.store is not None:
+            self.store.remove(self.index)
+            self.store = None
+            if entity_ids.is_current(self.id):  # not for ids passed in from elsewhere
+                entity_ids.release(self.id)
 
     def move(self, dx, dy):
-        self.x += dx
-        self.y += dy
+        store, index = self.store, self.index
+        x = store.x[index] + dx
+        y = store.y[index] + dy
+        if not (math.isfinite(x) and math.isfinite(y)):
+            raise ValueError(f"Entity {self.id} cannot move to ({x}, {y})")
+        store.x[index] = x
+        store.y[index] = y
+        store.version[index] += 1
+        if self.zone is not None:
+            self.zone.grid.update(self)
+
+    def set_velocity(self, vx, vy):
+        self.store.set_velocity(self.index, vx, vy)
+
+    def set_stats(self, hp=None, mp=None):
+        if hp is not None:
+            self.hp = hp
+        if mp is not None:
+            self.mp = mp
+        self.version += 1
+
+    def state(self) -> dict:
+        """Replicated fields, as sent to clients."""
+        store, index = self.store, self.index
+        return {"id": self.id, "name": self.name, "x": store.x[index], "y": store.y[index],
+                "hp": store.hp[index], "mp": store.mp[index]}
 
     def __repr__(self):
         return f"<Entity id={self.id} name={self.name} x={self.x} y={self.y}>"
 
+# Below this many moved slots, SpatialGrid.relocate() updates them one by one
+RELOCATE_SWEEP = 64
+
+class DetachedStore(EntityStore):
+    """
+    Holds entities that are not in a zone, by weak reference: an entity
+    dropped without destroy() gives its slot back as soon as it is collected.
+    """
+    def add(self, entity, **values) -> int:
+        index = super().add(entity, **values)
+        self.entities[index] = weakref.ref(entity, lambda ref: self._collected(index, ref))
+        return index
+
+    def _collected(self, index, ref):
+        # Freeing a slot drops its weakref, so this only fires while the slot is still ref's
+        if self.entities[index] is ref:
+            self.remove(index)
+
+detached = DetachedStore()
+
+class SpatialGrid:
+    """
+    Uniform grid of fixed-size cells covering a zone.
+    Cells are one flat list indexed row * cols + col, holding the slots of
+    the zone's EntityStore; the store's cell column records each slot's cell
+    (plus one, 0 = not in the grid). Positions outside the zone clamp to the
+    border cells. Moves only touch the grid when an entity crosses into
+    another cell.
+    """
+    def __init__(self, store, width, height, cell_size=ZONE_CELL_SIZE):
+        self.store = store
+        self.cell_size = cell_size
+        self.cols = max(1, -(-int(width) // cell_size))
+        self.rows = max(1, -(-int(height) // cell_size))
+        self.cells = [set() for _ in range(self.cols * self.rows)]
+        self.count = 0
+
+    def _col(self, x):
+        return min(max(int(x // self.cell_size), 0), self.cols - 1)
+
+    def _row(self, y):
+        return min(max(int(y // self.cell_size), 0), self.rows - 1)
+
+    def cell_of(self, x, y):
+        return self._row(y) * self.cols + self._col(x)
+
+    def insert(self, entity):
+        store, index = self.store, entity.index
+        cell = self.cell_of(store.x[index], store.y[index])
+        self.cells[cell].add(index)
+        store.cell[index] = cell + 1
+        self.count += 1
+
+    def remove(self, entity):
+        store, index = self.store, entity.index
+        cell = store.cell[index] - 1
+        if cell >= 0:
+            self.cells[cell].discard(index)
+            store.cell[index] = 0
+            self.count -= 1
+
+    def update(self, entity):
+        store, index = self.store, entity.index
+        cell = self.cell_of(store.x[index], store.y[index]) + 1
+        old = store.cell[index]
+        if old and old != cell:
+            self.cells[old - 1].discard(index)
+            self.cells[cell - 1].add(index)
+            store.cell[index] = cell
+
+    def relocate(self, indices):
+        """update() for many slots at once, e.g. after EntityStore.integrate."""
+        if np is None or len(indices) < RELOCATE_SWEEP:
+            for index in indices:
+                self.update(self.store.entities[index])
+            return
+        store, size = self.store, self.cell_size
+        slots = np.array(indices, dtype=np.intp)
+        columns = {name: np.frombuffer(getattr(store, name), dtype=COLUMNS[name], count=store.size)
+                   for name in ("x", "y", "cell")}
+        col = np.clip(columns["x"][slots] // size, 0, self.cols - 1).astype(np.int64)
+        row = np.clip(columns["y"][slots] // size, 0, self.rows - 1).astype(np.int64)
+        new = row * self.cols + col + 1
+        old = columns["cell"][slots]
+        crossed = np.flatnonzero((old != new) & (old != 0))
+        self.apply_moves(zip(slots[crossed].tolist(), old[crossed].tolist(), new[crossed].tolist()))
+        columns["cell"][slots[crossed]] = new[crossed]
+
+    def apply_moves(self, moves):
+        """Move slots between cells: (index, old cell + 1, new cell + 1) triples."""
+        cells = self.cells
+        for index, was, now in moves:
+            cells[was - 1].discard(index)
+            cells[now - 1].add(index)
+
+    def query_rect(self, x0, y0, x1, y1):
+        """Entities inside the rectangle [x0, x1] x [y0, y1]."""
+        result = []
+        xs, ys, entities = self.store.x, self.store.y, self.store.entities
+        cells, cols = self.cells, self.cols
+        c0, c1 = self._col(x0), self._col(x1)
+        for row in range(self._row(y0), self._row(y1) + 1):
+            base = row * cols
+            for cell in cells[base + c0:base + c1 + 1]:
+                for index in cell:
+                    if x0 <= xs[index] <= x1 and y0 <= ys[index] <= y1:
+                        result.append(entities[index])
+        return result
+
+    def query_radius(self, x, y, radius):
+        """Entities within radius of (x, y)."""
+        r2 = radius * radius
+        result = []
+        xs, ys, entities = self.store.x, self.store.y, self.store.entities
+        cells, cols = self.cells, self.cols
+        c0, c1 = self._col(x - radius), self._col(x + radius)
+        for row in range(self._row(y - radius), self._row(y + radius) + 1):
+            base = row * cols
+            for cell in cells[base + c0:base + c1 + 1]:
+                for index in cell:
+                    dx = xs[index] - x
+                    dy = ys[index] - y
+                    if dx * dx + dy * dy <= r2:
+                        result.append(entities[index])
+        return result
+
+    def __len__(self):
+        return self.count
+
 class Zone:
-    """A zone in the game world."""
-    def __init__(self, name, width, height):
+    """A zone in the game world. Its entities' state lives in self.store."""
+    def __init__(self, name, width, height, cell_size=ZONE_CELL_SIZE, allocate=allocate_array):
         self.name = name
         self.width = width
         self.height = height
         self.entities = {}
+        self.store = EntityStore(allocate=allocate)
+        self.grid = SpatialGrid(self.store, width, height, cell_size)
 
     def add_entity(self, entity: Entity):
+        if entity.zone is not None and entity.zone is not self:
+            entity.zone.remove_entity(entity.id)
+        entity.attach(self.store)
         self.entities[entity.id] = entity
+        entity.zone = self
+        self.grid.insert(entity)
 
     def remove_entity(self, entity_id):
-        if entity_id in self.entities:
-            del self.entities[entity_id]
+        entity = self.entities.pop(entity_id, None)
+        if entity is not None:
+            self.grid.remove(entity)
+            entity.zone = None
+            entity.attach(detached)
+
+    def integrate(self, dt, exits=None):
+        """
+        Move every entity with a velocity; returns how many moved. Moved
+        entities now outside the zone are appended to exits as (zone, entity).
+        """
+        moved = self.store.integrate(dt)
+        self.grid.relocate(moved)
+        if exits is not None and moved:
+            store, width, height = self.store, self.width, self.height
+            x, y, entities = store.x, store.y, store.entities
+            exits.extend((self, entities[index]) for index in moved
+                         if not (0 <= x[index] < width and 0 <= y[index] < height))
+        return len(moved)
 
     def get_entities(self):
         return list(self.entities.values())
 
+    def query_radius(self, x, y, radius):
+        return self.grid.query_radius(x, y, radius)
+
+    def query_rect(self, x0, y0, x1, y1):
+        return self.grid.query_rect(x0, y0, x1, y1)
+
     def __repr__(self):
         return f"<Zone {self.name} ({self.width}x{self.height}) entities={len(self.entities)}>"
 
+def clamp_to_zone(zone, entity):
+    """Zone exit handler: stop an entity that left its zone just inside the edge."""
+    entity.x = min(max(entity.x, 0.0), math.nextafter(zone.width, 0.0))
+    entity.y = min(max(entity.y, 0.0), math.nextafter(zone.height, 0.0))
+    entity.set_velocity(0, 0)
+    entity.version += 1
+    zone.grid.update(entity)
+
 class World:
     """The main game world containing multiple zones."""
     def __init__(self):
@@ -0,0 +1,251 @@
+# server/core/zone_pool.py
+# Per-zone parallel ticks: zone entity columns live in shared memory and a
+# pool of processes steps them, each owning a fixed set of zones.
+import multiprocessing
+import time
+from array import array
+from multiprocessing import shared_memory
+from server.config import ZONE_WORKERS
+from server.core.entity_store import COLUMNS, SWEEP_RATIO, np
+from server.core.metrics import Histogram
+
+# Columns a zone worker reads or writes
+STEP_COLUMNS = ("x", "y", "vx", "vy", "version", "moving_mask", "cell")
+
+
+class _Segment(shared_memory.SharedMemory):
+    def __del__(self):
+        try:
+            self.close()
+        except BufferError:
+            pass  # a store column still views it; the mapping goes with the process
+
+
+class SharedColumns:
+    """
+    EntityStore allocate hook backed by shared memory: every column is its
+    own segment, viewed through a memoryview cast to the column's typecode.
+    layout() names the current segments for other processes to attach to.
+    A grow replaces a column's segment; the old one is unlinked at once and
+    closed once nothing here still views it.
+    """
+    def __init__(self):
+        self.segments = {}  # column name -> SharedMemory
+        self.capacity = 0
+        self.retired = []
+
+    def __call__(self, name: str, typecode: str, capacity: int):
+        itemsize = array(typecode).itemsize
+        segment = _Segment(create=True, size=max(1, capacity * itemsize))
+        old = self.segments.get(name)
+        if old is not None:
+            old.unlink()
+            self.retired.append(old)
+        self.segments[name] = segment
+        self.capacity = capacity
+        return segment.buf[:capacity * itemsize].cast(typecode)
+
+    def layout(self) -> dict:
+        return {name: (segment.name, COLUMNS[name], self.capacity) for name, segment in self.segments.items()}
+
+    def collect(self):
+        """Close retired segments whose views have all been released."""
+        for segment in list(self.retired):
+            try:
+                segment.close()
+                self.retired.remove(segment)
+            except BufferError:
+                pass
+
+    def close(self):
+        for segment in self.segments.values():
+            segment.unlink()
+            self.retired.append(segment)
+        self.segments = {}
+        self.collect()  # a store still in use keeps its mapping until process exit
+
+
+class AttachedZone:
+    """A zone's columns as seen from a worker process."""
+    def __init__(self, layout: dict, geometry: tuple):
+        self.segments = []
+        self.columns = {}
+        for name in STEP_COLUMNS:
+            segment_name, typecode, capacity = layout[name]
+            segment = _Segment(name=segment_name)
+            self.segments.append(segment)
+            self.columns[name] = segment.buf[:capacity * array(typecode).itemsize].cast(typecode)
+        self.width, self.height, self.cell_size, self.cols, self.rows = geometry
+
+    def step(self, size: int, dt: float):
+        """
+        Integrate velocities in place (as EntityStore.integrate) and keep the
+        cell column current. Returns the grid moves to apply, as
+        (slot, old cell + 1, new cell + 1), and the moving slots now outside
+        the zone.
+        """
+        c = {name: np.frombuffer(self.columns[name], dtype=COLUMNS[name], count=size) for name in STEP_COLUMNS}
+        mask = c["moving_mask"]
+        moving = np.flatnonzero(mask)
+        if not len(moving):
+            return [], []
+        x, y, vx, vy = c["x"], c["y"], c["vx"], c["vy"]
+        if len(moving) > size * SWEEP_RATIO:
+            x += vx * dt
+            y += vy * dt
+            c["version"] += mask
+        else:
+            x[moving] += vx[moving] * dt
+            y[moving] += vy[moving] * dt
+            c["version"][moving] += 1
+
+        mx, my = x[moving], y[moving]
+        col = np.clip(mx // self.cell_size, 0, self.cols - 1).astype(np.int64)
+        row = np.clip(my // self.cell_size, 0, self.rows - 1).astype(np.int64)
+        new = row * self.cols + col + 1
+        old = c["cell"][moving]
+        crossed = np.flatnonzero((old != new) & (old != 0))
+        slots = moving[crossed]
+        c["cell"][slots] = new[crossed]
+        outside = moving[(mx < 0) | (mx >= self.width) | (my < 0) | (my >= self.height)]
+        return list(zip(slots.tolist(), old[crossed].tolist(), new[crossed].tolist())), outside.tolist()
+
+    def close(self):
+        for view in self.columns.values():
+            view.release()
+        for segment in self.segments:
+            segment.close()
+
+
+def zone_worker(conn):
+    """
+    Worker process loop. Messages, in order on one pipe:
+    ("attach", zone, layout, geometry), ("detach", zone),
+    ("tick", dt, [(zone, size), ...]) -> [(zone, moves, outside), ...],
+    ("stop",).
+    """
+    zones = {}
+    try:
+        while True:
+            message = conn.recv()
+            kind = message[0]
+            if kind == "tick":
+                _, dt, sizes = message
+                conn.send([(name, *zones[name].step(size, dt)) for name, size in sizes])
+            elif kind == "attach":
+                _, name, layout, geometry = message
+                if name in zones:
+                    zones.pop(name).close()
+                zones[name] = AttachedZone(layout, geometry)
+            elif kind == "detach":
+                zones.pop(message[1]).close()
+            elif kind == "stop":
+                break
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        for zone in zones.values():
+            zone.close()
+
+
+class ZonePool:
+    """
+    Ticks zones in parallel across worker processes, each owning the zones
+    it was given (the one with the fewest entities gets the next new zone).
+    Zones must be built with allocator(zone_name) so their columns are
+    shared. tick() is the per-tick barrier: every worker steps its zones,
+    then the grid moves they found are applied here. Zones never interact
+    within a tick; what crosses between them, entities leaving their zone,
+    comes back as events for the engine to apply before the next tick.
+    """
+    def __init__(self, workers=ZONE_WORKERS):
+        if np is None:
+            raise RuntimeError("Parallel zone ticks need numpy")
+        self.worker_count = max(1, workers)
+        self.workers = []  # (process, pipe)
+        self.columns = {}  # zone name -> SharedColumns
+        self.owners = {}  # zone name -> worker index
+        self.attached = {}  # zone name -> capacity the owner attached at
+        self.barrier = Histogram()  # seconds from sending a tick to every worker finishing it
+
+    def start(self):
+        context = multiprocessing.get_context("spawn")
+        for index in range(self.worker_count):
+            parent, child = context.Pipe()
+            process = context.Process(target=zone_worker, args=(child,), name=f"zone-worker-{index}", daemon=True)
+            process.start()
+            child.close()
+            self.workers.append((process, parent))
+
+    def allocator(self, zone_name: str) -> SharedColumns:
+        columns = self.columns[zone_name] = SharedColumns()
+        return columns
+
+    def tick(self, zones: dict, dt: float) -> list:
+        """Step every zone; returns exit events as (zone, entity) pairs."""
+        self._sync(zones)
+        start = time.monotonic()
+        batches = [[] for _ in self.workers]
+        for name, zone in zones.items():
+            batches[self.owners[name]].append((name, zone.store.size))
+        for (_, pipe), batch in zip(self.workers, batches):
+            if batch:
+                pipe.send(("tick", dt, batch))
+        results = [pipe.recv() for (_, pipe), batch in zip(self.workers, batches) if batch]
+        self.barrier.observe(time.monotonic() - start)
+
+        exits = []
+        for result in results:
+            for name, moves, outside in result:
+                zone = zones[name]
+                zone.grid.apply_moves(moves)
+                entities = zone.store.entities
+                exits.extend((zone, entities[index]) for index in outside)
+        return exits
+
+    def _sync(self, zones: dict):
+        """Attach new and grown zones to their workers, detach removed ones."""
+        for name in [n for n in self.owners if n not in zones]:
+            self.workers[self.owners.pop(name)][1].send(("detach", name))
+            del self.attached[name]
+            self.columns.pop(name).close()
+        for name, zone in zones.items():
+            columns = self.columns.get(name)
+            if columns is None:
+                raise ValueError(f"Zone {name} was not built with ZonePool.allocator")
+            if self.attached.get(name) == columns.capacity:
+                continue
+            owner = self.owners.get(name)
+            if owner is None:
+                load = [0] * len(self.workers)
+                for other, index in self.owners.items():
+                    load[index] += len(zones[other].store) if other in zones else 0
+                owner = self.owners[name] = load.index(min(load))
+            grid = zone.grid
+            geometry = (zone.width, zone.height, grid.cell_size, grid.cols, grid.rows)
+            self.workers[owner][1].send(("attach", name, columns.layout(), geometry))
+            self.attached[name] = columns.capacity
+            columns.collect()
+
+    def stop(self):
+        for process, pipe in self.workers:
+            try:
+                pipe.send(("stop",))
+            except OSError:
+                pass
+        for process, pipe in self.workers:
+            process.join(5)
+            if process.is_alive():
+                process.terminate()
+            pipe.close()
+        self.workers = []
+        for columns in self.columns.values():
+            columns.close()
+        self.columns = {}
+        self.owners = {}
+        self.attached = {}
+
+    def stats(self) -> dict:
+        return {"workers": len(self.workers), "zones": len(self.owners),
+                "barrier_p50_seconds": self.barrier.percentile(50),
+                "barrier_p99_seconds": self.barrier.percentile(99)}
@@ -0,0 +1,61 @@
+# server/db/character_cache.py
+import threading
+from collections import OrderedDict
+from server.config import CHARACTER_CACHE_SIZE
+
+
+class CharacterListCache:
+    """
+    LRU cache of serialized character lists (as_dict() payloads) keyed by user_id.
+    Filled from data the login query already loaded; writes to a user's
+    characters invalidate their entry, and on_invalidate(user_id) passes
+    that on to other processes caching the same users.
+    """
+    def __init__(self, max_entries=CHARACTER_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # user_id -> tuple of character dicts
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.on_invalidate = None
+
+    def get(self, user_id):
+        with self.lock:
+            characters = self.entries.get(user_id)
+            if characters is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(user_id)
+            self.hits += 1
+            return characters
+
+    def put(self, user_id, characters):
+        """Store a user's characters; accepts Character objects or their dicts."""
+        payload = tuple(c if isinstance(c, dict) else c.as_dict() for c in characters)
+        with self.lock:
+            self.entries[user_id] = payload
+            self.entries.move_to_end(user_id)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+        return payload
+
+    def invalidate(self, user_id, share=True):
+        """Drop a user's entry; share=False for invalidations received from elsewhere."""
+        with self.lock:
+            self.entries.pop(user_id, None)
+        if share and self.on_invalidate is not None:
+            self.on_invalidate(user_id)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+character_cache = CharacterListCache()
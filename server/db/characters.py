@@ -1,33 +1,37 @@
 # server/db/characters.py
 import re
 from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 from .database import SessionLocal
 from .models import Character
+from .name_index import name_index
+from .character_cache import character_cache
+from .write_behind import write_behind
 
 # Only allow letters, numbers, underscores; max 12 characters
 NAME_REGEX = re.compile(r"^[A-Za-z0-9_]{1,12}$")
 
 
-def check_name(name: str) -> tuple[bool, str | None]:
+def check_name(name: str, reserve_for=None) -> tuple[bool, str | None]:
+    """
+    Validate a name and check availability against the in-memory name index.
+    With reserve_for set, a free name is also held for that user until they create it.
+    """
     if not NAME_REGEX.match(name):
         return False, "Invalid name: only letters, numbers, underscores, 1-12 characters allowed"
 
-    session = SessionLocal()
-    try:
-        existing = session.execute(
-            select(Character).where(Character.name == name)
-        ).one_or_none()
-
-        if existing is not None:
-            return False, "Character name already exists"
+    if reserve_for is not None:
+        available = name_index.reserve(name, reserve_for)
+    else:
+        available = not name_index.is_taken(name)
+    if not available:
+        return False, "Character name already exists"
 
-        return True, None
-    finally:
-        session.close()
+    return True, None
 
 
 def create_character(user_id: int, name: str, gender: str = "Male", hair: str | None = None) -> Character:
-    ok, reason = check_name(name)
+    ok, reason = check_name(name, reserve_for=user_id)
     if not ok:
         raise ValueError(reason)
 
@@ -65,7 +69,18 @@ def create_character(user_id: int, name: str, gender: str = "Male", hair: str |
         )
 
         session.add(char)
-        session.commit()
+        try:
+            session.commit()
+        except IntegrityError:
+            # Taken by another process, or lost a race (unique index)
+            session.rollback()
+            name_index.release(name, user_id)
+            raise ValueError("Character name already exists")
+        except Exception:
+            name_index.release(name, user_id)
+            raise
+        name_index.add(name)
+        character_cache.invalidate(user_id)
         session.refresh(char)
 
         # Calculate derived stats and attach to the object
@@ -89,8 +104,12 @@ def delete_character(user_id: int, char_id: int) -> bool:
         if not char:
             return False  # Not found or doesn’t belong to this user
 
+        name = char.name
         session.delete(char)
         session.commit()
+        write_behind.discard(char_id)
+        name_index.discard(name)
+        character_cache.invalidate(user_id)
         return True
     finally:
         session.close()
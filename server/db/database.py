@@ -1,10 +1,43 @@
-from sqlalchemy import create_engine, select
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
-from server.config.database import DATABASE_URL
+from server.config import DB_PROFILE
+from server.config.database import (
+    DATABASE_URL, POOL_SIZE, MAX_OVERFLOW, POOL_TIMEOUT, POOL_RECYCLE, ENGINE_PROFILES
+)
 from passlib.context import CryptContext
 
+def create_engine_from_config(url=DATABASE_URL, profile=DB_PROFILE):
+    """Build the engine for a config profile: pool sizing, pre-ping, echo and SQLite pragmas."""
+    settings = ENGINE_PROFILES[profile]
+    url = make_url(url)
+    is_sqlite = url.get_backend_name() == "sqlite"
+    in_memory = is_sqlite and url.database in (None, "", ":memory:")
+
+    options = {"echo": settings["echo"], "future": True, "pool_pre_ping": settings["pool_pre_ping"]}
+    if not in_memory:  # in-memory SQLite uses a single static connection
+        options.update(
+            pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW,
+            pool_timeout=POOL_TIMEOUT, pool_recycle=POOL_RECYCLE,
+        )
+    new_engine = create_engine(url, **options)
+
+    pragmas = dict(settings["sqlite_pragmas"]) if is_sqlite else {}
+    if in_memory:
+        pragmas.pop("journal_mode", None)
+        pragmas.pop("mmap_size", None)
+    if pragmas:
+        @event.listens_for(new_engine, "connect")
+        def set_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+            cursor.close()
+
+    return new_engine
+
 # Engine and session
-engine = create_engine(DATABASE_URL, echo=True, future=True)
+engine = create_engine_from_config()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 
 # Base class
@@ -13,11 +46,13 @@ Base = declarative_base()
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-# Initialize DB tables
+# Initialize DB tables and bring existing ones up to the latest schema version
 def init_db():
     # Import models here to avoid circular import
     from . import models
+    from .migrations import migrate
     Base.metadata.create_all(bind=engine)
+    migrate(engine)
 
 class Database:
     @staticmethod
@@ -0,0 +1,101 @@
+# server/db/migrations.py
+# Versioned schema migrations, applied in order by init_db().
+# Each migration runs in its own transaction and is recorded in schema_migrations.
+# Never edit a released migration; add a new one.
+from sqlalchemy import inspect, text
+
+MIGRATIONS = []  # (version, description, fn(connection)), ascending
+
+
+class MigrationError(Exception):
+    pass
+
+
+def migration(version, description):
+    def register(fn):
+        MIGRATIONS.append((version, description, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return register
+
+
+def _add_missing_columns(conn, table, columns):
+    existing = {c["name"] for c in inspect(conn).get_columns(table)}
+    quote = conn.dialect.identifier_preparer.quote
+    for name, ddl in columns:
+        if name not in existing:
+            conn.execute(text(f"ALTER TABLE {quote(table)} ADD COLUMN {quote(name)} {ddl}"))
+
+
+@migration(1, "Bring pre-migration databases up to the current columns")
+def add_legacy_columns(conn):
+    # Replaces the ad-hoc db/test1.py ALTER script
+    _add_missing_columns(conn, "users", [
+        ("email", "VARCHAR"),
+        ("first_name", "VARCHAR"),
+        ("last_name", "VARCHAR"),
+    ])
+    _add_missing_columns(conn, "characters", [
+        ("title", "VARCHAR DEFAULT 'Human'"),
+        ("gold", "INTEGER DEFAULT 0"),
+        ("x", "INTEGER DEFAULT 100"),
+        ("y", "INTEGER DEFAULT 100"),
+        ("map_id", "INTEGER DEFAULT 100001"),
+        ("level", "INTEGER DEFAULT 0"),
+        ("exp", "INTEGER DEFAULT 0"),
+        ("appearance", "JSON"),
+        ("gear", "JSON"),
+        ("hp", "INTEGER DEFAULT 50"),
+        ("mp", "INTEGER DEFAULT 0"),
+        ("str", "INTEGER DEFAULT 0"),
+        ("int", "INTEGER DEFAULT 0"),
+        ("dex", "INTEGER DEFAULT 0"),
+        ("vit", "INTEGER DEFAULT 0"),
+        ("agi", "INTEGER DEFAULT 0"),
+        ("end", "INTEGER DEFAULT 0"),
+    ])
+    conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ix_users_email ON users (email)"))
+
+
+@migration(2, "Index characters.user_id and enforce unique characters.name")
+def index_character_lookups(conn):
+    duplicates = conn.execute(
+        text("SELECT name FROM characters GROUP BY name HAVING COUNT(*) > 1")
+    ).scalars().all()
+    if duplicates:
+        raise MigrationError(f"Duplicate character names must be resolved first: {duplicates[:20]}")
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_characters_user_id ON characters (user_id)"))
+    conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ix_characters_name ON characters (name)"))
+    # users.username is already indexed through its UNIQUE constraint
+
+
+def current_version(conn) -> int:
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations (version INTEGER PRIMARY KEY, description VARCHAR)"
+    ))
+    return conn.execute(text("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")).scalar()
+
+
+def migrate(engine, target=None) -> int:
+    """Apply pending migrations up to target (default: latest). Returns the resulting version."""
+    with engine.begin() as conn:
+        version = current_version(conn)
+    for number, description, fn in MIGRATIONS:
+        if number <= version or (target is not None and number > target):
+            continue
+        with engine.begin() as conn:
+            fn(conn)
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, description) VALUES (:v, :d)"),
+                {"v": number, "d": description},
+            )
+        print(f"[DB] Applied migration {number}: {description}")
+        version = number
+    return version
+
+
+if __name__ == "__main__":
+    from .database import engine, init_db
+    init_db()
+    with engine.connect() as conn:
+        print(f"[DB] Schema version {current_version(conn)}")
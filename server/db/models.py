@@ -1,7 +1,23 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, ForeignKey, JSON, event
 from sqlalchemy.orm import relationship
+from server.core.entity_store import np
 from .database import Base
 
+# Gear item stats, in _gear_modifiers order: the first four are percentages
+# on multipliers starting at 1.0, the rest flat bonuses starting at 0
+GEAR_STATS = ("spd", "jmp", "hp", "att_spd", "def", "mp", "att", "gravity")
+GEAR_MULTIPLIERS = 4
+
+
+def _round2(values):
+    """round(v, 2) over an array, exactly as Python rounds: ties are left to round()."""
+    scaled = values * 100
+    rounded = np.rint(scaled) / 100
+    for i in np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6).tolist():
+        rounded[i] = round(float(values[i]), 2)
+    return rounded
+
+
 class User(Base):
     __tablename__ = "users"
     id = Column(Integer, primary_key=True, index=True)
@@ -16,8 +32,8 @@ class User(Base):
 class Character(Base):
     __tablename__ = "characters"
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
-    name = Column(String)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    name = Column(String, unique=True, index=True)
     title = Column(String, default="Human")
     gold = Column(Integer, default=0)
     x = Column(Integer, default=100)
@@ -62,8 +78,21 @@ class Character(Base):
     # -------------------------
     # Derived stats calculation
     # -------------------------
+    # Columns the derived stats depend on; setting any of them invalidates the cache.
+    # gear is JSON: reassign it (or flag_modified) after changing items in place.
+    DERIVED_STAT_INPUTS = ("str", "int", "dex", "vit", "agi", "end", "gear")
+
     def calculate_derived_stats(self) -> dict:
-        # Gear multipliers
+        """Derived stats, memoized until one of DERIVED_STAT_INPUTS changes."""
+        version = getattr(self, "_stats_version", 0)
+        cached = getattr(self, "_derived_cache", None)
+        if cached is None or cached[0] != version:
+            cached = self._derived_cache = (version, self._compute_derived_stats())
+        return dict(cached[1])
+
+    @staticmethod
+    def _gear_modifiers(gear) -> tuple:
+        """Sum gear bonuses: (spd, jmp, hp, att_spd multipliers, def, mp, att, gravity bonuses)."""
         spd_mult = 1.0
         jmp_mult = 1.0
         hp_mult = 1.0
@@ -73,8 +102,8 @@ class Character(Base):
         att_bonus = 0
         gravity_bonus = 0.0
 
-        if self.gear:
-            for item in self.gear.values():
+        if gear:
+            for item in gear.values():
                 if not item:
                     continue
                 spd_mult += item.get("spd", 0) / 100
@@ -86,6 +115,13 @@ class Character(Base):
                 att_bonus += item.get("att", 0)
                 gravity_bonus += item.get("gravity", 0)
 
+        return spd_mult, jmp_mult, hp_mult, att_spd_mult, def_bonus, mp_bonus, att_bonus, gravity_bonus
+
+    def _compute_derived_stats(self) -> dict:
+        # Gear multipliers
+        (spd_mult, jmp_mult, hp_mult, att_spd_mult,
+         def_bonus, mp_bonus, att_bonus, gravity_bonus) = self._gear_modifiers(self.gear)
+
         # Base calculations
         base_spd = self.BASE_SPD + self.agi * 0.05
         base_jmp = self.BASE_JMP + self.dex * 0.05
@@ -125,6 +161,99 @@ class Character(Base):
 
         return derived
 
+    @classmethod
+    def calculate_derived_stats_batch(cls, columns: dict) -> dict:
+        """
+        Derived stats for many characters at once, column by column.
+        columns maps each of DERIVED_STAT_INPUTS to an equal-length sequence;
+        returns {stat name: list of values}, matching calculate_derived_stats.
+        Vectorized with numpy when it is installed.
+        """
+        if np is not None:
+            return {stat: values.tolist() for stat, values in cls._derived_stats_arrays(columns).items()}
+        str_, int_, dex, vit, agi, end = (columns[name] for name in ("str", "int", "dex", "vit", "agi", "end"))
+        # Transpose per-row gear sums into one column per modifier
+        modifiers = list(map(cls._gear_modifiers, columns["gear"]))
+        (spd_mult, jmp_mult, hp_mult, att_spd_mult,
+         def_bonus, mp_bonus, att_bonus, gravity_bonus) = zip(*modifiers) if modifiers else ((),) * 8
+
+        att = [min(round(cls.BASE_ATT + (d + a + s) * 0.05 + b, 2), cls.MAX_ATT)
+               for d, a, s, b in zip(dex, agi, str_, att_bonus)]
+        spread = [0.3 / (1 + 0.05 * d) for d in dex]
+        return {
+            "SPD": [min(round((cls.BASE_SPD + a * 0.05) * m, 2), cls.MAX_SPD) for a, m in zip(agi, spd_mult)],
+            "JMP": [min(round((cls.BASE_JMP + d * 0.05) * m, 2), cls.MAX_JMP) for d, m in zip(dex, jmp_mult)],
+            "ATT": att,
+            "ATT_SPD": [min(round((cls.BASE_ATT_SPD + s * 0.05) * m, 2), cls.MAX_ATT_SPD)
+                        for s, m in zip(str_, att_spd_mult)],
+            "HP": [min(round((cls.BASE_HP + v * 0.05) * m, 2), cls.MAX_HP) for v, m in zip(vit, hp_mult)],
+            "MP": [min(round(cls.BASE_MP + i * 0.05 + b, 2), cls.MAX_MP) for i, b in zip(int_, mp_bonus)],
+            "DEF": [min(round(cls.BASE_DEF + e * 0.05 + b, 2), cls.MAX_DEF) for e, b in zip(end, def_bonus)],
+            "GRAVITY": [max(cls.MIN_GRAVITY, min(cls.BASE_GRAVITY + g, cls.MAX_GRAVITY)) for g in gravity_bonus],
+            "ATT_MIN": [round(max(a * (1 - sp), 0), 2) for a, sp in zip(att, spread)],
+            "ATT_MAX": [round(a * (1 + sp), 2) for a, sp in zip(att, spread)],
+        }
+
+    @staticmethod
+    def _gear_arrays(gears) -> list:
+        """_gear_modifiers for every row, as one float64 array per GEAR_STATS entry."""
+        n = len(gears)
+        codes = {stat: code for code, stat in enumerate(GEAR_STATS)}
+        rows = [[] for _ in GEAR_STATS]
+        values = [[] for _ in GEAR_STATS]
+        for row, gear in enumerate(gears):
+            if not gear:
+                continue
+            for item in gear.values():
+                if not item:
+                    continue
+                for stat, value in item.items():
+                    code = codes.get(stat)
+                    if code is not None:
+                        rows[code].append(row)
+                        values[code].append(value)
+        start = np.arange(n)
+        sums = []
+        for code in range(len(GEAR_STATS)):
+            weights = np.asarray(values[code], dtype=np.float64)
+            if code < GEAR_MULTIPLIERS:
+                # bincount adds in input order, so each row sums 1.0, then its items
+                # in gear order, exactly like the per-object loop
+                sums.append(np.bincount(np.concatenate((start, rows[code])).astype(np.intp),
+                                        np.concatenate((np.ones(n), weights / 100)), minlength=n))
+            else:
+                sums.append(np.bincount(np.asarray(rows[code], dtype=np.intp), weights, minlength=n))
+        return sums
+
+    @classmethod
+    def _derived_stats_arrays(cls, columns: dict) -> dict:
+        str_, int_, dex, vit, agi, end = (np.asarray(columns[name], dtype=np.float64)
+                                          for name in ("str", "int", "dex", "vit", "agi", "end"))
+        (spd_mult, jmp_mult, hp_mult, att_spd_mult,
+         def_bonus, mp_bonus, att_bonus, gravity_bonus) = cls._gear_arrays(columns["gear"])
+
+        att = np.minimum(_round2(cls.BASE_ATT + (dex + agi + str_) * 0.05 + att_bonus), cls.MAX_ATT)
+        spread = 0.3 / (1 + 0.05 * dex)
+        return {
+            "SPD": np.minimum(_round2((cls.BASE_SPD + agi * 0.05) * spd_mult), cls.MAX_SPD),
+            "JMP": np.minimum(_round2((cls.BASE_JMP + dex * 0.05) * jmp_mult), cls.MAX_JMP),
+            "ATT": att,
+            "ATT_SPD": np.minimum(_round2((cls.BASE_ATT_SPD + str_ * 0.05) * att_spd_mult), cls.MAX_ATT_SPD),
+            "HP": np.minimum(_round2((cls.BASE_HP + vit * 0.05) * hp_mult), cls.MAX_HP),
+            "MP": np.minimum(_round2(cls.BASE_MP + int_ * 0.05 + mp_bonus), cls.MAX_MP),
+            "DEF": np.minimum(_round2(cls.BASE_DEF + end * 0.05 + def_bonus), cls.MAX_DEF),
+            "GRAVITY": np.maximum(cls.MIN_GRAVITY, np.minimum(cls.BASE_GRAVITY + gravity_bonus, cls.MAX_GRAVITY)),
+            "ATT_MIN": _round2(np.maximum(att * (1 - spread), 0)),
+            "ATT_MAX": _round2(att * (1 + spread)),
+        }
+
+    @classmethod
+    def derived_stats_for(cls, characters) -> dict:
+        """Batch derived stats for a sequence of Character objects."""
+        return cls.calculate_derived_stats_batch({
+            name: [getattr(c, name) for c in characters] for name in cls.DERIVED_STAT_INPUTS
+        })
+
     # -------------------------
     # Convert character to dict for client
     # -------------------------
@@ -160,3 +289,13 @@ class Character(Base):
             }
         }
 
+
+# Invalidate memoized derived stats whenever an input changes or is reloaded
+def _invalidate_derived_stats(target, *args):
+    target._stats_version = getattr(target, "_stats_version", 0) + 1
+
+for _column in Character.DERIVED_STAT_INPUTS:
+    event.listen(getattr(Character, _column), "set", _invalidate_derived_stats)
+event.listen(Character.gear, "modified", _invalidate_derived_stats)
+event.listen(Character, "refresh", _invalidate_derived_stats)
+event.listen(Character, "expire", _invalidate_derived_stats)
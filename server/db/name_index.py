@@ -0,0 +1,150 @@
+# server/db/name_index.py
+import threading
+import time
+from sqlalchemy import select
+from server.config import NAME_RESERVATION_TTL
+from .database import SessionLocal
+from .models import Character
+
+
+class NameIndex:
+    """
+    In-memory set of taken character names (case-normalized), loaded once
+    from the DB and kept current by create/delete, plus short-lived
+    reservations that hold a free name for one user between check and create.
+    Each owner holds at most one reservation, so per-keystroke checks don't hoard names.
+    The unique index on characters.name stays the final authority.
+    Processes sharing the database exchange changes through on_change(op, args)
+    and apply(op, args). Conflicting reservations settle on the earliest.
+    """
+    SWEEP_EVERY = 256  # reservations made between sweeps of expired ones
+
+    def __init__(self, reservation_ttl=NAME_RESERVATION_TTL):
+        self.reservation_ttl = reservation_ttl
+        self.names = set()
+        self.reservations = {}  # normalized name -> (owner, expires_at)
+        self.reserved_by = {}   # owner -> normalized name
+        self.lock = threading.Lock()
+        self.loaded = False
+        self.reserves_since_sweep = 0
+        self.on_change = None
+
+    @staticmethod
+    def normalize(name: str) -> str:
+        return name.casefold()
+
+    def load(self):
+        session = SessionLocal()
+        try:
+            names = session.execute(select(Character.name)).scalars().all()
+        finally:
+            session.close()
+        with self.lock:
+            self.names = {self.normalize(n) for n in names if n}
+            self.loaded = True
+        print(f"[DB] Loaded {len(self.names)} character names")
+
+    def ensure_loaded(self):
+        if not self.loaded:
+            self.load()
+
+    def _reserved_by_other(self, key, owner, now) -> bool:
+        reservation = self.reservations.get(key)
+        if reservation is None:
+            return False
+        holder, expires_at = reservation
+        if expires_at < now:
+            self._drop(key)
+            return False
+        return owner is None or holder != owner
+
+    def is_taken(self, name: str, owner=None) -> bool:
+        """Taken by an existing character, or reserved by someone other than owner."""
+        self.ensure_loaded()
+        key = self.normalize(name)
+        with self.lock:
+            return key in self.names or self._reserved_by_other(key, owner, time.monotonic())
+
+    def reserve(self, name: str, owner) -> bool:
+        """Hold a free name for owner. Re-reserving your own name extends it."""
+        self.ensure_loaded()
+        key = self.normalize(name)
+        now = time.monotonic()
+        expires_at = now + self.reservation_ttl
+        with self.lock:
+            if key in self.names or self._reserved_by_other(key, owner, now):
+                return False
+            self._hold(key, owner, expires_at)
+            self.reserves_since_sweep += 1
+            if self.reserves_since_sweep >= self.SWEEP_EVERY:
+                self._sweep(now)
+        self._share("reserve", key, owner, expires_at)
+        return True
+
+    def release(self, name: str, owner=None):
+        key = self.normalize(name)
+        with self.lock:
+            reservation = self.reservations.get(key)
+            if not reservation or (owner is not None and reservation[0] != owner):
+                return
+            self._drop(key)
+        self._share("release", key, reservation[0])
+
+    def add(self, name: str):
+        key = self.normalize(name)
+        with self.lock:
+            self.names.add(key)
+            self._drop(key)
+        self._share("add", key)
+
+    def discard(self, name: str):
+        key = self.normalize(name)
+        with self.lock:
+            self.names.discard(key)
+        self._share("discard", key)
+
+    def apply(self, op: str, args):
+        """Replay a change another process's index passed to on_change."""
+        self.ensure_loaded()
+        with self.lock:
+            if op == "add":
+                self.names.add(args[0])
+                self._drop(args[0])
+            elif op == "discard":
+                self.names.discard(args[0])
+            elif op == "reserve":
+                key, owner, expires_at = args
+                current = self.reservations.get(key)
+                # Both sides may have granted it: the earliest reservation wins everywhere
+                if current is None or current[0] == owner or (expires_at, owner) < (current[1], current[0]):
+                    self._hold(key, owner, expires_at)
+            elif op == "release":
+                key, owner = args
+                reservation = self.reservations.get(key)
+                if reservation and reservation[0] == owner:
+                    self._drop(key)
+
+    def _share(self, op, *args):
+        if self.on_change is not None:
+            self.on_change(op, args)
+
+    def _hold(self, key, owner, expires_at):
+        previous = self.reserved_by.get(owner)
+        if previous is not None and previous != key:
+            self._drop(previous)
+        self._drop(key)
+        self.reservations[key] = (owner, expires_at)
+        self.reserved_by[owner] = key
+
+    def _drop(self, key):
+        reservation = self.reservations.pop(key, None)
+        if reservation is not None and self.reserved_by.get(reservation[0]) == key:
+            del self.reserved_by[reservation[0]]
+
+    def _sweep(self, now):
+        self.reserves_since_sweep = 0
+        for key in [k for k, (_, expires_at) in self.reservations.items() if expires_at < now]:
+            self._drop(key)
+
+
+name_index = NameIndex()
@@ -0,0 +1,87 @@
+# server/db/passwords.py
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from server.config import AUTH_POOL_WORKERS, AUTH_POOL_MAX_PENDING
+from .database import pwd_context
+
+
+class PasswordPoolBusy(Exception):
+    """Too many password operations already queued; the client should retry."""
+    pass
+
+
+# Run inside the worker processes
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+def _verify(password: str, password_hash: str) -> bool:
+    return pwd_context.verify(password, password_hash)
+
+
+class PasswordPool:
+    """
+    bcrypt hashing/verification on a process pool, so it runs on all cores
+    instead of serializing connection threads on the GIL.
+    At most max_pending operations may be queued or running; further
+    requests raise PasswordPoolBusy immediately instead of waiting.
+    """
+    def __init__(self, workers=AUTH_POOL_WORKERS, max_pending=AUTH_POOL_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.executor = None
+        self.lock = threading.Lock()  # guards executor, pending and rejected
+        self.pending = 0  # operations queued or running
+        self.rejected = 0
+
+    def start(self):
+        """Create the worker processes (otherwise done on first use)."""
+        with self.lock:
+            if self.executor is None:
+                # spawn: forking a process full of connection threads is unsafe
+                self.executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+        return self.executor
+
+    def submit(self, fn, *args):
+        with self.lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise PasswordPoolBusy("Server busy, retry")
+            self.pending += 1
+        try:
+            future = self.start().submit(fn, *args)
+        except Exception:
+            self._finished()
+            raise
+        future.add_done_callback(lambda _: self._finished())
+        return future
+
+    def _finished(self):
+        with self.lock:
+            self.pending -= 1
+
+    def hash(self, password: str) -> str:
+        return self.submit(_hash, password).result()
+
+    def verify(self, password: str, password_hash: str) -> bool:
+        return self.submit(_verify, password, password_hash).result()
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "workers": self.workers,
+                "pending": self.pending,
+                "max_pending": self.max_pending,
+                "rejected": self.rejected,
+            }
+
+    def shutdown(self):
+        with self.lock:
+            if self.executor is not None:
+                self.executor.shutdown(wait=False, cancel_futures=True)
+                self.executor = None
+
+
+password_pool = PasswordPool()
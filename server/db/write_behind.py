@@ -0,0 +1,161 @@
+# server/db/write_behind.py
+import threading
+import time
+from sqlalchemy import update, bindparam
+from server.config import WRITE_BEHIND_INTERVAL, WRITE_BEHIND_MAX_BATCH
+from .database import SessionLocal
+from .models import Character
+from .character_cache import character_cache
+
+# Live-state columns that may be written behind
+PERSISTED_FIELDS = frozenset(("x", "y", "map_id", "hp", "mp", "gold", "exp", "level"))
+
+
+class WriteBehind:
+    """
+    Buffers live character state (position, HP, gold, exp...) in memory and
+    persists it in periodic batches on a background thread.
+    Repeated updates to one character coalesce into a single row update;
+    rows touching the same set of columns go out as one executemany UPDATE.
+    """
+    def __init__(self, interval=WRITE_BEHIND_INTERVAL, max_batch=WRITE_BEHIND_MAX_BATCH):
+        self.interval = interval
+        self.max_batch = max_batch
+        self.dirty = {}  # char_id -> [fields dict, owner user_id, first_dirty_at]
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()  # one flush writes at a time
+        self.stopping = threading.Event()
+        self.thread = None
+        # Metrics
+        self.flushes = 0
+        self.rows_written = 0
+        self.errors = 0
+        self.last_batch_size = 0
+        self.max_batch_size = 0
+        self.last_flush_lag = 0.0  # age of the oldest change in the last flush, seconds
+        self.max_flush_lag = 0.0
+
+    def update(self, char_id: int, owner=None, **fields):
+        """Record new values for a character; persisted on the next flush."""
+        unknown = fields.keys() - PERSISTED_FIELDS
+        if unknown:
+            raise ValueError(f"Not a write-behind field: {', '.join(sorted(unknown))}")
+        with self.lock:
+            entry = self.dirty.get(char_id)
+            if entry is None:
+                self.dirty[char_id] = [dict(fields), owner, time.monotonic()]
+            else:
+                entry[0].update(fields)
+                if owner is not None:
+                    entry[1] = owner
+
+    def pending(self, char_id: int) -> dict:
+        """Unflushed values for a character (overlay these on DB reads)."""
+        with self.lock:
+            entry = self.dirty.get(char_id)
+            return dict(entry[0]) if entry else {}
+
+    def discard(self, char_id: int):
+        """Drop unflushed state, e.g. when the character is deleted."""
+        with self.lock:
+            self.dirty.pop(char_id, None)
+
+    def start(self):
+        if self.thread is None:
+            self.stopping.clear()
+            self.thread = threading.Thread(target=self.run, daemon=True, name="write-behind")
+            self.thread.start()
+
+    def stop(self):
+        """Stop the background worker and flush everything still pending."""
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        self.flush()
+
+    def run(self):
+        while not self.stopping.wait(self.interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[!] Write-behind flush failed: {e}")
+
+    def flush(self, owner=None) -> int:
+        """Write pending rows (only owner's if given). Returns rows written."""
+        with self.flush_lock:
+            with self.lock:
+                if owner is None:
+                    taken, self.dirty = self.dirty, {}
+                else:
+                    taken = {cid: e for cid, e in self.dirty.items() if e[1] == owner}
+                    for cid in taken:
+                        del self.dirty[cid]
+            if not taken:
+                return 0
+
+            # Group rows by the columns they change so each group is one executemany
+            groups = {}
+            for char_id, (fields, _, _) in taken.items():
+                groups.setdefault(frozenset(fields), []).append({"_id": char_id, **fields})
+
+            table = Character.__table__
+            session = SessionLocal()
+            try:
+                for columns, rows in groups.items():
+                    stmt = (
+                        update(table)
+                        .where(table.c.id == bindparam("_id"))
+                        .values({c: bindparam(c) for c in columns})
+                    )
+                    for start in range(0, len(rows), self.max_batch):
+                        session.connection().execute(stmt, rows[start:start + self.max_batch])
+                session.commit()
+            except Exception:
+                session.rollback()
+                self.errors += 1
+                self._requeue(taken)
+                raise
+            finally:
+                session.close()
+
+            now = time.monotonic()
+            lag = now - min(entry[2] for entry in taken.values())
+            self.flushes += 1
+            self.rows_written += len(taken)
+            self.last_batch_size = len(taken)
+            self.max_batch_size = max(self.max_batch_size, len(taken))
+            self.last_flush_lag = lag
+            self.max_flush_lag = max(self.max_flush_lag, lag)
+
+            for user_id in {entry[1] for entry in taken.values() if entry[1] is not None}:
+                character_cache.invalidate(user_id)
+            return len(taken)
+
+    def _requeue(self, taken):
+        """Put failed rows back without overwriting newer updates."""
+        with self.lock:
+            for char_id, (fields, owner, since) in taken.items():
+                entry = self.dirty.get(char_id)
+                if entry is None:
+                    self.dirty[char_id] = [fields, owner, since]
+                else:
+                    entry[0] = {**fields, **entry[0]}
+                    entry[2] = min(entry[2], since)
+
+    def stats(self) -> dict:
+        with self.lock:
+            pending = len(self.dirty)
+        return {
+            "pending": pending,
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "errors": self.errors,
+            "last_batch_size": self.last_batch_size,
+            "max_batch_size": self.max_batch_size,
+            "last_flush_lag": self.last_flush_lag,
+            "max_flush_lag": self.max_flush_lag,
+        }
+
+
+write_behind = WriteBehind()
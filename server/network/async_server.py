@@ -0,0 +1,232 @@
+# server/network/async_server.py
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from server.network.client_handler import ClientSession
+from server.network.protocol import ProtocolError
+from server.network.outbound import WaterMarks, ADMIT, DISCONNECT
+from server.network.broadcast import broadcast
+from server.channels.bus import LocalBus, deliver
+from server.config import ASYNC_HANDLER_WORKERS, ZONE_WORKERS
+from server.core.game_state import GameState
+from server.core.game_engine import GameEngine
+
+
+def is_hello(message) -> bool:
+    return isinstance(message, dict) and message.get("action") == "hello"
+
+
+class AsyncClientConnection(ClientSession, asyncio.Protocol):
+    """
+    One asyncio protocol instance per connected socket.
+    Frames are split and decoded on the event loop; action handlers (which block on
+    DB and bcrypt) run one at a time per connection on the server's executor.
+    hello always runs on the loop: if it has to wait its turn, decoding pauses
+    until it is applied, since the frames after it may be in the new codec.
+    """
+    # Actions that never block; handled directly on the event loop
+    INLINE_ACTIONS = {"ping", "hello", "move", "ack", "whisper", "party_join", "party_leave", "party_chat"}  # cheap: answered or queued to the engine without blocking
+
+    def __init__(self, server):
+        ClientSession.__init__(self, server=server)
+        self.loop = server.loop
+        self.transport = None
+        self.inbox = asyncio.Queue()
+        self.worker = None
+        self.busy = False
+        self.switching = False  # a queued hello holds back decoding
+        self.closed = False
+        self.watermarks = WaterMarks()
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.address = transport.get_extra_info("peername")
+        self.server.add_client(self)
+        self.worker = self.loop.create_task(self.process_messages())
+        print(f"[+] Client connected: {self.address}")
+
+    def data_received(self, data: bytes):
+        self.reader.feed(data)
+        self.process_frames()
+
+    def process_frames(self):
+        try:
+            while not self.switching and (frame := self.reader.next_frame()) is not None:
+                if not frame or frame.isspace():
+                    continue
+                try:
+                    message = self.codec.decode(frame)
+                except ProtocolError:
+                    self.send_error("Invalid message format")
+                    continue
+                if self.is_inline(message):
+                    self.handle_message(message)
+                elif is_hello(message):
+                    self.inbox.put_nowait(message)
+                    self.switching = True
+                    self.transport.pause_reading()
+                else:
+                    self.inbox.put_nowait(message)
+        except ProtocolError as e:
+            self.send_error(str(e))
+            self.disconnect()
+
+    def is_inline(self, message) -> bool:
+        """True if the message can run on the loop without reordering replies."""
+        if self.busy or not self.inbox.empty() or not isinstance(message, dict):
+            return False
+        return message.get("action") in self.INLINE_ACTIONS
+
+    def connection_lost(self, exc):
+        if exc is not None:
+            print(f"[-] Connection reset by {self.address}")
+        self.disconnect()
+
+    async def process_messages(self):
+        while True:
+            message = await self.inbox.get()
+            if is_hello(message):
+                # Switch codecs here, on the loop, then decode what is buffered with it
+                self.handle_message(message)
+                self.switching = False
+                if not self.closed:
+                    self.transport.resume_reading()
+                    self.process_frames()
+                continue
+            self.busy = True
+            try:
+                await self.loop.run_in_executor(self.server.executor, self.handle_message, message)
+            except Exception as e:
+                print(f"[!] Handler error for {self.address}: {e}")
+            finally:
+                self.busy = False
+
+    def send_bytes(self, data: bytes):
+        if self.server.on_loop_thread():
+            self._write(data)
+        else:
+            self.loop.call_soon_threadsafe(self._write, data)
+
+    def _write(self, data: bytes):
+        # The transport buffers and coalesces writes; we only enforce the water marks
+        if self.closed:
+            return
+        verdict = self.watermarks.admit(self.transport.get_write_buffer_size(), len(data))
+        if verdict == ADMIT:
+            self.transport.write(data)
+        elif verdict == DISCONNECT:
+            self.transport.abort()
+
+    def queue_stats(self) -> dict:
+        return {
+            "messages": None,  # the transport only tracks bytes
+            "bytes": self.transport.get_write_buffer_size() if self.transport else 0,
+            "dropped": self.watermarks.dropped,
+            "lagging": self.watermarks.lagging,
+        }
+
+    def disconnect(self):
+        if not self.server.on_loop_thread():
+            self.loop.call_soon_threadsafe(self.disconnect)
+            return
+        if self.closed:
+            return
+        self.closed = True
+        self.leave_game()
+        self.loop.run_in_executor(self.server.executor, self.flush_state)
+        if self.username:
+            print(f"[-] {self.username} disconnected")
+        else:
+            print(f"[-] Client {self.address} disconnected")
+        if self.worker:
+            self.worker.cancel()
+        self.transport.close()
+        self.server.remove_client(self)
+
+
+class AsyncGameServer:
+    """
+    Single event loop serving every connection.
+    Same newline-JSON wire format and action handlers as GameServer.
+    """
+    def __init__(self, host="0.0.0.0", port=5000, max_clients=50, handler_workers=ASYNC_HANDLER_WORKERS):
+        self.host = host
+        self.port = port
+        self.max_clients = max_clients
+        self.clients = []
+        self.running = False
+        self.lock = threading.Lock()  # Protect self.clients (handlers run on executor threads)
+        self.executor = ThreadPoolExecutor(max_workers=handler_workers, thread_name_prefix="handler")
+        self.game_state = GameState()
+        self.engine = GameEngine(self.game_state, zone_workers=ZONE_WORKERS)
+        self.bus = LocalBus(self.deliver)
+        self.bus.subscribe("global")
+        self.loop = None
+        self.loop_thread_id = None
+        self.stopped = None
+
+    def start(self):
+        self.engine.start()
+        try:
+            asyncio.run(self.serve())
+        except KeyboardInterrupt:
+            print("\n[!] Server shutting down")
+        finally:
+            self.engine.stop()
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            print("[+] Server stopped")
+
+    async def serve(self):
+        self.loop = asyncio.get_running_loop()
+        self.loop_thread_id = threading.get_ident()
+        self.stopped = asyncio.Event()
+        self.running = True
+        server = await self.loop.create_server(
+            lambda: AsyncClientConnection(self), self.host, self.port, backlog=self.max_clients
+        )
+        print(f"[+] Server listening on {self.host}:{self.port} (asyncio)")
+        async with server:
+            await self.stopped.wait()
+            with self.lock:
+                clients = list(self.clients)
+            for client in clients:
+                client.disconnect()
+
+    def on_loop_thread(self):
+        return threading.get_ident() == self.loop_thread_id
+
+    def add_client(self, client: AsyncClientConnection):
+        with self.lock:
+            self.clients.append(client)
+
+    def remove_client(self, client: AsyncClientConnection):
+        with self.lock:
+            if client in self.clients:
+                self.clients.remove(client)
+
+    def broadcast(self, message: dict, exclude=None, where=None):
+        """Send a message to all connected clients, encoding it once."""
+        with self.lock:
+            clients = list(self.clients)
+        return broadcast(clients, message, exclude, where)
+
+    def announce(self, message: dict):
+        """Send a message to every player, on every channel."""
+        self.bus.publish("global", message)
+
+    def deliver(self, topic: str, message: dict):
+        """Bus messages for this server: to the clients the topic addresses."""
+        with self.lock:
+            clients = list(self.clients)
+        return deliver(clients, topic, message)
+
+    def queue_depths(self) -> dict:
+        """Outbound backlog per client, keyed by username (or address before login)."""
+        with self.lock:
+            clients = list(self.clients)
+        return {client.username or str(client.address): client.queue_stats() for client in clients}
+
+    def stop(self):
+        self.running = False
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.stopped.set)
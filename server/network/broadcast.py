@@ -0,0 +1,31 @@
+# server/network/broadcast.py
+
+
+def broadcast(clients, message: dict, exclude=None, where=None) -> int:
+    """
+    Send one message to many clients, serializing it once per wire codec.
+    The encoded bytes are immutable and shared by every recipient's send path.
+
+    exclude: a client or an iterable of clients to skip.
+    where: optional predicate; only clients for which it returns True receive.
+    Returns the number of recipients.
+    """
+    if exclude is None:
+        excluded = ()
+    elif isinstance(exclude, (list, tuple, set, frozenset)):
+        excluded = set(exclude)
+    else:
+        excluded = {exclude}
+
+    encoded = {}  # codec -> bytes
+    sent = 0
+    for client in clients:
+        if client in excluded or (where is not None and not where(client)):
+            continue
+        codec = client.codec
+        data = encoded.get(codec)
+        if data is None:
+            data = encoded[codec] = codec.encode(message)
+        client.send_bytes(data)
+        sent += 1
+    return sent
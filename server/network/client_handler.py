@@ -1,53 +1,70 @@
 # server/network/client_handler.py
+import abc
+import base64
 import threading
 import socket
 from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import selectinload
-from server.network.protocol import Protocol, ProtocolError
-from server.db.database import SessionLocal, pwd_context
+from server.network.protocol import ProtocolError, JSON_CODEC, CODECS, ACTION_CODES
+from server.network.outbound import OutboundQueue
+from server.db.database import SessionLocal
+from server.db.passwords import password_pool, PasswordPoolBusy
+from server.network.session_tokens import session_tokens, SessionTokenError
 from server.db.models import User
 from server.db.characters import create_character, delete_character, check_name
+from server.db.character_cache import character_cache
+from server.db.write_behind import write_behind
+from server.config import CHAT_MAX_LENGTH, PARTY_NAME_MAX_LENGTH
+import math
 import re
-import json
 
-class ClientHandler(threading.Thread):
-    def __init__(self, client_socket: socket.socket, address, server):
-        super().__init__(daemon=True)
-        self.client_socket = client_socket
+
+def finite_number(value) -> bool:
+    """An int or float (not a bool) that is a finite float: no NaN, infinity or huge int."""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return False
+    try:
+        return math.isfinite(value)
+    except OverflowError:
+        return False
+
+
+class ClientSession(abc.ABC):
+    """
+    Action handling shared by every connection type.
+    Subclasses provide the transport: send_bytes(), queue_stats() and disconnect().
+    """
+    def __init__(self, address=None, server=None):
         self.address = address
         self.server = server
-        self.running = True
         self.username = None
         self.user_id = None
-        self.recv_buffer = ""
+        self.session_token = None
+        self.party = None
+        self.channel = None  # ChannelServer, when the server runs channels
+        self.in_game = False
+        self.topics = set()  # bus topics this session holds a subscription on
+        self.codec = JSON_CODEC
+        self.reader = self.codec.new_reader()
 
-    def run(self):
-        print(f"[+] Client connected: {self.address}")
-        try:
-            while self.running:
-                data = self.client_socket.recv(4096)
-                if not data:
-                    break
-                self.recv_buffer += data.decode("utf-8")
-                while "\n" in self.recv_buffer:
-                    line, self.recv_buffer = self.recv_buffer.split("\n", 1)
-                    if line.strip():
-                        self.handle_message(line.strip())
-        except ConnectionResetError:
-            print(f"[-] Connection reset by {self.address}")
-        finally:
-            self.disconnect()
+    @property
+    def engine(self):
+        """The GameEngine this session's player lives in: its channel's, else the server's."""
+        channel = self.channel
+        if channel is not None and channel.engine is not None:
+            return channel.engine
+        return getattr(self.server, "engine", None)
 
-    def handle_message(self, message_str: str):
+    def handle_frame(self, frame: bytes):
         try:
-            message = Protocol.decode(message_str.encode("utf-8"))
+            message = self.codec.decode(frame)
         except ProtocolError:
-            try:
-                message = json.loads(message_str)
-            except json.JSONDecodeError:
-                self.send_error("Invalid message format")
-                return
+            self.send_error("Invalid message format")
+            return
+        self.handle_message(message)
 
+    def handle_message(self, message: dict):
         if not isinstance(message, dict):
             self.send_error("Invalid message type")
             return
@@ -55,19 +72,62 @@ class ClientHandler(threading.Thread):
         action = message.get("action")
         data = message.get("data", {})
 
-        if action == "signup":
+        if action == "hello":
+            self.handle_hello(data)
+        elif action == "signup":
             self.handle_signup(data)
         elif action == "login":
             self.handle_login(data)
+        elif action == "resume":
+            self.handle_resume(data)
+        elif action == "logout":
+            self.handle_logout(data)
         elif action == "create_character":
             self.handle_create_character(data)
         elif action == "delete_character":
             self.handle_delete_character(data)
         elif action == "check_name":
             self.handle_check_name(data)
+        elif action == "enter_world":
+            self.handle_enter_world(data)
+        elif action == "move":
+            self.handle_move(data)
+        elif action == "ack":
+            self.handle_ack(data)
+        elif action == "whisper":
+            self.handle_whisper(data)
+        elif action == "party_join":
+            self.handle_party_join(data)
+        elif action == "party_leave":
+            self.handle_party_leave(data)
+        elif action == "party_chat":
+            self.handle_party_chat(data)
+        elif action == "ping":
+            self.send_json({"action": "pong", "data": data})
         else:
             self.send_error(f"Unknown action: {action}")
     
+    def handle_hello(self, data):
+        """Negotiate the wire protocol; the reply is sent before switching."""
+        offered = data.get("protocols", [data.get("protocol", self.codec.version)])
+        if not isinstance(offered, list):
+            offered = []
+        supported = [v for v in offered if isinstance(v, int) and not isinstance(v, bool) and v in CODECS]
+        if not supported:
+            self.send_error("No supported protocol version")
+            return
+        codec = CODECS[max(supported)]
+        self.send_json({"action": "hello_ok", "protocol": codec.version, "actions": ACTION_CODES})
+        self.switch_codec(codec)
+
+    def switch_codec(self, codec):
+        if codec is self.codec:
+            return
+        reader = codec.new_reader()
+        reader.feed(self.reader.drain())
+        self.codec = codec
+        self.reader = reader
+
     def handle_signup(self, data):
         """Handle new user registration."""
         first_name = data.get("first_name", "").strip()
@@ -94,16 +154,26 @@ class ClientHandler(threading.Thread):
             self.send_json({"action": "signup_failed", "reason": "Invalid email"})
             return
 
+        # Check for existing username or email before paying for a hash
         session = SessionLocal()
         try:
-            # Check for existing username or email
-            existing = session.query(User).filter((User.username == username) | (User.email == email)).first()
-            if existing:
-                self.send_json({"action": "signup_failed", "reason": "Username or email already exists"})
-                return
+            existing = session.query(User.id).filter((User.username == username) | (User.email == email)).first()
+        finally:
+            session.close()
+        if existing:
+            self.send_json({"action": "signup_failed", "reason": "Username or email already exists"})
+            return
+
+        # Hash with no session open so no pooled connection waits on bcrypt
+        try:
+            hashed_pw = password_pool.hash(password)
+        except PasswordPoolBusy as e:
+            self.send_json({"action": "signup_failed", "reason": str(e), "retry": True})
+            return
 
+        session = SessionLocal()
+        try:
             # Create user
-            hashed_pw = pwd_context.hash(password)
             user = User(
                 first_name=first_name,
                 last_name=last_name,
@@ -116,6 +186,10 @@ class ClientHandler(threading.Thread):
 
             self.send_json({"action": "signup_ok", "user_id": user.id, "username": user.username})
             print(f"[+] New user registered: {username}")
+        except IntegrityError:
+            # Registered by someone else while we were hashing (unique constraints)
+            session.rollback()
+            self.send_json({"action": "signup_failed", "reason": "Username or email already exists"})
         except Exception as e:
             session.rollback()
             self.send_json({"action": "signup_failed", "reason": str(e)})
@@ -130,20 +204,72 @@ class ClientHandler(threading.Thread):
         try:
             stmt = select(User).options(selectinload(User.characters)).where(User.username == username)
             user = session.execute(stmt).scalar_one_or_none()
+        finally:
+            session.close()  # don't hold a pooled connection while bcrypt runs
 
-            if not user:
-                self.send_json({"action": "login_failed", "reason": "User not found"})
-                return
+        if not user:
+            self.send_json({"action": "login_failed", "reason": "User not found"})
+            return
 
-            if not pwd_context.verify(password, user.password_hash):
-                self.send_json({"action": "login_failed", "reason": "Invalid password"})
-                return
+        try:
+            valid = password_pool.verify(password, user.password_hash)
+        except PasswordPoolBusy as e:
+            self.send_json({"action": "login_failed", "reason": str(e), "retry": True})
+            return
+        if not valid:
+            self.send_json({"action": "login_failed", "reason": "Invalid password"})
+            return
 
-            self.username = user.username
-            self.user_id = user.id
-            self.send_character_list()
-        finally:
-            session.close()
+        if self.user_id:
+            self.end_login()  # logging in again replaces the previous login
+        self.username = user.username
+        self.user_id = user.id
+        character_cache.put(user.id, user.characters)  # already loaded above
+        self.enter_game()
+        self.session_token = session_tokens.issue(user.id, user.username)
+        self.send_json({
+            "action": "login_ok",
+            "user_id": user.id,
+            "username": user.username,
+            "session_token": self.session_token,
+            "expires_in": session_tokens.ttl,
+        })
+        self.send_character_list()
+
+    def handle_resume(self, data):
+        """Re-authenticate a reconnecting client from its session token (no bcrypt; cached characters)."""
+        token = data.get("token")
+        try:
+            claims = session_tokens.validate(token)
+        except SessionTokenError as e:
+            self.send_json({"action": "resume_failed", "reason": str(e)})
+            return
+
+        if self.load_characters(claims["uid"]) is None:
+            self.send_json({"action": "resume_failed", "reason": "User not found"})
+            return
+
+        if self.user_id:
+            self.end_login(revoke=self.session_token != token)
+        self.username = claims["usr"]
+        self.user_id = claims["uid"]
+        self.session_token = token
+        self.enter_game()
+        self.send_json({"action": "resume_ok", "user_id": self.user_id, "username": self.username})
+        self.send_character_list()
+
+    def handle_logout(self, data):
+        self.end_login()
+        self.send_json({"action": "logout_ok"})
+
+    def end_login(self, revoke=True):
+        """Take the player out of the game and forget the login, revoking its session token."""
+        if revoke and self.session_token:
+            session_tokens.revoke(self.session_token)
+        self.leave_game()
+        self.username = None
+        self.user_id = None
+        self.session_token = None
 
     def handle_create_character(self, data):
         if not self.user_id:
@@ -197,41 +323,270 @@ class ClientHandler(threading.Thread):
             self.send_json({"action": "name_valid", "ok": False, "reason": "No name provided"})
             return
 
-        ok, reason = check_name(name)
+        ok, reason = check_name(name, reserve_for=self.user_id)
         self.send_json({"action": "name_valid", "ok": ok, "reason": reason})
 
+    def handle_enter_world(self, data):
+        """Spawn one of the user's characters; its surroundings arrive as aoi_update."""
+        engine = self.engine
+        if not self.user_id:
+            self.send_error("Not logged in")
+            return
+        if engine is None:
+            self.send_error("No game world on this server")
+            return
+
+        char_id = data.get("char_id")
+        characters = self.load_characters() or ()
+        character = next((c for c in characters if c["id"] == char_id), None)
+        if character is None:
+            self.send_error("Character not found or not owned by user")
+            return
+
+        engine.submit("spawn_player", self.user_id, character)
+        self.send_json({"action": "enter_world_ok", "char_id": char_id})
+
+    def handle_move(self, data):
+        engine = self.engine
+        if not self.user_id or engine is None:
+            return
+        dx = data.get("dx", 0)
+        dy = data.get("dy", 0)
+        if not (finite_number(dx) and finite_number(dy)):
+            self.send_error("Invalid move")
+            return
+        engine.submit("move_player", self.user_id, dx, dy)
+
+    def handle_ack(self, data):
+        """The client applied an aoi_update; its tick becomes the delta baseline."""
+        engine = self.engine
+        tick = data.get("tick")
+        if self.user_id and engine is not None and isinstance(tick, int):
+            engine.submit("ack", self.user_id, tick)
+
+    def handle_whisper(self, data):
+        """Message another user wherever they are connected (fire-and-forget)."""
+        if not self.user_id:
+            self.send_error("Not logged in")
+            return
+        to = data.get("to")
+        text = self.chat_text(data)
+        if not isinstance(to, str) or not to or text is None:
+            self.send_error("Invalid whisper")
+            return
+        self.publish(f"user:{to}", {"action": "whisper", "from": self.username, "text": text})
+
+    def handle_party_join(self, data):
+        """
+        Parties are open channels: anyone logged in who knows the name can join
+        and read its chat, so party names act as shared secrets. Invite-only
+        parties would need membership shared between channel processes.
+        """
+        party = data.get("party")
+        if not self.user_id:
+            self.send_error("Not logged in")
+            return
+        if not isinstance(party, str) or not 0 < len(party) <= PARTY_NAME_MAX_LENGTH:
+            self.send_error("Invalid party name")
+            return
+        self.leave_party()
+        self.party = party
+        self.subscribe(f"party:{party}")
+        self.send_json({"action": "party_join_ok", "party": party})
+
+    def handle_party_leave(self, data):
+        self.leave_party()
+        self.send_json({"action": "party_leave_ok"})
+
+    def handle_party_chat(self, data):
+        text = self.chat_text(data)
+        if not self.party:
+            self.send_error("Not in a party")
+            return
+        if text is None:
+            self.send_error("Invalid message")
+            return
+        self.publish(f"party:{self.party}", {"action": "party_chat", "party": self.party, "from": self.username, "text": text})
+
+    @staticmethod
+    def chat_text(data):
+        text = data.get("text")
+        if not isinstance(text, str) or not text or len(text) > CHAT_MAX_LENGTH:
+            return None
+        return text
+
+    def leave_party(self):
+        if self.party:
+            self.unsubscribe(f"party:{self.party}")
+            self.party = None
+
+    def publish(self, topic: str, message: dict):
+        bus = getattr(self.server, "bus", None)
+        if bus is not None:
+            bus.publish(topic, message)
+
+    def subscribe(self, topic: str):
+        bus = getattr(self.server, "bus", None)
+        if bus is not None and topic not in self.topics:
+            self.topics.add(topic)
+            bus.subscribe(topic)
+
+    def unsubscribe(self, topic: str):
+        bus = getattr(self.server, "bus", None)
+        if bus is not None and topic in self.topics:
+            self.topics.discard(topic)
+            bus.unsubscribe(topic)
+
+    def load_characters(self, user_id=None):
+        """A user's (by default this one's) character dicts, from the cache or the database; None if the user is gone."""
+        if user_id is None:
+            user_id = self.user_id
+        characters = character_cache.get(user_id)
+        if characters is None:
+            session = SessionLocal()
+            try:
+                stmt = select(User).options(selectinload(User.characters)).where(User.id == user_id)
+                user = session.execute(stmt).scalar_one_or_none()
+                if not user:
+                    return None
+                characters = character_cache.put(user.id, user.characters)
+            finally:
+                session.close()
+        return characters
+
     def send_character_list(self):
         if not self.user_id:
             self.send_error("Not logged in")
             return
 
-        session = SessionLocal()
-        try:
-            stmt = select(User).options(selectinload(User.characters)).where(User.id == self.user_id)
-            user = session.execute(stmt).scalar_one_or_none()
-            if not user:
-                self.send_error("User not found")
-                return
+        characters = self.load_characters()
+        if characters is None:
+            self.send_error("User not found")
+            return
 
-            self.send_json({
-                "action": "character_list",
-                "user": {"id": user.id, "username": user.username},
-                "characters": [char.as_dict() for char in user.characters]
-            })
-        finally:
-            session.close()
+        self.send_json({
+            "action": "character_list",
+            "user": {"id": self.user_id, "username": self.username},
+            "characters": characters
+        })
 
     def send_json(self, message: dict):
         try:
-            self.client_socket.sendall((json.dumps(message) + "\n").encode("utf-8"))
+            data = self.codec.encode(message)
         except Exception as e:
             print(f"[!] Failed to send to {self.address}: {e}")
+            return
+        self.send_bytes(data)
+
+    @abc.abstractmethod
+    def send_bytes(self, data: bytes):
+        """Queue already-encoded bytes (in this connection's codec) for sending."""
 
     def send_error(self, error_msg: str):
         self.send_json({"status": "error", "message": error_msg})
 
+    @abc.abstractmethod
+    def queue_stats(self) -> dict:
+        """Outbound backlog: messages, bytes, dropped, lagging."""
+
+    @abc.abstractmethod
     def disconnect(self):
-        self.running = False
+        """Close the connection and take the player out of the game."""
+
+    def enter_game(self):
+        """Register the logged-in user with the game engine (applied next tick)."""
+        engine = self.engine
+        if engine is not None:
+            engine.submit("add_player", self.user_id, {"username": self.username, "client": self})
+        self.in_game = True
+        self.subscribe(f"user:{self.username}")  # whispers
+
+    def leave_game(self):
+        engine = self.engine
+        if engine is not None and self.user_id:
+            engine.submit("remove_player", self.user_id, self)
+        self.in_game = False
+        self.leave_party()
+        for topic in list(self.topics):
+            self.unsubscribe(topic)
+
+    def session_state(self) -> dict:
+        """What another process needs to take this session over (consumes unread input)."""
+        return {
+            "user_id": self.user_id,
+            "username": self.username,
+            "session_token": self.session_token,
+            "protocol": self.codec.version,
+            "buffered": base64.b64encode(self.reader.drain()).decode("ascii"),
+        }
+
+    def restore_session(self, state: dict):
+        self.user_id = state["user_id"]
+        self.username = state["username"]
+        self.session_token = state["session_token"]
+        self.codec = CODECS[state["protocol"]]
+        self.reader = self.codec.new_reader()
+        self.reader.feed(base64.b64decode(state["buffered"]))
+
+    def flush_state(self):
+        """Persist this user's buffered character state (called on disconnect)."""
+        if self.user_id:
+            try:
+                write_behind.flush(owner=self.user_id)
+            except Exception as e:
+                print(f"[!] Failed to persist state for {self.username}: {e}")
+
+
+class ClientHandler(ClientSession, threading.Thread):
+    """One thread per connected socket."""
+    def __init__(self, client_socket: socket.socket, address, server):
+        ClientSession.__init__(self, address, server)
+        threading.Thread.__init__(self, daemon=True)
+        self.client_socket = client_socket
+        self.running = True  # reading; may stop before the connection is closed
+        self.closed = False
+        self.outbound = OutboundQueue(client_socket, on_error=lambda: self.disconnect(flush=False))
+        self.disconnect_lock = threading.Lock()
+
+    def run(self):
+        print(f"[+] Client connected: {self.address}")
+        self.outbound.start()
+        try:
+            while self.running:
+                # Frames already buffered first (input carried over from a handoff)
+                while self.running and (frame := self.reader.next_frame()) is not None:
+                    if frame and not frame.isspace():
+                        self.handle_frame(frame)
+                if not self.running or not self.reader.recv_into(self.client_socket):
+                    break
+        except (ConnectionResetError, ConnectionAbortedError):
+            print(f"[-] Connection reset by {self.address}")
+        except OSError:
+            pass  # socket shut down by disconnect() from another thread
+        except ProtocolError as e:
+            self.send_error(str(e))
+        finally:
+            self.disconnect()
+
+    def send_bytes(self, data: bytes):
+        self.outbound.put(data)
+
+    def queue_stats(self) -> dict:
+        return self.outbound.stats()
+
+    def disconnect(self, flush=True):
+        with self.disconnect_lock:
+            if self.closed:
+                return
+            self.closed = True
+            self.running = False
+        self.outbound.close(timeout=1.0 if flush else 0)
+        try:
+            self.client_socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.leave_game()
+        self.flush_state()
         if self.username:
             print(f"[-] {self.username} disconnected")
         else:
@@ -0,0 +1,116 @@
+# server/network/outbound.py
+import threading
+from collections import deque
+from server.config import SEND_QUEUE_HIGH_WATER, SEND_QUEUE_LOW_WATER, SEND_QUEUE_POLICY, SEND_BATCH_BYTES
+
+ADMIT = "admit"
+DROP = "drop"
+DISCONNECT = "disconnect"
+
+
+class WaterMarks:
+    """
+    Backpressure policy for one connection's unsent bytes.
+    Once queued bytes would pass the high-water mark the client is lagging:
+    new messages are dropped (or the client disconnected) until the
+    backlog drains below the low-water mark.
+    """
+    def __init__(self, high=SEND_QUEUE_HIGH_WATER, low=SEND_QUEUE_LOW_WATER, policy=SEND_QUEUE_POLICY):
+        if policy not in (DROP, DISCONNECT):
+            raise ValueError(f"Unknown send queue policy: {policy}")
+        self.high = high
+        self.low = min(low, high)
+        self.policy = policy
+        self.lagging = False
+        self.dropped = 0
+
+    def admit(self, queued_bytes: int, size: int) -> str:
+        if self.lagging and queued_bytes <= self.low:
+            self.lagging = False
+        if not self.lagging and queued_bytes + size > self.high and queued_bytes > 0:
+            self.lagging = True
+        if not self.lagging:
+            return ADMIT
+        if self.policy == DISCONNECT:
+            return DISCONNECT
+        self.dropped += 1
+        return DROP
+
+
+class OutboundQueue:
+    """
+    Bounded send queue for a blocking socket, drained by its own writer thread.
+    Everything pending when the writer wakes (up to batch_bytes) is joined
+    into a single sendall, so bursts of small messages cost one syscall.
+    """
+    def __init__(self, sock, on_error=None, watermarks=None, batch_bytes=SEND_BATCH_BYTES):
+        self.sock = sock
+        self.on_error = on_error  # called (from any thread) when the client must be dropped
+        self.watermarks = watermarks or WaterMarks()
+        self.batch_bytes = batch_bytes
+        self.pending = deque()
+        self.pending_bytes = 0  # queued + currently being sent
+        self.cond = threading.Condition()
+        self.closed = False
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def put(self, data: bytes) -> bool:
+        """Queue data for sending. Returns False if it was dropped."""
+        with self.cond:
+            if self.closed:
+                return False
+            verdict = self.watermarks.admit(self.pending_bytes, len(data))
+            if verdict == ADMIT:
+                self.pending.append(data)
+                self.pending_bytes += len(data)
+                self.cond.notify()
+                return True
+        if verdict == DISCONNECT and self.on_error:
+            self.on_error()
+        return False
+
+    def run(self):
+        while True:
+            with self.cond:
+                while not self.pending and not self.closed:
+                    self.cond.wait()
+                if not self.pending:
+                    return
+                batch = []
+                size = 0
+                while self.pending and size < self.batch_bytes:
+                    data = self.pending.popleft()
+                    batch.append(data)
+                    size += len(data)
+            try:
+                self.sock.sendall(batch[0] if len(batch) == 1 else b"".join(batch))
+            except OSError:
+                with self.cond:
+                    self.closed = True
+                    self.pending.clear()
+                    self.pending_bytes = 0
+                if self.on_error:
+                    self.on_error()
+                return
+            with self.cond:
+                self.pending_bytes -= size
+
+    def close(self, timeout=1.0):
+        """Stop accepting data and give the writer up to timeout seconds to flush."""
+        with self.cond:
+            self.closed = True
+            self.cond.notify()
+        if self.thread.is_alive() and self.thread is not threading.current_thread():
+            self.thread.join(timeout)
+
+    def stats(self) -> dict:
+        with self.cond:
+            return {
+                "messages": len(self.pending),
+                "bytes": self.pending_bytes,
+                "dropped": self.watermarks.dropped,
+                "lagging": self.watermarks.lagging,
+            }
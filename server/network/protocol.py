@@ -1,5 +1,36 @@
 import json
 
+try:
+    import msgpack
+except ImportError:  # binary protocol v2 is disabled without it
+    msgpack = None
+
+# Largest single message we accept; a client exceeding it is disconnected
+MAX_FRAME_SIZE = 64 * 1024
+
+# Wire protocol versions: 1 = newline-delimited JSON, 2 = length-prefixed msgpack
+PROTOCOL_JSON = 1
+PROTOCOL_BINARY = 2
+
+# Action names carried as small integers in protocol v2 (code = index + 1, 0 = no action).
+# Append only: reordering breaks deployed clients.
+ACTIONS = (
+    "hello", "hello_ok",
+    "ping", "pong",
+    "signup", "signup_ok", "signup_failed",
+    "login", "login_failed",
+    "create_character", "character_created",
+    "delete_character", "delete_character_ok",
+    "check_name", "name_valid",
+    "character_list",
+    "login_ok", "resume", "resume_ok", "resume_failed", "logout", "logout_ok",
+    "enter_world", "enter_world_ok", "move", "aoi_update",
+    "ack",
+    "whisper", "party_join", "party_join_ok", "party_leave", "party_leave_ok", "party_chat",
+    "channel_changed", "change_channel",
+)
+ACTION_CODES = {action: code for code, action in enumerate(ACTIONS, start=1)}
+
 class ProtocolError(Exception):
     pass
 
@@ -19,6 +50,162 @@ class Protocol:
         Decode JSON bytes back into a dictionary.
         """
         try:
-            return json.loads(data.decode("utf-8"))
+            return json.loads(data)
         except Exception as e:
             raise ProtocolError(f"Failed to decode message: {e}")
+
+
+class FrameReader:
+    """
+    Splits a byte stream into newline-delimited frames.
+
+    Data is received straight into one reusable bytearray (recv_into) and
+    only bytes that arrived since the last call are scanned for the
+    delimiter, so a fragmented burst costs linear time. Consumed space is
+    reclaimed by compacting the unread tail to the front when needed.
+    """
+    DELIMITER = b"\n"
+
+    def __init__(self, max_frame_size=MAX_FRAME_SIZE, chunk_size=4096):
+        self.max_frame_size = max_frame_size
+        self.chunk_size = chunk_size
+        self.buffer = bytearray(chunk_size)
+        self.start = 0  # first unconsumed byte
+        self.end = 0    # end of received data
+        self.scan = 0   # no delimiter in buffer[start:scan]
+
+    def recv_into(self, sock) -> int:
+        """Receive up to chunk_size bytes from sock. Returns 0 on EOF."""
+        self._reserve(self.chunk_size)
+        with memoryview(self.buffer) as view, view[self.end:] as free:
+            nbytes = sock.recv_into(free)
+        self.end += nbytes
+        return nbytes
+
+    def feed(self, data: bytes):
+        """Append bytes received by other means (e.g. asyncio data_received)."""
+        self._reserve(len(data))
+        self.buffer[self.end:self.end + len(data)] = data
+        self.end += len(data)
+
+    def next_frame(self) -> bytes | None:
+        """Return the next complete frame without its delimiter, or None."""
+        index = self.buffer.find(self.DELIMITER, self.scan, self.end)
+        if index < 0:
+            self.scan = self.end
+            if self.end - self.start > self.max_frame_size:
+                raise ProtocolError("Frame exceeds maximum size")
+            return None
+        if index - self.start > self.max_frame_size:
+            raise ProtocolError("Frame exceeds maximum size")
+        with memoryview(self.buffer) as view:
+            frame = bytes(view[self.start:index])
+        self.start = self.scan = index + len(self.DELIMITER)
+        return frame
+
+    def pending(self) -> int:
+        """Number of received bytes not yet returned as a frame."""
+        return self.end - self.start
+
+    def drain(self) -> bytes:
+        """Return and discard all unread bytes (used when switching framing)."""
+        with memoryview(self.buffer) as view:
+            data = bytes(view[self.start:self.end])
+        self.start = self.end = self.scan = 0
+        return data
+
+    def _reserve(self, nbytes: int):
+        if self.start == self.end:
+            self.start = self.end = self.scan = 0
+        if len(self.buffer) - self.end >= nbytes:
+            return
+        if self.start:
+            # Move the partial frame to the front instead of growing
+            remaining = self.end - self.start
+            self.buffer[:remaining] = self.buffer[self.start:self.end]
+            self.scan -= self.start
+            self.end = remaining
+            self.start = 0
+        shortfall = nbytes - (len(self.buffer) - self.end)
+        if shortfall > 0:
+            self.buffer.extend(bytes(max(shortfall, len(self.buffer))))
+
+
+class LengthPrefixedFrameReader(FrameReader):
+    """Frames prefixed with a 4-byte big-endian payload length."""
+    HEADER_SIZE = 4
+
+    def next_frame(self) -> bytes | None:
+        if self.end - self.start < self.HEADER_SIZE:
+            return None
+        length = int.from_bytes(self.buffer[self.start:self.start + self.HEADER_SIZE], "big")
+        if length > self.max_frame_size:
+            raise ProtocolError("Frame exceeds maximum size")
+        frame_start = self.start + self.HEADER_SIZE
+        if self.end - frame_start < length:
+            return None
+        with memoryview(self.buffer) as view:
+            frame = bytes(view[frame_start:frame_start + length])
+        self.start = self.scan = frame_start + length
+        return frame
+
+
+class JsonCodec:
+    """Protocol v1: newline-delimited JSON."""
+    version = PROTOCOL_JSON
+
+    def encode(self, message: dict) -> bytes:
+        return Protocol.encode(message)
+
+    def decode(self, frame: bytes) -> dict:
+        return Protocol.decode(frame)
+
+    def new_reader(self) -> FrameReader:
+        return FrameReader()
+
+
+class BinaryCodec:
+    """
+    Protocol v2: 4-byte length prefix + msgpack [action_code, body].
+    body is the message without its "action" key. Actions missing from
+    ACTIONS are sent by name in place of the code.
+    """
+    version = PROTOCOL_BINARY
+
+    def encode(self, message: dict) -> bytes:
+        if not isinstance(message, dict):
+            raise ProtocolError("Message must be a dictionary")
+        body = dict(message)
+        action = body.pop("action", None)
+        code = ACTION_CODES.get(action, action) if action is not None else 0
+        payload = msgpack.packb([code, body], use_bin_type=True)
+        if len(payload) > MAX_FRAME_SIZE:
+            raise ProtocolError("Frame exceeds maximum size")
+        return len(payload).to_bytes(LengthPrefixedFrameReader.HEADER_SIZE, "big") + payload
+
+    def decode(self, frame: bytes) -> dict:
+        try:
+            code, body = msgpack.unpackb(frame, raw=False)
+        except Exception as e:
+            raise ProtocolError(f"Failed to decode message: {e}")
+        if not isinstance(body, dict):
+            raise ProtocolError("Message body must be a map")
+        if isinstance(code, int) and code:
+            if code > len(ACTIONS):
+                raise ProtocolError(f"Unknown action code: {code}")
+            body["action"] = ACTIONS[code - 1]
+        elif isinstance(code, str):
+            body["action"] = code
+        return body
+
+    def new_reader(self) -> FrameReader:
+        return LengthPrefixedFrameReader()
+
+
+JSON_CODEC = JsonCodec()
+BINARY_CODEC = BinaryCodec()
+
+# Codecs this server can negotiate, by protocol version
+CODECS = {PROTOCOL_JSON: JSON_CODEC}
+if msgpack is not None:
+    CODECS[PROTOCOL_BINARY] = BINARY_CODEC
@@ -2,8 +2,16 @@
 import socket
 import threading
 from server.network.client_handler import ClientHandler
+from server.network.broadcast import broadcast
+from server.channels.bus import LocalBus, deliver
+from server.core.game_state import GameState
+from server.core.game_engine import GameEngine
+from server.config import ZONE_WORKERS
 
 class GameServer:
+    handler_class = ClientHandler
+    zone_workers = ZONE_WORKERS  # one zone pool per process: only the server's own engine gets it
+
     def __init__(self, host="0.0.0.0", port=5000, max_clients=50):
         self.host = host
         self.port = port
@@ -11,9 +19,15 @@ class GameServer:
         self.clients = []
         self.running = False
         self.lock = threading.Lock()  # Protect self.clients
+        self.game_state = GameState()
+        self.engine = GameEngine(self.game_state, zone_workers=self.zone_workers)
+        self.bus = LocalBus(self.deliver)
+        self.bus.subscribe("global")
 
     def start(self):
         self.running = True
+        if self.engine is not None:
+            self.engine.start()
         self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.server_socket.bind((self.host, self.port))
         self.server_socket.listen(self.max_clients)
@@ -22,7 +36,7 @@ class GameServer:
         try:
             while self.running:
                 client_socket, address = self.server_socket.accept()
-                handler = ClientHandler(client_socket, address, self)
+                handler = self.handler_class(client_socket, address, self)
                 handler.start()
                 with self.lock:
                     self.clients.append(handler)
@@ -35,17 +49,36 @@ class GameServer:
             if handler in self.clients:
                 self.clients.remove(handler)
 
-    def broadcast(self, message: dict):
-        """Send a message to all connected clients."""
+    def broadcast(self, message: dict, exclude=None, where=None):
+        """Send a message to all connected clients, encoding it once."""
+        with self.lock:
+            clients = list(self.clients)
+        return broadcast(clients, message, exclude, where)
+
+    def announce(self, message: dict):
+        """Send a message to every player, on every channel."""
+        self.bus.publish("global", message)
+
+    def deliver(self, topic: str, message: dict):
+        """Bus messages for this server: to the clients the topic addresses."""
+        with self.lock:
+            clients = list(self.clients)
+        return deliver(clients, topic, message)
+
+    def queue_depths(self) -> dict:
+        """Outbound backlog per client, keyed by username (or address before login)."""
         with self.lock:
-            for client in self.clients:
-                client.send_response(message)
+            clients = list(self.clients)
+        return {client.username or str(client.address): client.queue_stats() for client in clients}
 
     def stop(self):
         self.running = False
         with self.lock:
-            for client in self.clients:
-                client.disconnect()
+            clients = list(self.clients)
+        for client in clients:
+            client.disconnect()
+        if self.engine is not None:
+            self.engine.stop()
         self.server_socket.close()
         print("[+] Server stopped")
 
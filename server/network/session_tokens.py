@@ -0,0 +1,88 @@
+# server/network/session_tokens.py
+import base64
+import hashlib
+import hmac
+import json
+import secrets
+import threading
+import time
+from server.config import SESSION_TOKEN_TTL
+from server.config.secrets import SECRET_KEY
+
+
+class SessionTokenError(Exception):
+    pass
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+class SessionTokens:
+    """
+    Signed, expiring tokens so a reconnecting client can skip bcrypt.
+    Format: base64url(json payload) "." base64url(HMAC-SHA256(payload)).
+    Revoked token ids are kept in memory until the token would have expired;
+    on_revoke(jti, exp) lets other processes learn of them (revoke_id).
+    """
+    def __init__(self, secret_key=SECRET_KEY, ttl=SESSION_TOKEN_TTL):
+        self.key = secret_key.encode("utf-8")
+        self.ttl = ttl
+        self.revoked = {}  # jti -> exp
+        self.lock = threading.Lock()
+        self.on_revoke = None
+
+    def _sign(self, payload: bytes) -> bytes:
+        return hmac.new(self.key, payload, hashlib.sha256).digest()
+
+    def issue(self, user_id: int, username: str) -> str:
+        payload = json.dumps({
+            "uid": user_id,
+            "usr": username,
+            "exp": int(time.time()) + self.ttl,
+            "jti": secrets.token_hex(8),
+        }, separators=(",", ":")).encode("utf-8")
+        return f"{_b64encode(payload)}.{_b64encode(self._sign(payload))}"
+
+    def validate(self, token: str) -> dict:
+        """Return the token's claims or raise SessionTokenError."""
+        try:
+            payload_part, signature_part = token.split(".")
+            payload = _b64decode(payload_part)
+            signature = _b64decode(signature_part)
+        except (AttributeError, ValueError):
+            raise SessionTokenError("Malformed token")
+        if not hmac.compare_digest(signature, self._sign(payload)):
+            raise SessionTokenError("Invalid token")
+        claims = json.loads(payload)
+        if claims["exp"] < time.time():
+            raise SessionTokenError("Token expired")
+        with self.lock:
+            if claims["jti"] in self.revoked:
+                raise SessionTokenError("Token revoked")
+        return claims
+
+    def revoke(self, token: str) -> bool:
+        try:
+            claims = self.validate(token)
+        except SessionTokenError:
+            return False
+        self.revoke_id(claims["jti"], claims["exp"])
+        if self.on_revoke is not None:
+            self.on_revoke(claims["jti"], claims["exp"])
+        return True
+
+    def revoke_id(self, jti: str, exp: int):
+        """Record a revoked token id, e.g. one revoked by another process."""
+        now = time.time()
+        with self.lock:
+            # Forget entries whose tokens have expired anyway
+            for old in [old for old, expires in self.revoked.items() if expires < now]:
+                del self.revoked[old]
+            self.revoked[jti] = exp
+
+
+session_tokens = SessionTokens()
@@ -0,0 +1,97 @@
+# server/tests/conftest.py
+# Tests run against a throwaway SQLite file; set before server.config is imported.
+import json
+import os
+import socket
+import tempfile
+import time
+import pytest
+
+TEST_DIRECTORY = tempfile.mkdtemp(prefix="otherworldly-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(TEST_DIRECTORY, 'test.db')}")
+os.environ.setdefault("DB_ECHO", "0")
+
+from server.network.client_handler import ClientSession  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def db():
+    from server.db.database import init_db
+    init_db()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def connect(port: int, timeout=5.0) -> socket.socket:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return socket.create_connection(("127.0.0.1", port), timeout=timeout)
+        except ConnectionRefusedError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.02)
+
+
+class RecordingSession(ClientSession):
+    """A session with no socket; decodes and keeps everything sent to it."""
+    def __init__(self, server=None, user_id=None, username=None):
+        super().__init__(address=("test", 0), server=server)
+        self.user_id = user_id
+        self.username = username
+        self.sent = []
+        self.closed = False
+
+    def send_bytes(self, data: bytes):
+        reader = self.codec.new_reader()
+        reader.feed(data)
+        while (frame := reader.next_frame()) is not None:
+            self.sent.append(self.codec.decode(frame))
+
+    def queue_stats(self) -> dict:
+        return {"messages": 0, "bytes": 0, "dropped": 0, "lagging": False}
+
+    def disconnect(self):
+        self.closed = True
+        self.leave_game()
+
+
+class LineClient:
+    """Test client for the newline-JSON protocol."""
+    def __init__(self, port: int):
+        self.sock = connect(port)
+        self.buffer = b""
+
+    def send(self, action, **data):
+        self.sock.sendall(json.dumps({"action": action, "data": data}).encode() + b"\n")
+
+    def receive(self) -> dict:
+        while b"\n" not in self.buffer:
+            chunk = self.sock.recv(65536)
+            if not chunk:
+                raise ConnectionError("Server closed the connection")
+            self.buffer += chunk
+        line, self.buffer = self.buffer.split(b"\n", 1)
+        return json.loads(line)
+
+    def receive_until(self, *actions) -> dict:
+        """Skip unrelated messages (aoi_update, character_list) up to one of actions or an error."""
+        while True:
+            message = self.receive()
+            if message.get("action") in actions or message.get("status") == "error":
+                return message
+
+    def close(self):
+        self.sock.close()
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("Timed out waiting for condition")
+        time.sleep(0.01)
@@ -0,0 +1,447 @@
+# server/tests/test_channels.py
+import json
+import socket
+import threading
+from types import SimpleNamespace
+import pytest
+from conftest import LineClient, RecordingSession, free_port, wait_for
+from server.channels.bus import BusBroker, BusClient, LocalBus, deliver, frame, read_frames
+from server.channels.bus import connect as bus_connect
+from server.channels.channel_game import ChannelClientHandler, ChannelGameServer
+from server.channels.channel_manager import FILL_FIRST, LEAST_LOADED, TICK_AWARE, ChannelManager
+from server.channels.sync import SYNC_TOPIC, StateSync
+from server.core.game_state import GameState
+from server.core.metrics import Histogram
+from server.db.character_cache import character_cache
+from server.db.characters import create_character
+from server.db.database import SessionLocal
+from server.db.models import User
+from server.db.name_index import name_index
+from server.network.session_tokens import SessionTokenError, SessionTokens, session_tokens
+
+
+def sessions(count, start=1):
+    return [RecordingSession(user_id=start + i, username=f"player{start + i}") for i in range(count)]
+
+
+def channel_ids(clients):
+    return [client.channel.channel_id for client in clients]
+
+
+def test_fill_first_packs_channels_and_keeps_a_spare_warm():
+    manager = ChannelManager(2, policy=FILL_FIRST, min_spares=1, max_spares=2)
+    clients = sessions(5)
+    for client in clients:
+        manager.assign_client_to_channel(client)
+    assert channel_ids(clients) == [1, 1, 2, 2, 3]
+    assert manager.stats()["spares"] == 1 and manager.get_channel(4) is not None
+
+
+@pytest.mark.parametrize("policy, expected", [(FILL_FIRST, 1), (LEAST_LOADED, 2)])
+def test_policies_choose_between_occupied_channels(policy, expected):
+    manager = ChannelManager(3, policy=policy, min_spares=1, max_spares=3)
+    clients = sessions(4)
+    for client in clients:
+        manager.assign_client_to_channel(client)
+    assert channel_ids(clients) == [1, 1, 1, 2]
+    manager.remove_client_from_channel(clients[0])  # channel 1 now has 2 players, channel 2 has 1
+    assert clients[0].channel is None
+    assert manager.assign_client_to_channel(RecordingSession(user_id=99)).channel_id == expected
+
+
+def fake_engine(tick_seconds):
+    engine = SimpleNamespace(tick_duration=Histogram(), tick_interval=0.033, stop=lambda: None)
+    engine.tick_duration.observe(tick_seconds)
+    return engine
+
+
+def test_tick_aware_avoids_channels_overrunning_their_tick():
+    manager = ChannelManager(4, policy=TICK_AWARE, min_spares=1, max_spares=3)
+    clients = sessions(5)
+    for client in clients:
+        manager.assign_client_to_channel(client)
+    assert channel_ids(clients) == [1, 1, 1, 1, 2]
+    manager.remove_client_from_channel(clients[0])
+    manager.get_channel(1).engine = fake_engine(0.045)  # over budget
+    manager.get_channel(2).engine = fake_engine(0.001)
+    manager.loads_sampled = 0.0  # sample on the next placement
+    assert manager.assign_client_to_channel(RecordingSession(user_id=99)).channel_id == 2
+    manager.get_channel(2).engine = fake_engine(0.045)
+    manager.loads_sampled = 0.0
+    assert manager.assign_client_to_channel(RecordingSession(user_id=100)).channel_id == 3  # the spare
+
+
+def test_empty_channels_beyond_max_spares_are_destroyed():
+    manager = ChannelManager(1, policy=FILL_FIRST, min_spares=1, max_spares=2)
+    clients = sessions(3)
+    for client in clients:
+        manager.assign_client_to_channel(client)
+    assert sorted(manager.channels) == [1, 2, 3, 4]
+    manager.remove_client_from_channel(clients[0])
+    assert sorted(manager.spares) == [1, 4]
+    manager.remove_client_from_channel(clients[1])
+    assert sorted(manager.channels) == [1, 2, 3] and sorted(manager.spares) == [1, 2]
+    # Spares are reused lowest first rather than creating channels
+    assert manager.assign_client_to_channel(RecordingSession(user_id=99)).channel_id == 1
+    assert sorted(manager.channels) == [1, 2, 3]
+
+
+def test_shut_down_spares_stop_outside_the_manager_lock():
+    manager = ChannelManager(1, policy=FILL_FIRST, min_spares=1, max_spares=1)
+    first, second = sessions(2)
+    for client in (first, second):
+        manager.assign_client_to_channel(client)
+    stopping, release = threading.Event(), threading.Event()
+    manager.get_channel(3).engine = SimpleNamespace(stop=lambda: (stopping.set(), release.wait(5)))
+    leaving = threading.Thread(target=manager.remove_client_from_channel, args=(first,))
+    leaving.start()
+    try:
+        assert stopping.wait(5)  # channel 3 is the spare too many, its engine is slow to stop
+        assert manager.lock.acquire(timeout=1)
+        manager.lock.release()
+        assert 3 not in manager.channels
+    finally:
+        release.set()
+        leaving.join(5)
+
+
+def test_heap_skips_channels_filled_outside_the_manager():
+    manager = ChannelManager(2, policy=FILL_FIRST, min_spares=1, max_spares=2)
+    first = manager.assign_client_to_channel(RecordingSession(user_id=1))
+    assert first.add_client(RecordingSession(user_id=2))  # full, but its heap entry says otherwise
+    assert manager.assign_client_to_channel(RecordingSession(user_id=3)).channel_id == 2
+    assert len(first.clients) == 2
+
+
+def test_heap_stays_bounded_under_churn():
+    manager = ChannelManager(10, policy=LEAST_LOADED, min_spares=1, max_spares=2)
+    clients = sessions(25)
+    for client in clients:
+        manager.assign_client_to_channel(client)
+    for _ in range(200):
+        for client in clients[::3]:
+            manager.remove_client_from_channel(client)
+            manager.assign_client_to_channel(client)
+    stats = manager.stats()
+    assert stats["clients"] == 25
+    assert stats["heap_entries"] <= 2 * stats["channels"] + 64
+    assert all(len(channel.clients) <= 10 for channel in manager.channels.values())
+
+
+def test_manager_rejects_bad_settings():
+    with pytest.raises(ValueError):
+        ChannelManager(policy="random")
+    with pytest.raises(ValueError):
+        ChannelManager(min_spares=3, max_spares=1)
+
+
+class RecordingBus:
+    """Just enough of BusClient for StateSync."""
+    def __init__(self):
+        self.published = []
+        self.topics = []
+
+    def publish(self, topic, message):
+        self.published.append((topic, message))
+
+    def subscribe(self, topic):
+        self.topics.append(topic)
+
+
+@pytest.fixture
+def sync():
+    state_sync = StateSync(RecordingBus())
+    state_sync.attach()
+    yield state_sync
+    state_sync.detach()
+
+
+def test_state_sync_publishes_local_changes(db, sync):
+    assert sync.bus.topics == [SYNC_TOPIC]
+    claims = session_tokens.validate(token := session_tokens.issue(9101, "syncer"))
+    session_tokens.revoke(token)
+    character_cache.invalidate(9101)
+    character_cache.invalidate(9102, share=False)
+    assert name_index.reserve("Syncer", owner=9101)
+    name_index.release("Syncer", owner=9101)
+    ops = [(message["op"], message["args"]) for topic, message in sync.bus.published]
+    assert all(topic == SYNC_TOPIC for topic, _ in sync.bus.published)
+    assert all(message["origin"] == sync.origin for _, message in sync.bus.published)
+    assert ops[:2] == [("revoke", [claims["jti"], claims["exp"]]), ("invalidate", [9101])]
+    assert [(op, args[0]) for op, args in ops[2:]] == [("name", "reserve"), ("name", "release")]
+
+
+def test_state_sync_applies_changes_from_other_processes(db, sync):
+    elsewhere = SessionTokens()  # same secret, another process
+    claims = elsewhere.validate(token := elsewhere.issue(9103, "remote"))
+    character_cache.put(9103, [])
+    for op, args in [("revoke", [claims["jti"], claims["exp"]]), ("invalidate", [9103]),
+                     ("name", ["add", ["remotename"]])]:
+        sync.apply({"origin": sync.origin + 1, "op": op, "args": args})
+    try:
+        with pytest.raises(SessionTokenError, match="revoked"):
+            session_tokens.validate(token)
+        assert character_cache.get(9103) is None
+        assert name_index.is_taken("RemoteName")
+        assert sync.applied == 3
+        assert sync.bus.published == []  # applied changes are not echoed back
+    finally:
+        name_index.apply("discard", ["remotename"])
+
+
+def test_state_sync_ignores_its_own_messages(sync):
+    character_cache.put(9104, [])
+    sync.apply({"origin": sync.origin, "op": "invalidate", "args": [9104]})
+    sync.apply({"origin": sync.origin + 1, "op": "unknown", "args": []})
+    assert character_cache.get(9104) == ()
+    assert sync.applied == 0
+
+
+def test_state_sync_detach_stops_publishing(sync):
+    sync.detach()
+    character_cache.invalidate(9105)
+    assert sync.bus.published == []
+
+
+def test_bus_frames_survive_partial_reads():
+    items = [json.dumps(["pub", "global", {"n": n}, 0.0]).encode() for n in range(3)]
+    data = frame(items) + frame([])
+    buffer = bytearray()
+    payloads = []
+    for i in range(0, len(data), 5):
+        buffer += data[i:i + 5]
+        payloads.extend(read_frames(buffer))
+    assert [json.loads(payload) for payload in payloads] == [[json.loads(item) for item in items], []]
+    assert not buffer
+
+
+def test_deliver_routes_by_topic():
+    alice, bob, carol = (RecordingSession(user_id=i, username=name) for i, name in enumerate(("alice", "bob", "carol")))
+    alice.party = bob.party = "raid"
+    clients = [alice, bob, carol]
+    assert deliver(clients, "user:bob", {"action": "whisper"}) == 1
+    assert deliver(clients, "party:raid", {"action": "party_chat"}) == 2
+    assert deliver(clients, "global", {"action": "announce"}) == 3
+    assert [message["action"] for message in bob.sent] == ["whisper", "party_chat", "announce"]
+    assert [message["action"] for message in carol.sent] == ["announce"]
+
+
+def test_local_bus_counts_subscriptions():
+    received = []
+    bus = LocalBus(lambda topic, message: received.append((topic, message)))
+    bus.subscribe("party:raid")
+    bus.subscribe("party:raid")
+    bus.unsubscribe("party:raid")
+    bus.publish("party:raid", {"n": 1})
+    bus.unsubscribe("party:raid")
+    bus.publish("party:raid", {"n": 2})
+    assert received == [("party:raid", {"n": 1})]
+    assert bus.stats() == {"published": 2, "topics": 0}
+
+
+@pytest.fixture
+def broker(tmp_path):
+    bus_broker = BusBroker(str(tmp_path / "bus.sock"))
+    thread = threading.Thread(target=bus_broker.serve, daemon=True)
+    thread.start()
+    yield bus_broker
+    bus_broker.stop()
+    # serve() notices on its next event: wake it with a connection of our own
+    bus_connect(bus_broker.path).close()
+    thread.join(5)
+
+
+def test_bus_routes_messages_between_clients(broker):
+    received = []
+    listener = BusClient(broker.path, lambda topic, message: received.append((topic, message)), flush_interval=0.001)
+    sender = BusClient(broker.path, lambda topic, message: None, flush_interval=0.001)
+    try:
+        listener.subscribe("party:raid")
+        listener.subscribe("party:raid")  # counted: one sub reaches the broker
+        wait_for(lambda: broker.subscribers.get("party:raid"))
+        for n in range(50):
+            sender.publish("party:raid", {"n": n})
+        sender.publish("party:other", {"n": -1})
+        wait_for(lambda: len(received) == 50)
+        assert received == [("party:raid", {"n": n}) for n in range(50)]  # in order
+        listener.unsubscribe("party:raid")
+        assert "party:raid" in listener.subscriptions
+        listener.unsubscribe("party:raid")
+        wait_for(lambda: "party:raid" not in broker.subscribers)
+        assert sender.stats()["published"] == 51 and listener.stats()["received"] == 50
+        assert broker.stats()["published"] == 51 and broker.stats()["delivered"] == 50
+    finally:
+        listener.close()
+        sender.close()
+
+
+def test_bus_broker_drops_a_connection_sending_garbage(broker):
+    received = []
+    listener = BusClient(broker.path, lambda topic, message: received.append(message), flush_interval=0.001)
+    bad = bus_connect(broker.path)
+    try:
+        listener.subscribe("global")
+        wait_for(lambda: broker.subscribers.get("global"))
+        bad.sendall(frame([b"not json"]))
+        assert bad.recv(1) == b""  # closed by the broker
+        listener.publish("global", {"still": "up"})
+        wait_for(lambda: received == [{"still": "up"}])
+    finally:
+        bad.close()
+        listener.close()
+
+
+def character(user_id, x=100, y=200):
+    return {"id": user_id, "name": f"Hero{user_id}", "x": x, "y": y, "map_id": 1, "stats": {"HP": 40, "MP": 5}}
+
+
+def test_export_and_import_keep_the_entity():
+    source, target = GameState(), GameState()
+    client = RecordingSession(user_id=1, username="mover")
+    source.add_player(1, {"username": "mover", "client": client})
+    entity = source.spawn_player(1, character(1))
+    entity.set_velocity(3, -2)
+    assert source.export_player(1, client=RecordingSession()) is None  # someone else's connection
+    state = source.export_player(1, client)
+    assert 1 not in source.players and entity.zone is None
+    imported = target.import_player(1, state, client)["entity"]
+    assert (imported.id, imported.name, imported.x, imported.y) == (entity.id, "Hero1", 100, 200)
+    assert (imported.vx, imported.vy, imported.hp, imported.mp) == (3, -2, 40, 5)
+    assert imported.zone is target.world.get_zone("1")
+    assert target.players[1]["client"] is client and target.players[1]["username"] == "mover"
+
+
+def engine_manager(per_channel=4):
+    return ChannelManager(per_channel, policy=FILL_FIRST, min_spares=1, max_spares=2,
+                          engine_factory=ChannelGameServer.create_engine)
+
+
+def enter(manager, user_id):
+    client = RecordingSession(user_id=user_id, username=f"player{user_id}")
+    manager.assign_client_to_channel(client)
+    client.enter_game()
+    client.engine.submit("spawn_player", user_id, character(user_id, x=user_id * 10))
+    players = client.engine.game_state.players
+    wait_for(lambda: "entity" in players.get(user_id, {}))
+    return client, players[user_id]["entity"]
+
+
+def test_transfer_moves_a_player_between_channel_engines():
+    manager = engine_manager()
+    try:
+        client, entity = enter(manager, 1)
+        source, target = manager.get_channel(1), manager.get_channel(2)
+        latencies = []
+        assert manager.transfer(client, 2, on_done=latencies.append) is target
+        wait_for(lambda: latencies)
+        assert client.channel is target and client in target.clients and client not in source.clients
+        assert {"action": "channel_changed", "channel": 2} in client.sent
+        assert 1 not in source.engine.game_state.players
+        moved = target.engine.game_state.players[1]["entity"]
+        assert (moved.id, moved.x, moved.y) == (entity.id, 10, 200)
+        stats = manager.stats()
+        assert stats["transfers"] == 1 and stats["transfers_in_flight"] == 0
+        assert manager.transfer(client, 2) is None  # already there
+        assert manager.transfer(client, 99) is None
+    finally:
+        manager.stop()
+
+
+def test_transfer_refuses_a_second_change_in_flight():
+    manager = engine_manager()
+    try:
+        client, _ = enter(manager, 1)
+        source = client.channel
+        release = threading.Event()
+        source.engine.register_command("block", release.wait)
+        source.engine.submit("block")  # holds the export until released
+        manager.transfer(client)
+        with pytest.raises(ValueError, match="already changing"):
+            manager.transfer(client)
+        release.set()
+        wait_for(lambda: client.channel is not source)
+        with pytest.raises(ValueError, match="not in a channel"):
+            manager.transfer(RecordingSession(user_id=2))
+    finally:
+        manager.stop()
+
+
+def test_drain_channel_moves_everyone_off():
+    manager = engine_manager(per_channel=3)
+    try:
+        clients = [enter(manager, user_id)[0] for user_id in (1, 2, 3)]
+        arrived = []
+        assert manager.drain_channel(1, on_done=arrived.append) == 3
+        wait_for(lambda: len(arrived) == 3)
+        assert not manager.get_channel(1).clients
+        for client in clients:
+            assert client.channel.channel_id != 1
+            assert "entity" in client.engine.game_state.players[client.user_id]
+    finally:
+        manager.stop()
+
+
+def test_stopping_channels_disconnects_the_players_in_them(db):
+    server = ChannelGameServer(host="127.0.0.1", port=free_port(), per_channel=2)
+    ours, theirs = socket.socketpair()
+    handler = ChannelClientHandler(ours, ("test", 0), server)
+    handler.user_id, handler.username = 9301, "stayer"
+    handler.enter_game()  # placed in a channel, whose leave_game the disconnect goes through
+    assert handler.channel is not None
+    stopping = threading.Thread(target=server.channels.stop, daemon=True)
+    stopping.start()
+    stopping.join(5)
+    try:
+        assert not stopping.is_alive()
+        assert handler.closed and theirs.recv(1) == b""
+    finally:
+        theirs.close()
+        ours.close()
+
+
+@pytest.fixture
+def channel_server(db):
+    server = ChannelGameServer(host="127.0.0.1", port=free_port(), per_channel=2)
+    thread = threading.Thread(target=server.start, daemon=True)
+    thread.start()
+    wait_for(lambda: server.running)
+    yield server
+    server.stop()
+
+
+def create_user(username) -> int:
+    session = SessionLocal()
+    try:
+        user = User(username=username, email=f"{username}@example.com", password_hash="unused")
+        session.add(user)
+        session.commit()
+        return user.id
+    finally:
+        session.close()
+
+
+def test_channel_server_changes_channel_on_request(channel_server):
+    user_id = create_user("channeler")
+    created = create_character(user_id, "Channeler")
+    client = LineClient(channel_server.port)
+    try:
+        client.send("change_channel", channel=2)
+        assert client.receive_until() == {"status": "error", "message": "Not logged in"}
+        client.send("resume", token=session_tokens.issue(user_id, "channeler"))
+        assert client.receive_until("resume_ok")["action"] == "resume_ok"
+        client.send("enter_world", char_id=created.id)
+        assert client.receive_until("enter_world_ok")["action"] == "enter_world_ok"
+        wait_for(lambda: "entity" in channel_server.channels.get_channel(1).engine.game_state.players.get(user_id, {}))
+        client.send("change_channel", channel="two")
+        assert client.receive_until()["message"] == "Invalid channel"
+        client.send("change_channel", channel=99)
+        assert client.receive_until()["message"] == "Channel unavailable"
+        client.send("change_channel", channel=2)
+        assert client.receive_until("channel_changed") == {"action": "channel_changed", "channel": 2}
+        players = channel_server.channels.get_channel(2).engine.game_state.players
+        assert players[user_id]["entity"].name == "Channeler"
+        client.send("ping", n=1)
+        assert client.receive_until("pong") == {"action": "pong", "data": {"n": 1}}
+    finally:
+        client.close()
+    wait_for(lambda: channel_server.channels.stats()["clients"] == 0)
@@ -0,0 +1,279 @@
+# server/tests/test_db.py
+import random
+import pytest
+from sqlalchemy import event, inspect, text
+from sqlalchemy.exc import IntegrityError
+from server.config.database import POOL_SIZE
+from server.db.character_cache import CharacterListCache, character_cache
+from server.db.characters import check_name, create_character, delete_character
+from server.db.database import SessionLocal, create_engine_from_config
+from server.db import database, models
+from server.db.migrations import MIGRATIONS, MigrationError, current_version, migrate
+from server.db.models import Character
+from server.db.name_index import NameIndex, name_index
+from server.db.write_behind import WriteBehind
+
+
+def pragma(engine, name):
+    with engine.connect() as conn:
+        return conn.execute(text(f"PRAGMA {name}")).scalar()
+
+
+def test_production_profile_pools_and_tunes_sqlite(tmp_path):
+    engine = create_engine_from_config(f"sqlite:///{tmp_path / 'prod.db'}", profile="production")
+    try:
+        assert not engine.echo
+        assert engine.pool.size() == POOL_SIZE
+        assert pragma(engine, "journal_mode") == "wal"
+        assert pragma(engine, "synchronous") == 1  # NORMAL
+        assert pragma(engine, "busy_timeout") == 5000
+    finally:
+        engine.dispose()
+
+
+def test_production_profile_skips_file_pragmas_in_memory():
+    engine = create_engine_from_config("sqlite:///:memory:", profile="production")
+    try:
+        assert pragma(engine, "journal_mode") == "memory"
+        assert pragma(engine, "busy_timeout") == 5000
+    finally:
+        engine.dispose()
+
+
+def test_development_profile_leaves_sqlite_defaults(tmp_path):
+    engine = create_engine_from_config(f"sqlite:///{tmp_path / 'dev.db'}", profile="development")
+    try:
+        assert pragma(engine, "journal_mode") == "delete"
+    finally:
+        engine.dispose()
+
+
+
+def legacy_engine(tmp_path):
+    """A database from before the migrations: the oldest users/characters columns only."""
+    engine = create_engine_from_config(f"sqlite:///{tmp_path / 'legacy.db'}", profile="production")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE users (id INTEGER PRIMARY KEY, username VARCHAR UNIQUE, password_hash VARCHAR)"))
+        conn.execute(text("CREATE TABLE characters (id INTEGER PRIMARY KEY, user_id INTEGER, name VARCHAR)"))
+    return engine
+
+
+def test_migrations_add_columns_and_indexes(tmp_path):
+    engine = legacy_engine(tmp_path)
+    try:
+        assert migrate(engine) == MIGRATIONS[-1][0]
+        columns = {c["name"] for c in inspect(engine).get_columns("characters")}
+        assert {"gold", "x", "y", "map_id", "gear"} <= columns
+        indexes = {i["name"]: i for i in inspect(engine).get_indexes("characters")}
+        assert indexes["ix_characters_name"]["unique"]
+        assert indexes["ix_characters_user_id"]["column_names"] == ["user_id"]
+        assert migrate(engine) == MIGRATIONS[-1][0]  # nothing left to apply
+        with engine.begin() as conn:
+            conn.execute(text("INSERT INTO characters (user_id, name) VALUES (1, 'Twin')"))
+        with pytest.raises(IntegrityError):
+            with engine.begin() as conn:
+                conn.execute(text("INSERT INTO characters (user_id, name) VALUES (2, 'Twin')"))
+    finally:
+        engine.dispose()
+
+
+def test_unique_name_migration_refuses_duplicates(tmp_path):
+    engine = legacy_engine(tmp_path)
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("INSERT INTO characters (user_id, name) VALUES (1, 'Twin'), (2, 'Twin')"))
+        with pytest.raises(MigrationError, match="Twin"):
+            migrate(engine)
+        with engine.connect() as conn:
+            assert current_version(conn) == 1
+    finally:
+        engine.dispose()
+
+
+def name_index_for_test(ttl=60):
+    index = NameIndex(reservation_ttl=ttl)
+    index.loaded = True  # no names in the database for these
+    return index
+
+
+def test_name_index_is_case_insensitive():
+    index = name_index_for_test()
+    index.add("Aria")
+    assert index.is_taken("aria") and index.is_taken("ARIA")
+    index.discard("aRIA")
+    assert not index.is_taken("Aria")
+
+
+def test_name_index_reservations_hold_one_name_per_owner():
+    index = name_index_for_test()
+    assert index.reserve("Aria", owner=1)
+    assert index.reserve("aria", owner=1)  # re-reserving extends it
+    assert not index.reserve("Aria", owner=2)
+    assert index.is_taken("Aria", owner=2) and not index.is_taken("Aria", owner=1)
+    assert index.reserve("Bran", owner=1)  # gives up Aria
+    assert index.reserve("Aria", owner=2)
+    index.release("Aria", owner=1)  # not theirs any more
+    assert index.is_taken("Aria", owner=3)
+    index.add("Aria")  # created: the reservation becomes the name
+    assert not index.reservations.get("aria")
+    assert not index.reserve("Aria", owner=2)
+
+
+def test_name_index_reservations_expire():
+    index = name_index_for_test(ttl=-1)
+    assert index.reserve("Aria", owner=1)
+    assert index.reserve("Aria", owner=2)
+
+
+def test_name_index_changes_replay_in_another_index():
+    first, second = name_index_for_test(), name_index_for_test()
+    first.on_change = lambda op, args: second.apply(op, list(args))
+    first.add("Aria")
+    first.reserve("Bran", owner=1)
+    assert second.is_taken("Aria") and second.is_taken("Bran", owner=2)
+    first.release("Bran", owner=1)
+    first.discard("Aria")
+    assert not second.is_taken("Aria") and not second.is_taken("Bran", owner=2)
+
+
+def test_name_index_concurrent_reservations_settle_on_the_earliest():
+    first, second = name_index_for_test(), name_index_for_test()
+    assert first.reserve("Aria", owner=1)
+    assert second.reserve("Aria", owner=2)  # before either heard of the other
+    first_key, second_key = first.reservations["aria"], second.reservations["aria"]
+    first.apply("reserve", ["aria", *second_key])
+    second.apply("reserve", ["aria", *first_key])
+    assert first.reservations["aria"] == second.reservations["aria"] == first_key
+
+
+def test_create_and_delete_character_keep_the_index_current(db):
+    name_index.ensure_loaded()
+    user_id = 9001
+    character = create_character(user_id, "Indexed")
+    assert check_name("indexed") == (False, "Character name already exists")
+    with pytest.raises(ValueError):
+        create_character(user_id + 1, "INDEXED")
+    assert delete_character(user_id, character.id)
+    assert check_name("Indexed") == (True, None)
+    assert check_name("no spaces")[0] is False
+
+
+def test_character_cache_evicts_least_recently_used():
+    cache = CharacterListCache(max_entries=2)
+    cache.put(1, [{"id": 1}])
+    cache.put(2, [{"id": 2}])
+    assert cache.get(1) == ({"id": 1},)  # 2 is now the oldest
+    cache.put(3, [{"id": 3}])
+    assert cache.get(2) is None
+    assert cache.get(1) and cache.get(3)
+    assert cache.stats() == {"entries": 2, "hits": 3, "misses": 1, "evictions": 1}
+
+
+def test_character_cache_invalidation_is_shared_once():
+    cache = CharacterListCache()
+    shared = []
+    cache.on_invalidate = shared.append
+    cache.put(1, [])
+    cache.invalidate(1)
+    cache.invalidate(2, share=False)
+    assert cache.get(1) is None and shared == [1]
+
+
+def test_character_writes_invalidate_the_cached_list(db):
+    user_id = 9002
+    character_cache.put(user_id, [])
+    character = create_character(user_id, "Cached")
+    assert character_cache.get(user_id) is None
+    character_cache.put(user_id, [character])
+    assert delete_character(user_id, character.id)
+    assert character_cache.get(user_id) is None
+
+
+def random_character(rng) -> Character:
+    slots = ("helm", "armor", "boots", "weapon")
+    gear = {slot: {stat: rng.randint(0, 30) for stat in rng.sample(("spd", "jmp", "hp", "att_spd", "def", "mp",
+                                                                      "att", "gravity"), 3)}
+            if rng.random() < 0.7 else None for slot in slots}
+    return Character(name="Batch", gear=gear, **{stat: rng.randint(0, 300)
+                                                 for stat in ("str", "int", "dex", "vit", "agi", "end")})
+
+
+def test_derived_stats_are_memoized_until_an_input_changes():
+    character = random_character(random.Random(1))
+    first = character.calculate_derived_stats()
+    assert character.calculate_derived_stats() == first
+    character.dex += 40
+    assert character.calculate_derived_stats() != first
+    character.gear = {}
+    assert character.calculate_derived_stats() == character._compute_derived_stats()
+
+
+@pytest.mark.parametrize("vectorized", [True, False])
+def test_derived_stats_batch_matches_one_by_one(monkeypatch, vectorized):
+    if vectorized and models.np is None:
+        pytest.skip("numpy is not installed")
+    if not vectorized:
+        monkeypatch.setattr(models, "np", None)
+    rng = random.Random(12)
+    characters = [random_character(rng) for _ in range(300)]
+    batch = Character.derived_stats_for(characters)
+    for i, character in enumerate(characters):
+        assert {stat: values[i] for stat, values in batch.items()} == character.calculate_derived_stats()
+    assert Character.derived_stats_for([]) == {stat: [] for stat in batch}
+
+
+def load_character(char_id) -> Character:
+    session = SessionLocal()
+    try:
+        return session.get(Character, char_id)
+    finally:
+        session.close()
+
+
+def test_write_behind_coalesces_and_groups_updates(db):
+    user_id = 9003
+    first, second, third = (create_character(user_id, f"Behind{i}") for i in range(3))
+    buffer = WriteBehind()
+    buffer.update(first.id, owner=user_id, x=1, y=1)
+    buffer.update(first.id, x=5, y=6)
+    buffer.update(second.id, owner=user_id, x=7, y=8)
+    buffer.update(third.id, owner=user_id, hp=12)
+    assert buffer.pending(first.id) == {"x": 5, "y": 6}
+
+    updates = []
+    def count_updates(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("UPDATE"):
+            updates.append(len(parameters) if executemany else 1)
+    event.listen(database.engine, "before_cursor_execute", count_updates)
+    try:
+        character_cache.put(user_id, [])
+        assert buffer.flush() == 3
+    finally:
+        event.remove(database.engine, "before_cursor_execute", count_updates)
+    assert sorted(updates) == [1, 2]  # the x/y rows share one executemany
+    assert (load_character(first.id).x, load_character(first.id).y) == (5, 6)
+    assert load_character(third.id).hp == 12
+    assert character_cache.get(user_id) is None
+    assert buffer.stats()["pending"] == 0 and buffer.flush() == 0
+
+
+def test_write_behind_flushes_one_owner(db):
+    mine, theirs = create_character(9004, "OwnerMine"), create_character(9005, "OwnerTheirs")
+    buffer = WriteBehind()
+    buffer.update(mine.id, owner=9004, gold=10)
+    buffer.update(theirs.id, owner=9005, gold=20)
+    assert buffer.flush(owner=9004) == 1
+    assert load_character(mine.id).gold == 10
+    assert buffer.pending(theirs.id) == {"gold": 20}
+
+
+def test_write_behind_rejects_unknown_fields():
+    with pytest.raises(ValueError):
+        WriteBehind().update(1, name="Renamed")
+
+
+def test_write_behind_requeue_keeps_newer_values():
+    buffer = WriteBehind()
+    buffer.update(1, owner=3, x=9)
+    buffer._requeue({1: [{"x": 1, "y": 2}, 3, 0.0]})
+    assert buffer.pending(1) == {"x": 9, "y": 2}
@@ -1 +1,413 @@
-# Starter code for test_game_state.py
+# server/tests/test_game.py
+import gc
+import random
+import threading
+import time
+from types import SimpleNamespace
+import pytest
+from conftest import RecordingSession, wait_for
+from zones import build_zones, same_state
+from server.core import entity_store
+from server.core.commands import Command, CommandQueue
+from server.core.entity_store import EntityStore
+from server.core.game_engine import CATCH_UP, SKIP, GameEngine
+from server.core.game_state import GameState
+from server.core.ids import (MAX_GENERATION, MAX_SEQUENCE, MAX_SHARD, IdAllocator, IdError,
+                             make_id, split_id)
+from server.core.interest import InterestManager
+from server.core.snapshots import SnapshotRing, diff_state
+from server.core.world import Entity, Zone, clamp_to_zone, detached
+from server.core.zone_pool import ZonePool
+from server.db.write_behind import write_behind
+
+
+def run_engine(engine, seconds):
+    engine.start()
+    try:
+        time.sleep(seconds)
+    finally:
+        engine.stop()
+
+
+def test_engine_ticks_at_its_rate():
+    engine = GameEngine(GameState(), tick_rate=100, name="test-rate")
+    run_engine(engine, 0.5)
+    assert 35 <= engine.tick <= 55
+    stats = engine.tick_stats()
+    assert stats["ticks"] == engine.tick and stats["tick_errors"] == 0
+
+
+def test_tick_work_does_not_slow_the_rate():
+    engine = GameEngine(GameState(), tick_rate=100, name="test-drift")
+    engine.update = lambda: time.sleep(0.005)  # half the interval
+    run_engine(engine, 0.5)
+    assert engine.tick >= 40  # sleeping a full interval after each tick would give ~33
+    assert engine.skipped_ticks == 0
+
+
+@pytest.mark.parametrize("policy", [SKIP, CATCH_UP])
+def test_slow_ticks_drop_late_ones(policy):
+    engine = GameEngine(GameState(), tick_rate=100, policy=policy, max_catchup=2, name=f"test-{policy}")
+    engine.update = lambda: time.sleep(0.05)  # five intervals per tick
+    run_engine(engine, 0.4)
+    assert engine.overruns == engine.tick
+    assert engine.skipped_ticks > 0
+
+
+def test_engine_survives_a_failing_tick():
+    engine = GameEngine(GameState(), tick_rate=100, name="test-errors")
+    update = engine.update
+    failures = iter([True, True])
+
+    def flaky():
+        if next(failures, False):
+            raise RuntimeError("broken tick")
+        update()
+    engine.update = flaky
+    engine.start()
+    try:
+        wait_for(lambda: engine.tick > 5)
+    finally:
+        engine.stop()
+    assert engine.tick_errors == 2
+
+
+def test_command_queue_drains_what_was_queued():
+    queue = CommandQueue()
+    queue.push("a", 1)
+    queue.push("b", 2, 3)
+    drained = queue.drain()
+    queue.push("c")
+    assert drained == [Command("a", (1,)), Command("b", (2, 3))]
+    assert len(queue) == 1
+
+
+def test_command_queue_keeps_every_producers_order():
+    queue = CommandQueue()
+    def produce(name):
+        for i in range(2000):
+            queue.push(name, i)
+    threads = [threading.Thread(target=produce, args=(f"p{n}",)) for n in range(4)]
+    drained = []
+    for thread in threads:
+        thread.start()
+    while any(thread.is_alive() for thread in threads) or len(queue):
+        drained.extend(queue.drain())
+    for n in range(4):
+        assert [c.args[0] for c in drained if c.name == f"p{n}"] == list(range(2000))
+
+
+def test_engine_applies_commands_at_the_next_tick():
+    engine = GameEngine(GameState(), name="test-commands")
+    applied = []
+    engine.register_command("record", applied.append)
+    engine.register_command("fail", lambda: 1 / 0)
+    engine.submit("record", 1)
+    engine.submit("fail")
+    engine.submit("nonexistent")
+    engine.submit("record", 2)
+    assert applied == []
+    engine.update()
+    assert applied == [1, 2]
+    assert engine.commands_applied == 4
+
+
+def populated_zone(count=500, seed=3, size=1000.0):
+    rng = random.Random(seed)
+    zone = Zone("grid", size, size, cell_size=64)
+    for i in range(count):
+        zone.add_entity(Entity(f"e{i}", rng.uniform(0, size), rng.uniform(0, size)))
+    return zone, rng
+
+
+def brute_radius(zone, x, y, radius):
+    return {e.id for e in zone.entities.values() if (e.x - x) ** 2 + (e.y - y) ** 2 <= radius * radius}
+
+
+def test_grid_queries_match_a_full_scan():
+    zone, rng = populated_zone()
+    for _ in range(50):
+        x, y, radius = rng.uniform(-100, 1100), rng.uniform(-100, 1100), rng.uniform(0, 300)
+        assert {e.id for e in zone.query_radius(x, y, radius)} == brute_radius(zone, x, y, radius)
+    x0, y0 = rng.uniform(0, 500), rng.uniform(0, 500)
+    inside = {e.id for e in zone.entities.values() if x0 <= e.x <= x0 + 200 and y0 <= e.y <= y0 + 200}
+    assert {e.id for e in zone.query_rect(x0, y0, x0 + 200, y0 + 200)} == inside
+
+
+@pytest.mark.parametrize("moving", [10, 400])  # one by one, and the whole-column sweep
+def test_grid_follows_moves(moving):
+    zone, rng = populated_zone()
+    entities = list(zone.entities.values())
+    for entity in entities[:moving]:
+        entity.set_velocity(rng.uniform(-300, 300), rng.uniform(-300, 300))
+    for _ in range(5):
+        zone.integrate(0.1)
+    entities[-1].move(500, 0)
+    zone.remove_entity(entities[-2].id)
+    assert len(zone.grid) == len(zone.entities)
+    for entity in zone.entities.values():
+        assert entity.index in zone.grid.cells[zone.grid.cell_of(entity.x, entity.y)]
+    assert {e.id for e in zone.query_radius(500, 500, 250)} == brute_radius(zone, 500, 500, 250)
+
+
+def test_grid_clamps_positions_outside_the_zone():
+    zone = Zone("grid", 100, 100, cell_size=10)
+    far = Entity("far", -50, 250)
+    zone.add_entity(far)
+    assert zone.grid.cell_of(far.x, far.y) == (zone.grid.rows - 1) * zone.grid.cols
+    assert zone.query_rect(-100, 200, 0, 300) == [far]
+
+
+def viewer_setup(radius=100):
+    """A zone with one watching player, a neighbour and a far-away entity."""
+    zone = Zone("aoi", 1000, 1000)
+    me, near, far = Entity("me", 500, 500), Entity("near", 550, 500), Entity("far", 900, 900)
+    for entity in (me, near, far):
+        zone.add_entity(entity)
+    client = RecordingSession()
+    players = {1: {"entity": me, "client": client}}
+    return InterestManager(view_radius=radius), players, client, (me, near, far)
+
+
+def test_aoi_sends_only_what_is_in_view():
+    interest, players, client, (me, near, far) = viewer_setup()
+    assert interest.update(players, 1) == 1
+    update = client.sent[-1]
+    assert update["self"] == me.id and update["baseline"] is None
+    assert {state["id"] for state in update["enter"]} == {me.id, near.id}
+    far.move(-360, -390)
+    interest.update(players, 2)
+    assert far.id in {state["id"] for state in client.sent[-1]["enter"]}
+
+
+def test_move_input_is_validated_and_capped():
+    engine = GameEngine(GameState(), name="test-moves")
+    session = RecordingSession(server=SimpleNamespace(engine=engine), user_id=1, username="mover")
+    engine.game_state.add_player(1, {"client": session})
+    entity = engine.game_state.spawn_player(1, {"id": 77, "name": "Mover", "x": 100, "y": 100,
+                                                 "map_id": 1, "stats": {}})
+    for bad in (float("nan"), float("inf"), True, "3", 10 ** 400):
+        session.handle_message({"action": "move", "data": {"dx": bad, "dy": 0}})
+    assert [m["message"] for m in session.sent] == ["Invalid move"] * 5
+    session.handle_message({"action": "move", "data": {"dx": 1e6, "dy": 0}})
+    session.handle_message({"action": "move", "data": {"dx": 5, "dy": 0}})
+    engine.update()
+    assert entity.x == pytest.approx(100 + engine.move_max_distance)
+    write_behind.discard(77)
+
+
+def test_a_new_session_replaces_the_old_sessions_entity():
+    state = GameState()
+    old, new = RecordingSession(), RecordingSession()
+    hero = {"id": 78, "name": "Hero", "x": 100, "y": 100, "map_id": 1, "stats": {}}
+    state.add_player(1, {"client": old})
+    state.spawn_player(1, hero)
+    state.add_player(1, {"client": new})  # the same account reconnected
+    state.remove_player(1, old)  # the old connection's late cleanup is ignored
+    state.spawn_player(1, hero)
+    assert [entity.name for entity in state.world.get_zone("1").get_entities()] == ["Hero"]
+    assert state.players[1]["client"] is new
+
+
+def test_aoi_deltas_against_the_acknowledged_tick():
+    interest, players, client, (me, near, far) = viewer_setup()
+    interest.update(players, 1)
+    interest.ack(1, 1)
+    assert interest.update(players, 2) == 0  # nothing changed since the last message
+    near.move(3, 0)
+    interest.update(players, 3)
+    update = client.sent[-1]
+    assert update["baseline"] == 1 and update["enter"] == [] and update["leave"] == []
+    assert update["update"] == [{"id": near.id, "x": 553.0}]
+    near.move(300, 0)
+    interest.update(players, 4)  # not acked: still against tick 1
+    assert client.sent[-1]["baseline"] == 1 and client.sent[-1]["leave"] == [near.id]
+
+
+def test_aoi_falls_back_to_a_full_snapshot():
+    interest, players, client, (me, near, far) = viewer_setup()
+    interest.snapshots = SnapshotRing(size=2)
+    interest.update(players, 1)
+    interest.ack(1, 1)
+    for tick in (2, 3, 4):
+        near.move(1, 0)
+        interest.update(players, tick)
+    assert client.sent[-1]["baseline"] is None  # tick 1 aged out of the ring
+    assert len(client.sent[-1]["enter"]) == 2
+    interest.ack(1, 99)  # never sent: ignored
+    assert interest.acked[1] == 1
+
+
+def test_snapshot_states_are_shared_until_the_version_changes():
+    ring = SnapshotRing(size=4)
+    entity = Entity("e", 1.23456, 2)
+    ring.begin(1)
+    first = ring.state(entity)
+    ring.begin(2)
+    assert ring.state(entity) is first and first["x"] == 1.23
+    entity.move(1, 0)
+    ring.begin(3)
+    assert diff_state(first, ring.state(entity)) == {"id": entity.id, "x": 2.23}
+    assert diff_state(first, first) is None
+
+
+def test_entity_store_reuses_slots_with_a_new_generation():
+    store = EntityStore(capacity=2)
+    first = store.add("a", x=1.0, vx=2.0)
+    store.add("b", y=3.0)
+    store.add("c", hp=5.0)  # grows to 4 slots
+    assert store.capacity == 4 and (store.x[first], store.y[1], store.hp[2]) == (1.0, 3.0, 5.0)
+    assert store.remove(first)["vx"] == 2.0
+    assert not store.is_alive(first, 0) and first not in store.moving
+    again = store.add("d")
+    assert again == first and store.is_alive(again, 1) and store.x[again] == 0.0
+    assert len(store) == 3
+
+
+@pytest.mark.parametrize("sweep", [True, False])
+def test_entity_store_integrates_moving_slots(monkeypatch, sweep):
+    if sweep and entity_store.np is None:
+        pytest.skip("numpy is not installed")
+    if not sweep:
+        monkeypatch.setattr(entity_store, "np", None)
+    store = EntityStore()
+    slots = [store.add(i, x=float(i), vx=float(i % 3)) for i in range(10)]
+    store.remove(slots[4])
+    moved = store.integrate(0.5)
+    assert sorted(moved) == [i for i in slots if i % 3 and i != 4]
+    assert [store.x[i] for i in (1, 2, 3)] == [1.5, 3.0, 3.0]
+    assert store.version[1] == 1 and store.version[3] == 0
+
+
+def test_entities_carry_their_state_between_zones():
+    first, second = Zone("first", 100, 100), Zone("second", 100, 100)
+    entity = Entity("walker", 10, 20, hp=7)
+    entity.set_velocity(1, 0)
+    first.add_entity(entity)
+    second.add_entity(entity)
+    assert entity.zone is second and not first.entities and len(first.store) == 0
+    assert (entity.x, entity.y, entity.hp, entity.vx) == (10, 20, 7, 1)
+    second.remove_entity(entity.id)
+    assert entity.store is detached and entity.hp == 7
+
+
+def test_dropped_detached_entities_free_their_slot():
+    used = len(detached)
+    entity = Entity("temporary", 1, 2)
+    assert len(detached) == used + 1
+    del entity
+    gc.collect()
+    assert len(detached) == used
+
+
+def test_id_layout_packs_shard_generation_and_sequence():
+    entity_id = make_id(3, 2, 12345)
+    assert split_id(entity_id) == (3, 2, 12345)
+    assert entity_id == 3 << 48 | 2 << 40 | 12345
+    assert split_id(make_id(MAX_SHARD, MAX_GENERATION, MAX_SEQUENCE)) == (MAX_SHARD, MAX_GENERATION, MAX_SEQUENCE)
+    assert make_id(MAX_SHARD, MAX_GENERATION, MAX_SEQUENCE) < 1 << 64
+
+
+def test_id_allocator_reuses_sequences_under_a_new_generation():
+    ids = IdAllocator(shard=5)
+    first, second = ids.allocate(), ids.allocate()
+    assert split_id(first) == (5, 0, 1) and split_id(second) == (5, 0, 2)
+    ids.release(first)
+    assert not ids.is_current(first)
+    reused = ids.allocate()
+    assert split_id(reused) == (5, 1, 1) and reused != first
+    with pytest.raises(IdError):
+        ids.release(first)  # stale
+    with pytest.raises(IdError):
+        ids.release(make_id(6, 0, 1))  # another shard's
+    assert ids.stats() == {"issued": 3, "free": 0, "retired": 0}
+    with pytest.raises(IdError):
+        ids.set_shard(6)  # ids of shard 5 are out there
+
+
+def test_id_allocator_retires_sequences_before_the_generation_wraps():
+    ids = IdAllocator(shard=1)
+    entity_id = ids.allocate()
+    for _ in range(MAX_GENERATION):
+        ids.release(entity_id)
+        entity_id = ids.allocate()
+    ids.release(entity_id)
+    assert ids.stats()["retired"] == 1
+    assert split_id(ids.allocate())[2] == 2  # the retired sequence is not handed out again
+
+
+def test_id_allocator_is_unique_across_threads():
+    ids = IdAllocator(shard=2)
+    results = []
+    def allocate():
+        results.append([ids.allocate() for _ in range(5000)])
+    threads = [threading.Thread(target=allocate) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    allocated = [entity_id for chunk in results for entity_id in chunk]
+    assert len(set(allocated)) == len(allocated) == ids.stats()["issued"] == 20000
+
+
+def edge_zone():
+    """A zone with one entity about to leave through the right edge and one staying inside."""
+    zone = Zone("edge", 100, 100, cell_size=10)
+    leaving, staying = Entity("leaving", 99, 50), Entity("staying", 50, 50)
+    for entity in (leaving, staying):
+        zone.add_entity(entity)
+    leaving.set_velocity(100, 0)
+    staying.set_velocity(10, 10)
+    return zone, leaving, staying
+
+
+def test_integrate_reports_entities_leaving_their_zone():
+    zone, leaving, staying = edge_zone()
+    exits = []
+    assert zone.integrate(0.1, exits) == 2
+    assert exits == [(zone, leaving)] and leaving.x == pytest.approx(109)
+
+
+def test_engine_stops_leaving_entities_at_the_edge_by_default():
+    engine = GameEngine(GameState())
+    assert engine.zone_pool is None  # zone pools are opt-in
+    zone, leaving, staying = edge_zone()
+    engine.game_state.world.add_zone(zone)
+    engine.update()
+    assert leaving.x < 100 and (leaving.vx, leaving.vy) == (0, 0)
+    assert zone.query_rect(99, 49, 100, 51) == [leaving]
+    assert (staying.vx, staying.vy) == (10, 10)
+
+
+def test_engine_passes_leaving_entities_to_its_handlers():
+    engine = GameEngine(GameState())
+    exits = []
+    engine.on_zone_exit(lambda zone, entity: exits.append(entity))
+    zone, leaving, _ = edge_zone()
+    engine.game_state.world.add_zone(zone)
+    engine.update()
+    assert exits == [leaving] and leaving.x > 100 and leaving.vx == 100
+
+
+@pytest.mark.skipif(entity_store.np is None, reason="numpy is not installed")
+def test_zone_pool_ends_in_the_same_state_as_serial_ticks():
+    dt = 1 / 30
+    serial = build_zones(3, 400, 0.5)
+    pool = ZonePool(2)
+    pool.start()
+    try:
+        parallel = build_zones(3, 400, 0.5, allocator=pool.allocator)
+        for _ in range(20):
+            serial_exits = []
+            for zone in serial.values():
+                zone.integrate(dt, serial_exits)
+            parallel_exits = pool.tick(parallel, dt)
+            assert sorted(e.id for _, e in parallel_exits) == sorted(e.id for _, e in serial_exits)
+            for zone, entity in serial_exits:
+                clamp_to_zone(zone, entity)
+            for zone, entity in parallel_exits:
+                clamp_to_zone(zone, entity)
+        assert all(same_state(serial[name], parallel[name]) for name in serial)
+        assert pool.stats()["zones"] == 3
+    finally:
+        pool.stop()
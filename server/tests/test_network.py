@@ -1 +1,353 @@
-# Starter code for test_network.py
+# server/tests/test_network.py
+import socket
+import threading
+import pytest
+from conftest import LineClient, RecordingSession, free_port, wait_for
+from server.channels.channel_server import ChannelServer
+from server.db.database import pwd_context
+from server.db.passwords import PasswordPool, PasswordPoolBusy, password_pool
+from server.network.async_server import AsyncGameServer
+from server.network.broadcast import broadcast
+from server.network.outbound import ADMIT, DISCONNECT, DROP, OutboundQueue, WaterMarks
+from server.network.protocol import (ACTIONS, ACTION_CODES, BINARY_CODEC, CODECS, JSON_CODEC,
+                                     FrameReader, ProtocolError, msgpack)
+from server.network.session_tokens import SessionTokenError, SessionTokens, session_tokens
+
+
+@pytest.fixture
+def async_server(db):
+    server = AsyncGameServer(host="127.0.0.1", port=free_port())
+    thread = threading.Thread(target=server.start, daemon=True)
+    thread.start()
+    wait_for(lambda: server.running)
+    yield server
+    server.stop()
+    thread.join(5)
+
+
+def test_async_server_answers_in_order(async_server):
+    client = LineClient(async_server.port)
+    try:
+        client.send("ping", n=1)
+        client.send("login", username="nobody-here", password="secret")
+        client.send("ping", n=2)
+        assert client.receive() == {"action": "pong", "data": {"n": 1}}
+        assert client.receive()["action"] == "login_failed"
+        assert client.receive() == {"action": "pong", "data": {"n": 2}}
+    finally:
+        client.close()
+
+
+def test_async_server_drops_closed_connections(async_server):
+    client = LineClient(async_server.port)
+    client.send("ping")
+    client.receive()
+    assert len(async_server.clients) == 1
+    client.close()
+    wait_for(lambda: not async_server.clients)
+
+
+def test_frame_reader_splits_fragmented_frames():
+    reader = FrameReader()
+    reader.feed(b'{"a": 1}\n{"b"')
+    assert reader.next_frame() == b'{"a": 1}'
+    assert reader.next_frame() is None
+    reader.feed(b': 2}\n\n')
+    assert reader.next_frame() == b'{"b": 2}'
+    assert reader.next_frame() == b""
+    assert reader.next_frame() is None
+    assert reader.pending() == 0
+
+
+def test_frame_reader_compacts_instead_of_growing():
+    reader = FrameReader(chunk_size=16)
+    for _ in range(100):
+        reader.feed(b"x" * 10 + b"\n")
+        assert reader.next_frame() == b"x" * 10
+    assert len(reader.buffer) <= 32
+
+
+def test_frame_reader_rejects_oversized_frames():
+    reader = FrameReader(max_frame_size=8)
+    reader.feed(b"0123456789")
+    with pytest.raises(ProtocolError):
+        reader.next_frame()
+
+
+def test_frame_reader_receives_from_socket():
+    left, right = socket.socketpair()
+    with left, right:
+        reader = FrameReader(chunk_size=4)
+        left.sendall(b"ping\npong\n")
+        while reader.pending() < 10:
+            assert reader.recv_into(right)
+        assert [reader.next_frame(), reader.next_frame()] == [b"ping", b"pong"]
+        left.close()
+        assert reader.recv_into(right) == 0
+
+
+@pytest.mark.skipif(msgpack is None, reason="protocol v2 needs msgpack")
+def test_binary_codec_round_trips_with_action_codes():
+    message = {"action": "login", "data": {"username": "someone", "password": "x" * 8}}
+    encoded = BINARY_CODEC.encode(message)
+    assert int.from_bytes(encoded[:4], "big") == len(encoded) - 4
+    code, body = msgpack.unpackb(encoded[4:])
+    assert code == ACTION_CODES["login"] and "action" not in body
+    reader = BINARY_CODEC.new_reader()
+    reader.feed(encoded[:3])
+    assert reader.next_frame() is None
+    reader.feed(encoded[3:] + BINARY_CODEC.encode({"action": "not_listed"}))
+    assert BINARY_CODEC.decode(reader.next_frame()) == message
+    assert BINARY_CODEC.decode(reader.next_frame()) == {"action": "not_listed"}
+
+
+@pytest.mark.skipif(msgpack is None, reason="protocol v2 needs msgpack")
+def test_binary_codec_rejects_unknown_codes():
+    with pytest.raises(ProtocolError):
+        BINARY_CODEC.decode(msgpack.packb([len(ACTIONS) + 1, {}]))
+    with pytest.raises(ProtocolError):
+        BINARY_CODEC.decode(b"\xc1")
+
+
+def test_hello_negotiates_the_highest_common_protocol():
+    session = RecordingSession()
+    session.handle_message({"action": "hello", "data": {"protocols": [1, 2, 99]}})
+    assert session.sent[-1]["action"] == "hello_ok"
+    assert session.codec is CODECS[max(CODECS)]
+
+
+@pytest.mark.parametrize("offered", [[True], ["2"], [99], "2", None])
+def test_hello_ignores_unusable_offers(offered):
+    session = RecordingSession()
+    session.handle_message({"action": "hello", "data": {"protocols": offered}})
+    assert session.sent[-1]["status"] == "error"
+    assert session.codec is JSON_CODEC
+
+
+@pytest.mark.skipif(msgpack is None, reason="protocol v2 needs msgpack")
+def test_async_hello_switches_codec_mid_packet(async_server):
+    client = LineClient(async_server.port)
+    try:
+        client.sock.sendall(b'{"action": "login", "data": {"username": "nobody-here", "password": "x"}}\n'
+                            b'{"action": "hello", "data": {"protocols": [1, 2]}}\n'
+                            + BINARY_CODEC.encode({"action": "ping", "data": {"n": 1}}))
+        assert client.receive()["action"] == "login_failed"
+        assert client.receive()["protocol"] == 2
+        reader = BINARY_CODEC.new_reader()
+        reader.feed(client.buffer)
+        while (frame := reader.next_frame()) is None:
+            reader.feed(client.sock.recv(4096))
+        assert BINARY_CODEC.decode(frame) == {"action": "pong", "data": {"n": 1}}
+    finally:
+        client.close()
+
+
+def test_watermarks_drop_while_lagging_until_drained():
+    marks = WaterMarks(high=100, low=20, policy=DROP)
+    assert marks.admit(0, 500) == ADMIT  # an empty queue always takes one message
+    assert marks.admit(90, 20) == DROP
+    assert marks.lagging
+    assert marks.admit(50, 1) == DROP
+    assert marks.admit(20, 1) == ADMIT
+    assert not marks.lagging and marks.dropped == 2
+
+
+def test_watermarks_can_disconnect_instead():
+    marks = WaterMarks(high=100, low=20, policy=DISCONNECT)
+    assert marks.admit(90, 20) == DISCONNECT
+
+
+class RecordingSocket:
+    def __init__(self):
+        self.writes = []
+
+    def sendall(self, data):
+        self.writes.append(bytes(data))
+
+
+def test_outbound_queue_coalesces_and_flushes_on_close():
+    sock = RecordingSocket()
+    queue = OutboundQueue(sock, batch_bytes=1024)
+    for i in range(50):
+        assert queue.put(b"%d\n" % i)
+    queue.start()
+    queue.close()
+    assert not queue.thread.is_alive()
+    assert len(sock.writes) == 1  # everything queued before the writer woke
+    assert b"".join(sock.writes).split() == [b"%d" % i for i in range(50)]
+    assert not queue.put(b"late\n")
+
+
+def test_outbound_queue_reports_write_errors():
+    left, right = socket.socketpair()
+    right.close()
+    failed = threading.Event()
+    queue = OutboundQueue(left, on_error=failed.set)
+    queue.start()
+    queue.put(b"x" * 1024)
+    assert failed.wait(2)
+    assert queue.stats()["bytes"] == 0
+    left.close()
+
+
+class RawClient:
+    def __init__(self, codec):
+        self.codec = codec
+        self.received = []
+
+    def send_bytes(self, data):
+        self.received.append(data)
+
+
+@pytest.mark.skipif(msgpack is None, reason="protocol v2 needs msgpack")
+def test_broadcast_encodes_once_per_codec():
+    clients = [RawClient(JSON_CODEC) for _ in range(3)] + [RawClient(BINARY_CODEC) for _ in range(2)]
+    assert broadcast(clients, {"action": "pong"}) == 5
+    assert clients[0].received[0] is clients[2].received[0]
+    assert clients[3].received[0] is clients[4].received[0]
+    assert clients[0].received[0] != clients[3].received[0]
+
+
+def test_broadcast_exclude_and_where():
+    clients = [RawClient(JSON_CODEC) for _ in range(4)]
+    assert broadcast(clients, {"action": "pong"}, exclude=clients[0]) == 3
+    assert broadcast(clients, {"action": "pong"}, exclude=clients[:2], where=lambda c: c is not clients[3]) == 1
+    assert [len(c.received) for c in clients] == [0, 1, 2, 1]
+
+
+def test_channel_server_broadcasts_to_its_clients():
+    channel = ChannelServer(1)
+    members = [RecordingSession() for _ in range(2)]
+    for member in members:
+        assert channel.add_client(member)
+    assert channel.broadcast({"action": "pong"}, exclude=members[1]) == 1
+    assert members[0].sent == [{"action": "pong"}] and not members[1].sent
+
+
+def signup_data(username, password="secret-pw"):
+    return {"first_name": "Test", "last_name": "User", "username": username, "email": f"{username}@example.org",
+            "password": password, "confirm_password": password}
+
+
+def test_password_pool_hashes_and_verifies():
+    pool = PasswordPool(workers=1)
+    try:
+        hashed = pool.hash("secret-pw")
+        assert pool.verify("secret-pw", hashed)
+        assert not pool.verify("wrong-pw", hashed)
+        assert pool.stats()["pending"] == 0
+    finally:
+        pool.shutdown()
+
+
+def test_password_pool_rejects_when_full():
+    pool = PasswordPool(workers=1, max_pending=0)
+    with pytest.raises(PasswordPoolBusy):
+        pool.hash("secret-pw")
+    assert pool.stats()["rejected"] == 1
+    assert pool.executor is None
+
+
+def test_signup_checks_for_duplicates_before_hashing(db, monkeypatch):
+    hashed = []
+    monkeypatch.setattr(password_pool, "hash", lambda password: hashed.append(password) or pwd_context.hash(password))
+    session = RecordingSession()
+    session.handle_message({"action": "signup", "data": signup_data("dup-signup")})
+    session.handle_message({"action": "signup", "data": signup_data("dup-signup")})
+    assert [m["action"] for m in session.sent] == ["signup_ok", "signup_failed"]
+    assert len(hashed) == 1
+
+
+def test_signup_and_login_report_a_busy_pool(db, monkeypatch):
+    def busy(*args):
+        raise PasswordPoolBusy("Server busy, retry")
+    monkeypatch.setattr(password_pool, "hash", pwd_context.hash)
+    session = RecordingSession()
+    session.handle_message({"action": "signup", "data": signup_data("busy-login")})
+    monkeypatch.setattr(password_pool, "hash", busy)
+    monkeypatch.setattr(password_pool, "verify", busy)
+    session.handle_message({"action": "signup", "data": signup_data("busy-signup")})
+    assert session.sent[-1] == {"action": "signup_failed", "reason": "Server busy, retry", "retry": True}
+    session.handle_message({"action": "login", "data": {"username": "busy-login", "password": "secret-pw"}})
+    assert session.sent[-1] == {"action": "login_failed", "reason": "Server busy, retry", "retry": True}
+    assert session.user_id is None and not session.in_game
+
+
+def test_session_tokens_round_trip_and_revoke():
+    tokens = SessionTokens(secret_key="test-key", ttl=60)
+    token = tokens.issue(7, "someone")
+    claims = tokens.validate(token)
+    assert (claims["uid"], claims["usr"]) == (7, "someone")
+    revoked = []
+    tokens.on_revoke = lambda jti, exp: revoked.append(jti)
+    assert tokens.revoke(token)
+    assert revoked == [claims["jti"]]
+    with pytest.raises(SessionTokenError, match="revoked"):
+        tokens.validate(token)
+    assert not tokens.revoke(token)
+
+
+@pytest.mark.parametrize("token", [None, "", "abc", "a.b.c", "e30.AAAA"])
+def test_session_tokens_reject_malformed(token):
+    with pytest.raises(SessionTokenError):
+        SessionTokens(secret_key="test-key").validate(token)
+
+
+def test_session_tokens_reject_forged_and_expired():
+    tokens = SessionTokens(secret_key="test-key", ttl=-1)
+    with pytest.raises(SessionTokenError, match="expired"):
+        tokens.validate(tokens.issue(7, "someone"))
+    other = SessionTokens(secret_key="other-key")
+    with pytest.raises(SessionTokenError, match="Invalid"):
+        tokens.validate(other.issue(7, "someone"))
+
+
+def test_session_tokens_accept_revocations_from_elsewhere():
+    tokens = SessionTokens(secret_key="test-key")
+    claims = tokens.validate(token := tokens.issue(7, "someone"))
+    tokens.revoke_id(claims["jti"], claims["exp"])
+    with pytest.raises(SessionTokenError):
+        tokens.validate(token)
+
+
+def test_resume_skips_the_password(db, monkeypatch):
+    monkeypatch.setattr(password_pool, "hash", pwd_context.hash)
+    monkeypatch.setattr(password_pool, "verify", pwd_context.verify)
+    session = RecordingSession()
+    session.handle_message({"action": "signup", "data": signup_data("resumer")})
+    session.handle_message({"action": "login", "data": {"username": "resumer", "password": "secret-pw"}})
+    token = next(m for m in session.sent if m["action"] == "login_ok")["session_token"]
+
+    def no_bcrypt(*args):
+        raise AssertionError("resume must not verify a password")
+    monkeypatch.setattr(password_pool, "verify", no_bcrypt)
+    resumed = RecordingSession()
+    resumed.handle_message({"action": "resume", "data": {"token": token}})
+    assert resumed.sent[0]["action"] == "resume_ok" and resumed.username == "resumer"
+    resumed.handle_message({"action": "logout"})
+    again = RecordingSession()
+    again.handle_message({"action": "resume", "data": {"token": token}})
+    assert again.sent[0] == {"action": "resume_failed", "reason": "Token revoked"}
+
+
+def test_logging_in_again_replaces_the_previous_login(db, monkeypatch):
+    monkeypatch.setattr(password_pool, "hash", pwd_context.hash)
+    monkeypatch.setattr(password_pool, "verify", pwd_context.verify)
+    session = RecordingSession()
+    session.handle_message({"action": "signup", "data": signup_data("relogger")})
+    login = {"action": "login", "data": {"username": "relogger", "password": "secret-pw"}}
+    session.handle_message(login)
+    session.handle_message(login)
+    first, second = (m["session_token"] for m in session.sent if m["action"] == "login_ok")
+    with pytest.raises(SessionTokenError, match="revoked"):
+        session_tokens.validate(first)
+    session.handle_message({"action": "resume", "data": {"token": second}})
+    assert session.sent[-2]["action"] == "resume_ok"
+    assert session_tokens.validate(second)["usr"] == "relogger"  # resuming the same login keeps it
+
+
+def test_resume_refuses_a_deleted_user(db):
+    session = RecordingSession()
+    session.handle_message({"action": "resume", "data": {"token": session_tokens.issue(987654, "gone")}})
+    assert session.sent == [{"action": "resume_failed", "reason": "User not found"}]
+    assert session.user_id is None and not session.in_game
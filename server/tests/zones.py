@@ -0,0 +1,33 @@
+# server/tests/zones.py
+# Zones full of entities for comparing serial and ZonePool ticks; used by
+# test_game.py and server/benchmarks/bench_parallel_zones.py.
+import random
+from server.core.world import Zone, Entity
+
+SIZE = 4000.0
+
+
+def build_zones(count, entities, moving, allocator=None, seed=7):
+    rng = random.Random(seed)
+    zones = {}
+    for z in range(count):
+        name = f"zone-{z}"
+        zone = Zone(name, SIZE, SIZE, allocate=allocator(name)) if allocator else Zone(name, SIZE, SIZE)
+        for i in range(entities):
+            entity = Entity(f"e{i}", rng.uniform(0, SIZE), rng.uniform(0, SIZE), entity_id=z * entities + i + 1)
+            zone.add_entity(entity)
+            if rng.random() < moving:
+                entity.set_velocity(rng.uniform(-60, 60), rng.uniform(-60, 60))
+        zones[name] = zone
+    return zones
+
+
+def same_state(a: Zone, b: Zone) -> bool:
+    """Positions, versions and grid cells all equal."""
+    size = a.store.size
+    if size != b.store.size:
+        return False
+    for column in ("x", "y", "version", "cell"):
+        if getattr(a.store, column)[:size] != getattr(b.store, column)[:size]:
+            return False
+    return [sorted(cell) for cell in a.grid.cells] == [sorted(cell) for cell in b.grid.cells]